@@ -0,0 +1,370 @@
+from array import array
+from typing import Iterable, List, Tuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+'''
+Link state of the controller held as an adjacency matrix over the node ids seen so far.
+
+    numpy   ==> boolean matrix where [source, destination] is set while the link is up (used when numpy is installed)
+    bitset  ==> one integer per source whose bit for each destination is set while the link is up
+
+Both answer the same queries, so fan-out targets, degree counts and whole changesets are computed on rows or columns
+instead of per link, and both build an oracle of all-pairs hop distances over the symmetric links,
+which is the ground truth the routing table of every node should converge to.
+The oracle runs a breadth first search from every source at once, with the set of sources that reached each node
+packed into the bits of one row, so a whole layer of every search costs one OR per link.
+'''
+
+
+''' keep only the last change of every link in a changeset, as (source, destination) -> whether it is up '''
+
+
+def final_states(changes: Iterable[Tuple[str, int, int]]) -> 'dict[tuple, bool]':
+    states = dict()
+    for state, source, destination in changes:
+        if state == 'UP':
+            states[(source, destination)] = True
+        elif state == 'DOWN':
+            states[(source, destination)] = False
+    return states
+
+
+''' Adjacency matrix stored as a numpy boolean array '''
+
+
+class DenseLinkMatrix:
+    name = 'numpy'
+
+    def __init__(self, capacity: int = 64):
+        # node id of every row and column, in the order the ids were first seen
+        self.ids: List[int] = []
+        # row and column of every node id
+        self.index: dict[int, int] = dict()
+        # row of every node id which has been the source of a link, in the order they were first seen
+        self.sources: dict[int, int] = dict()
+        # links of the first len(ids) rows and columns, the rest is spare capacity
+        self.matrix = numpy.zeros((capacity, capacity), dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    ''' row of a node id, adding an empty row and column the first time the id is seen '''
+
+    def node(self, node_id: int) -> int:
+        position = self.index.get(node_id)
+        if position is None:
+            position = self.index[node_id] = len(self.ids)
+            self.ids.append(node_id)
+            # double the capacity once it runs out
+            if position == len(self.matrix):
+                grown = numpy.zeros((2 * position, 2 * position), dtype=bool)
+                grown[:position, :position] = self.matrix
+                self.matrix = grown
+        return position
+
+    ''' apply a changeset of (state, source, destination) in one assignment, where later changes of a link win '''
+
+    def apply(self, changes: Iterable[Tuple[str, int, int]]):
+        states = final_states(changes)
+        if not states:
+            return
+        rows, columns, values = [], [], []
+        for (source, destination), up in states.items():
+            if source not in self.sources:
+                self.sources[source] = self.node(source)
+            rows.append(self.sources[source])
+            columns.append(self.node(destination))
+            values.append(up)
+        self.matrix[rows, columns] = values
+
+    ''' destinations of the links leaving a node '''
+
+    def neighbors(self, node_id: int) -> List[int]:
+        if node_id not in self.index:
+            return []
+        return [self.ids[column] for column in numpy.flatnonzero(self.matrix[self.index[node_id], :len(self.ids)])]
+
+    ''' destinations of the links leaving each of the senders, gathered from their rows at once '''
+
+    def fanout(self, senders: List[int]) -> List[Tuple[int, List[int]]]:
+        senders = [sender for sender in senders if sender in self.index]
+        rows, columns = numpy.nonzero(self.matrix[[self.index[sender] for sender in senders], :len(self.ids)])
+        targets = [(sender, []) for sender in senders]
+        for row, column in zip(rows.tolist(), columns.tolist()):
+            targets[row][1].append(self.ids[column])
+        return targets
+
+    ''' number of links arriving at every node '''
+
+    def in_degrees(self) -> 'dict[int, int]':
+        count = len(self.ids)
+        return dict(zip(self.ids, self.matrix[:count, :count].sum(axis=0).tolist()))
+
+    ''' number of links leaving every node '''
+
+    def out_degrees(self) -> 'dict[int, int]':
+        count = len(self.ids)
+        return dict(zip(self.ids, self.matrix[:count, :count].sum(axis=1).tolist()))
+
+    ''' all-pairs hop distances over the links which are up in both directions '''
+
+    def hop_distances(self) -> 'DenseHopDistances':
+        count = len(self.ids)
+        links = self.matrix[:count, :count]
+        return DenseHopDistances(self.ids, links & links.T)
+
+
+''' All-pairs hop distances as a numpy matrix, with -1 for unreachable pairs '''
+
+
+class DenseHopDistances:
+    def __init__(self, ids: List[int], symmetric):
+        self.ids: List[int] = list(ids)
+        self.index: dict[int, int] = {node_id: position for position, node_id in enumerate(self.ids)}
+        self.links = symmetric
+        count = len(self.ids)
+        # neighbors of every node in compressed sparse row form
+        rows, columns = numpy.nonzero(symmetric)
+        starts = numpy.searchsorted(rows, numpy.arange(count))
+        lonely = numpy.bincount(rows, minlength=count) == 0
+        # bit s of row v is set once the search from s has reached v, in rows of 64 bit words, with an empty row
+        # after the last node so that nodes without neighbors at the end still point inside the gathered rows
+        words = (count + 63) // 64
+        reached = numpy.zeros((count + 1, words * 8), dtype=numpy.uint8)
+        reached[:, :(count + 7) // 8] = numpy.packbits(numpy.eye(count + 1, count, dtype=bool), axis=1)
+        reached = reached.view(numpy.uint64)
+        # distances in blocks of 64 sources matching the words, of which the first count columns are kept
+        blocks = numpy.full((count, words, 64), -1, dtype=numpy.int32)
+        self.distance = blocks.reshape(count, words * 64)[:, :count]
+        numpy.fill_diagonal(self.distance, 0)
+        columns = numpy.append(columns, count)
+        depth = 0
+        while len(columns) > 1:
+            depth += 1
+            # every node is reached by the searches which reached one of its neighbors in the previous layer
+            spread = numpy.bitwise_or.reduceat(reached[columns], starts, axis=0)
+            spread[lonely] = 0
+            fresh = spread & ~reached[:count]
+            # only the words holding newly reached sources are unpacked
+            nodes, offsets = numpy.nonzero(fresh)
+            if not len(nodes):
+                break
+            reached[:count] |= fresh
+            first = numpy.unpackbits(fresh[nodes, offsets].view(numpy.uint8).reshape(-1, 8), axis=1).view(bool)
+            blocks[nodes, offsets] = numpy.where(first, depth, blocks[nodes, offsets])
+
+    def hops(self, source: int, destination: int) -> int:
+        if source not in self.index or destination not in self.index:
+            return -1
+        return int(self.distance[self.index[source], self.index[destination]])
+
+    ''' number of other nodes a node can reach '''
+
+    def reachable(self, node_id: int) -> int:
+        if node_id not in self.index:
+            return 0
+        return int(numpy.count_nonzero(self.distance[self.index[node_id]] > 0))
+
+    ''' describe every way a routing table differs from shortest paths over the symmetric links '''
+
+    def check_routes(self, node_id: int, routing_table: 'dict[int, int]') -> List[str]:
+        errors = []
+        source = self.index.get(node_id)
+        if source is None:
+            return ['%d -> %d: the node has no links' % (node_id, d) for d in routing_table]
+        known = [(d, h) for d, h in routing_table.items() if d in self.index and h in self.index]
+        errors += ['%d -> %d: unknown node' % (node_id, d) for d, h in routing_table.items()
+                   if d not in self.index or h not in self.index]
+        # every reachable node needs a route
+        reachable = set(numpy.flatnonzero(self.distance[source] > 0).tolist())
+        errors += ['%d -> %d: missing route' % (node_id, self.ids[d])
+                   for d in sorted(reachable - {self.index[d] for d, _ in known})]
+        if known:
+            destinations = numpy.array([self.index[d] for d, _ in known])
+            hops = numpy.array([self.index[h] for _, h in known])
+            expected = self.distance[source, destinations]
+            # the next hop has to be a symmetric neighbor which is one hop closer to the destination
+            valid = (expected > 0) & self.links[source, hops] & (self.distance[hops, destinations] == expected - 1)
+            errors += ['%d -> %d: via %d is not a shortest path' % (node_id, *known[i])
+                       for i in numpy.flatnonzero(~valid).tolist()]
+        return errors
+
+
+''' Adjacency matrix stored as one integer bitset per row '''
+
+
+class BitsetLinkMatrix:
+    name = 'bitset'
+
+    def __init__(self):
+        # node id of every row and bit, in the order the ids were first seen
+        self.ids: List[int] = []
+        # row and bit of every node id
+        self.index: dict[int, int] = dict()
+        # row of every node id which has been the source of a link, in the order they were first seen
+        self.sources: dict[int, int] = dict()
+        # destinations of the links leaving every node, as bits of an integer
+        self.rows: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    ''' row of a node id, adding an empty row the first time the id is seen '''
+
+    def node(self, node_id: int) -> int:
+        position = self.index.get(node_id)
+        if position is None:
+            position = self.index[node_id] = len(self.ids)
+            self.ids.append(node_id)
+            self.rows.append(0)
+        return position
+
+    ''' apply a changeset of (state, source, destination) with a set and a clear mask per row '''
+
+    def apply(self, changes: Iterable[Tuple[str, int, int]]):
+        masks: dict[int, list] = dict()
+        for (source, destination), up in final_states(changes).items():
+            if source not in self.sources:
+                self.sources[source] = self.node(source)
+            mask = masks.setdefault(self.sources[source], [0, 0])
+            mask[0 if up else 1] |= 1 << self.node(destination)
+        for row, (up, down) in masks.items():
+            self.rows[row] = (self.rows[row] | up) & ~down
+
+    ''' destinations of the links leaving a node '''
+
+    def neighbors(self, node_id: int) -> List[int]:
+        if node_id not in self.index:
+            return []
+        return [self.ids[column] for column in bits(self.rows[self.index[node_id]])]
+
+    ''' destinations of the links leaving each of the senders '''
+
+    def fanout(self, senders: List[int]) -> List[Tuple[int, List[int]]]:
+        return [(sender, self.neighbors(sender)) for sender in senders if sender in self.index]
+
+    ''' number of links arriving at every node '''
+
+    def in_degrees(self) -> 'dict[int, int]':
+        degrees = [0] * len(self.ids)
+        for row in self.rows:
+            for column in bits(row):
+                degrees[column] += 1
+        return dict(zip(self.ids, degrees))
+
+    ''' number of links leaving every node '''
+
+    def out_degrees(self) -> 'dict[int, int]':
+        return {node_id: bin(row).count('1') for node_id, row in zip(self.ids, self.rows)}
+
+    ''' all-pairs hop distances over the links which are up in both directions '''
+
+    def hop_distances(self) -> 'BitsetHopDistances':
+        symmetric = [
+            row & sum(1 << column for column in bits(row) if self.rows[column] >> position & 1)
+            for position, row in enumerate(self.rows)
+        ]
+        return BitsetHopDistances(self.ids, symmetric)
+
+
+''' positions of the set bits of an integer, lowest first '''
+
+
+def bits(value: int) -> List[int]:
+    positions = []
+    while value:
+        low = value & -value
+        positions.append(low.bit_length() - 1)
+        value ^= low
+    return positions
+
+
+''' All-pairs hop distances as one row of 32 bit integers per node, with -1 for unreachable pairs '''
+
+
+class BitsetHopDistances:
+    def __init__(self, ids: List[int], symmetric: List[int]):
+        self.ids: List[int] = list(ids)
+        self.index: dict[int, int] = {node_id: position for position, node_id in enumerate(self.ids)}
+        self.links: List[int] = symmetric
+        count = len(self.ids)
+        self.distance: List[array] = [array('i', [-1]) * count for _ in range(count)]
+        for position in range(count):
+            self.distance[position][position] = 0
+        neighbors = [bits(row) for row in symmetric]
+        # bit s of reached[v] is set once the search from s has reached v
+        reached = [1 << position for position in range(count)]
+        depth = 0
+        while True:
+            depth += 1
+            # every node is reached by the searches which reached one of its neighbors in the previous layer
+            spread = list(reached)
+            for position, adjacent in enumerate(neighbors):
+                for neighbor in adjacent:
+                    spread[position] |= reached[neighbor]
+            changed = False
+            for position in range(count):
+                fresh = spread[position] & ~reached[position]
+                if fresh:
+                    changed = True
+                    row = self.distance[position]
+                    for source in bits(fresh):
+                        row[source] = depth
+            if not changed:
+                break
+            reached = spread
+
+    def hops(self, source: int, destination: int) -> int:
+        if source not in self.index or destination not in self.index:
+            return -1
+        return self.distance[self.index[source]][self.index[destination]]
+
+    ''' number of other nodes a node can reach '''
+
+    def reachable(self, node_id: int) -> int:
+        if node_id not in self.index:
+            return 0
+        return sum(1 for hops in self.distance[self.index[node_id]] if hops > 0)
+
+    ''' describe every way a routing table differs from shortest paths over the symmetric links '''
+
+    def check_routes(self, node_id: int, routing_table: 'dict[int, int]') -> List[str]:
+        errors = []
+        source = self.index.get(node_id)
+        if source is None:
+            return ['%d -> %d: the node has no links' % (node_id, d) for d in routing_table]
+        distance = self.distance[source]
+        routed = set()
+        for destination, hop in routing_table.items():
+            if destination not in self.index or hop not in self.index:
+                errors.append('%d -> %d: unknown node' % (node_id, destination))
+                continue
+            d, h = self.index[destination], self.index[hop]
+            routed.add(d)
+            # the next hop has to be a symmetric neighbor which is one hop closer to the destination
+            if distance[d] <= 0 or not self.links[source] >> h & 1 or self.distance[h][d] != distance[d] - 1:
+                errors.append('%d -> %d: via %d is not a shortest path' % (node_id, destination, hop))
+        # every reachable node needs a route
+        errors += ['%d -> %d: missing route' % (node_id, self.ids[d])
+                   for d in range(len(self.ids)) if distance[d] > 0 and d not in routed]
+        return errors
+
+
+LINK_MATRICES = {'numpy': DenseLinkMatrix, 'bitset': BitsetLinkMatrix}
+
+
+''' create an empty link matrix, using numpy when it is installed unless a representation is named '''
+
+
+def new_link_matrix(name: str = None):
+    if name is None:
+        name = 'numpy' if numpy is not None else 'bitset'
+    if name == 'numpy' and numpy is None:
+        raise ValueError('the numpy link matrix needs numpy to be installed')
+    if name not in LINK_MATRICES:
+        raise ValueError('unknown link matrix %r, expected one of %s' % (name, ', '.join(LINK_MATRICES)))
+    return LINK_MATRICES[name]()
@@ -0,0 +1,3 @@
+'''
+Micro-benchmarks for the simulation, run from the repository root with `python3 -m benchmarks.<name>`
+'''
@@ -0,0 +1,64 @@
+import random
+from argparse import ArgumentParser
+from time import process_time
+
+from benchmarks.scaling import TOPOLOGIES, topology_lines
+from benchmarks.throughput import down_lines
+from simulation import Simulation
+
+'''
+Measure the convergence latency of synthetic topologies after link failures, and the time saved by ending runs early.
+
+Every case runs a static topology in which some random links go DOWN at a given second, once with the convergence
+monitor ending the run after the last change settled, and once for the whole duration without the monitor. It reports
+
+    initial     tick at which every routing table and MPR set first matched the topology
+    change      ticks from the link failures until every node matched again
+    seconds     virtual seconds simulated by the run that ended early
+    cpu early   process time of the run that ended early, monitor included
+    cpu full    process time of the run over the whole duration
+
+usage:
+    python3 -m benchmarks.convergence [--topologies grid geometric] [--sizes 50 100] [--down 4] [--change 60]
+                                      [--duration 120]
+'''
+
+
+''' run a case, returning its process time, the seconds simulated and the periods of the monitor '''
+
+
+def run_case(topology: str, size: int, down: int, change: int, duration: int, seed: int, until_converged: bool):
+    rng = random.Random(seed)
+    links = TOPOLOGIES[topology](size, rng)
+    lines = topology_lines(links) + down_lines(links, down, change, rng)
+    simulation = Simulation(lines, [(node, node, "", -1) for node in range(size)], convergence=until_converged)
+    start = process_time()
+    seconds = simulation.run(duration, until_converged)
+    periods = simulation.controller.convergence.periods if until_converged else []
+    return process_time() - start, seconds, periods
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='benchmark the convergence after link failures and early termination')
+    parser.add_argument('--topologies', nargs='+', default=['grid', 'geometric', 'scale-free'],
+                        choices=list(TOPOLOGIES))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 100])
+    parser.add_argument('--down', type=int, default=4, help='random links going DOWN at the change')
+    parser.add_argument('--change', type=int, default=60, help='second at which the links go DOWN')
+    parser.add_argument('--duration', type=int, default=120)
+    parser.add_argument('--seed', type=int, default=6390)
+    args = parser.parse_args()
+
+    print('%-10s %6s %8s %7s %8s %10s %9s' % (
+        'topology', 'nodes', 'initial', 'change', 'seconds', 'cpu early', 'cpu full',
+    ))
+    for size in args.sizes:
+        for topology in args.topologies:
+            early, seconds, periods = run_case(topology, size, args.down, args.change, args.duration, args.seed, True)
+            full, _, _ = run_case(topology, size, args.down, args.change, args.duration, args.seed, False)
+            # the initial topology and the failures are the only periods
+            latencies = ['-' if period['converged'] is None else period['converged'] - period['start']
+                         for period in periods]
+            print('%-10s %6d %8s %7s %8d %9.2fs %8.2fs' % (
+                topology, size, latencies[0], latencies[-1] if len(latencies) > 1 else '-', seconds, early, full,
+            ))
@@ -0,0 +1,75 @@
+import math
+import random
+from argparse import ArgumentParser
+from time import process_time
+from typing import List
+
+from benchmarks.scaling import TOPOLOGIES, count_bytes, topology_lines
+from mobility import RandomWaypoint, link_changes
+from simulation import Simulation
+
+'''
+Compare full TC advertisements against TC deltas on synthetic topologies and mobility traces.
+
+Both modes run the same topology for a fixed number of seconds, past convergence, and report
+the TC bytes (deltas and full TC requests included) sent per node per second, the process time spent
+handling them per node per second, and the number of nodes whose final routes differ from the shortest paths.
+
+usage:
+    python3 -m benchmarks.differential [--topologies grid geometric waypoint] [--sizes 100 400] [--duration 300]
+'''
+
+
+''' topology script of a static topology, or of random waypoint movement in a square sized for an average degree of 8 '''
+
+
+def scenario_lines(topology: str, size: int, duration: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    if topology != 'waypoint':
+        return topology_lines(TOPOLOGIES[topology](size, rng))
+    model = RandomWaypoint(size, 1000.0, 1000.0, speed=(1.0, 5.0), pause=10, rng=rng)
+    radius = 1000.0 * math.sqrt(8 / (math.pi * size))
+    return [line for change in link_changes(model, radius, duration) for line in change.splitlines()]
+
+
+''' run a topology in either TC mode, returning (TC bytes and microseconds handling TCs per node per second, wrong routes) '''
+
+
+def run_mode(topology: str, size: int, duration: int, seed: int, differential_tc: bool) -> (float, float, int):
+    lines = scenario_lines(topology, size, duration, seed)
+    simulation = Simulation(lines, [(node, node, "", -1) for node in range(size)], differential_tc=differential_tc)
+    counts = count_bytes(simulation, 'text')
+    timing = {'seconds': 0.0}
+
+    for node in simulation.nodes.values():
+        def timed_handle(tcs, handle=node.handle_tc_messages):
+            start = process_time()
+            handle(tcs)
+            timing['seconds'] += process_time() - start
+
+        node.handle_tc_messages = timed_handle
+
+    simulation.run(duration)
+    wrong = sum(1 for errors in simulation.check_routes().values() if errors)
+    node_seconds = size * duration
+    return counts['tc'] / node_seconds, timing['seconds'] * 1e6 / node_seconds, wrong
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='benchmark full TC advertisements against TC deltas')
+    parser.add_argument('--topologies', nargs='+', default=['grid', 'geometric', 'scale-free', 'waypoint'],
+                        choices=list(TOPOLOGIES) + ['waypoint'])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 400])
+    parser.add_argument('--duration', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=6390)
+    args = parser.parse_args()
+
+    print('%-10s %6s %22s %22s %14s' % ('topology', 'nodes', 'TC bytes/node/s', 'us per node/s', 'wrong routes'))
+    print('%-10s %6s %11s %10s %11s %10s %7s %6s' % ('', '', 'full', 'delta', 'full', 'delta', 'full', 'delta'))
+    for size in args.sizes:
+        for topology in args.topologies:
+            full = run_mode(topology, size, args.duration, args.seed, differential_tc=False)
+            delta = run_mode(topology, size, args.duration, args.seed, differential_tc=True)
+            print('%-10s %6d %11.1f %10.1f %11.1f %10.1f %7d %6d' % (
+                topology, size, full[0], delta[0], full[1], delta[1], full[2], delta[2],
+            ))
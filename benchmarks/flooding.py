@@ -0,0 +1,101 @@
+import random
+from argparse import ArgumentParser
+from time import process_time
+from typing import List
+
+from benchmarks.scaling import TOPOLOGIES, topology_lines
+from messages import TCMessage
+from node import OLSRNode, TCAdvertisement, TOPOLOGY_HOLD_TIME
+from simulation import Simulation
+
+'''
+Compare the TC handling with a duplicate set and a maintained MPR selector set against the previous handling,
+which decided on the stored sequence number alone and rebuilt the MPR selector list for every TC.
+
+Both run the same synthetic topology for a fixed number of seconds, counting the TC messages every node forwards,
+the share of the other nodes every TC reached, and the process time spent per handled TC.
+The previous handling only forwarded the first copy of a TC it accepted, so when that copy came from a neighbor which
+had not selected the node as MPR, a later copy from an MPR selector was not forwarded either, leaving the flood to the
+other MPRs covering the same nodes. The duplicate set still forwards that later copy.
+
+usage:
+    python3 -m benchmarks.flooding [--topologies grid geometric] [--sizes 100 400] [--duration 120]
+'''
+
+
+''' the TC handling before the duplicate set, kept as the baseline '''
+
+
+def legacy_handle_tc_messages(node: 'OLSRNode', tc_messages: List['TCMessage']):
+    for tc in tc_messages:
+        sender_id, source_id, seq_num, ms_list = tc.sender, tc.source, tc.sequence, tc.mpr_selectors
+        if source_id == node.node_id:
+            continue
+        if source_id not in node.tc_table or node.tc_table[source_id].sequence < seq_num:
+            node.changes_detected = True
+            mpr_selectors = set(ms_list)
+            previous = node.tc_table[source_id].mpr_selectors if source_id in node.tc_table else set()
+            for selector in previous - mpr_selectors:
+                node.topology.remove_link(source_id, selector)
+            for selector in mpr_selectors - previous:
+                node.topology.add_link(source_id, selector)
+            node.tc_table[source_id] = TCAdvertisement(sequence=seq_num, mpr_selectors=mpr_selectors)
+            node.tc_timers.schedule(source_id, node.clock + TOPOLOGY_HOLD_TIME)
+            if sender_id in [x.node_id for x in node.neighbors.values() if x.is_mpr_selector]:
+                node.forward_message(tc)
+
+
+''' run a topology with either TC handling, returning (forwarded TCs per node per second, reach, us per TC) '''
+
+
+def run_flooding(topology: str, size: int, duration: int, seed: int, legacy: bool) -> (float, float, float):
+    links = TOPOLOGIES[topology](size, random.Random(seed))
+    simulation = Simulation(topology_lines(links), [(node, node, "", -1) for node in range(size)])
+    counts = {'forwarded': 0, 'handled': 0, 'seconds': 0.0}
+    # nodes which received a copy of every TC, by (originator, seqno)
+    receivers: dict[tuple, set] = dict()
+
+    for node in simulation.nodes.values():
+        handle = (lambda node: lambda tcs: legacy_handle_tc_messages(node, tcs))(node) if legacy \
+            else node.handle_tc_messages
+        forward = node.forward_message
+
+        def timed_handle(tcs, handle=handle, node_id=node.node_id):
+            for tc in tcs:
+                if type(tc) is TCMessage and tc.source != node_id:
+                    receivers.setdefault((tc.source, tc.sequence), set()).add(node_id)
+            start = process_time()
+            handle(tcs)
+            counts['seconds'] += process_time() - start
+            counts['handled'] += len(tcs)
+
+        def counted_forward(message, forward=forward):
+            if type(message) is TCMessage:
+                counts['forwarded'] += 1
+            forward(message)
+
+        node.handle_tc_messages = timed_handle
+        node.forward_message = counted_forward
+
+    simulation.run(duration)
+    reach = sum(len(nodes) for nodes in receivers.values()) / max(len(receivers) * (size - 1), 1)
+    return counts['forwarded'] / (size * duration), reach, counts['seconds'] * 1e6 / max(counts['handled'], 1)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='benchmark TC flooding with and without the duplicate set')
+    parser.add_argument('--topologies', nargs='+', default=['grid', 'geometric', 'scale-free'], choices=list(TOPOLOGIES))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 400])
+    parser.add_argument('--duration', type=int, default=120)
+    parser.add_argument('--seed', type=int, default=6390)
+    args = parser.parse_args()
+
+    print('%-10s %6s %22s %22s %22s' % ('topology', 'nodes', 'forwarded/node/s', 'reach', 'us per TC'))
+    print('%-10s %6s %11s %10s %11s %10s %11s %10s' % ('', '', *('legacy', 'current') * 3))
+    for size in args.sizes:
+        for topology in args.topologies:
+            legacy = run_flooding(topology, size, args.duration, args.seed, legacy=True)
+            current = run_flooding(topology, size, args.duration, args.seed, legacy=False)
+            print('%-10s %6d %11.3f %10.3f %11.3f %10.3f %11.2f %10.2f' % (
+                topology, size, legacy[0], current[0], legacy[1], current[1], legacy[2], current[2],
+            ))
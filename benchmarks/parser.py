@@ -0,0 +1,121 @@
+from argparse import ArgumentParser
+from time import perf_counter
+from typing import List
+
+from messages import DATA_TYPES, TC_TYPES, HelloMessage, parse_message
+from simulation import Simulation, load_scenario
+
+'''
+Compare the single pass message parser against the previous split based parsing over a recorded traffic corpus.
+
+The corpus is either a set of message files from a previous run (such as to0 to1 ...),
+or the traffic relayed by the controller during an in-process run of a scenario script.
+Both parsers do the work of node 0 reading its inbox: every message is sorted by type and parsed, while data messages
+for another next hop are left out, so both produce the same messages.
+
+usage:
+    python3 -m benchmarks.parser [--scenario scenario1.sh | --corpus to0 to1 ...] [--repeat 5]
+'''
+
+
+''' the message parsing before it was replaced by parse_message, kept as the baseline '''
+
+
+def legacy_parse_tc(tc_message: str):
+    _, sender_id, _, source_id, seq_num, _, *ms_list = tc_message.split()
+    return int(sender_id), int(source_id), int(seq_num), [int(node) for node in ms_list]
+
+
+def legacy_parse_hello(hello_message: str):
+    _STAR, sender_id, _HELLO, *hello_content = hello_message.split()
+    UNIDIR_INDEX = hello_content.index('UNIDIR')
+    BIDIR_INDEX = hello_content.index('BIDIR')
+    MPR_INDEX = hello_content.index('MPR')
+    unidir_list = [int(n) for n in hello_content[UNIDIR_INDEX + 1:BIDIR_INDEX]]
+    bidir_list = [int(n) for n in hello_content[BIDIR_INDEX + 1:MPR_INDEX]]
+    mpr_list = [int(n) for n in hello_content[MPR_INDEX + 1:]]
+    return int(sender_id), unidir_list, bidir_list, mpr_list
+
+
+def legacy_parse(messages: List[str], node_id: str = '0'):
+    # filter on the next hop, sort by type, then parse each type
+    messages = [x for x in messages if x.split()[0] in ('*', node_id)]
+    tc_messages = [x for x in messages if x.split(' ')[2] == 'TC']
+    data_messages = [x for x in messages if x.split(' ')[2] == 'DATA']
+    hello_messages = [x for x in messages if x.split(' ')[2] == 'HELLO']
+    hellos = [legacy_parse_hello(x) for x in hello_messages]
+    tcs = [legacy_parse_tc(x) for x in tc_messages]
+    data = [(int(x.split(' ')[0]), int(x.split(' ')[4])) for x in data_messages]
+    return hellos, tcs, data
+
+
+''' the parsing of OLSRNode.read_latest_messages, which parses every message once and then filters it '''
+
+
+def single_pass_parse(messages: List[str], node_id: int = 0):
+    hellos, tcs, data = [], [], []
+    for x in messages:
+        message = parse_message(x)
+        if type(message) is HelloMessage:
+            hellos.append(message)
+        elif type(message) in TC_TYPES:
+            tcs.append(message)
+        elif type(message) in DATA_TYPES and message.next_hop == node_id:
+            data.append(message)
+    return hellos, tcs, data
+
+
+''' record every message relayed by the controller during an in-process run of a scenario '''
+
+
+def record_corpus(scenario: str) -> List[str]:
+    simulation = Simulation(*load_scenario(scenario))
+    corpus = []
+    relay = simulation.controller.transport.relay
+
+    def recording_relay(pending):
+        for lines in pending.values():
+            corpus.extend(lines)
+        relay(pending)
+
+    simulation.controller.transport.relay = recording_relay
+    simulation.run()
+    return corpus
+
+
+def messages_per_second(function, corpus: List[str], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = perf_counter()
+        function(corpus)
+        best = min(best, perf_counter() - start)
+    return len(corpus) / best
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='benchmark message parsing')
+    parser.add_argument('--scenario', default='scenario1.sh', help='scenario script to record the corpus from')
+    parser.add_argument('--corpus', nargs='+', help='message files to use as the corpus instead of a recording')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--scale', type=int, default=20, help='number of times the corpus is repeated per run')
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus = []
+        for path in args.corpus:
+            with open(path) as corpus_file:
+                corpus.extend(line for line in corpus_file.read().splitlines() if line)
+    else:
+        corpus = record_corpus(args.scenario)
+    corpus = corpus * args.scale
+
+    # both parsers keep the same messages
+    legacy_counts = [len(messages) for messages in legacy_parse(corpus)]
+    single_pass_counts = [len(messages) for messages in single_pass_parse(corpus)]
+    assert legacy_counts == single_pass_counts, (legacy_counts, single_pass_counts)
+    legacy = messages_per_second(legacy_parse, corpus, args.repeat)
+    single_pass = messages_per_second(single_pass_parse, corpus, args.repeat)
+    print('%d messages' % len(corpus))
+    print('%-12s %12.0f msg/s' % ('legacy', legacy))
+    print('%-12s %12.0f msg/s' % ('single pass', single_pass))
+    print('speedup      %12.2fx' % (single_pass / legacy))
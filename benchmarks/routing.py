@@ -0,0 +1,107 @@
+import random
+from argparse import ArgumentParser
+from math import inf
+from time import perf_counter
+
+from node import OLSRNode, NodeStatus, Neighbor, TCAdvertisement
+from simulation import MemoryNetwork, MemoryNodeTransport
+
+'''
+Compare the breadth first routing table computation against the previous stack based implementation
+on synthetic connected graphs.
+
+usage:
+    python3 -m benchmarks.routing [--sizes 1000 2000 5000 10000] [--degree 4] [--repeat 3]
+'''
+
+
+''' the routing computation before it was replaced by breadth_first_routes, kept as the baseline '''
+
+
+def legacy_compute_routing_table(node: 'OLSRNode'):
+    graph = dict()
+    graph[node.node_id] = set(node.get_bidirectional_neighbors())
+    for node_id, node_data in node.tc_table.items():
+        graph[node_id] = node_data.mpr_selectors.copy()
+    for current in list(graph.keys()):
+        for neighbor in graph[current]:
+            mirror = graph.get(neighbor, set()).copy()
+            mirror.add(current)
+            graph[neighbor] = mirror
+
+    distance = {current: 0 if current == node.node_id else inf for current in graph.keys()}
+    previous = {current: None for current in graph.keys()}
+    visited = {current: False for current in graph.keys()}
+
+    queue = [node.node_id]
+    while queue:
+        current = queue.pop()
+        visited[current] = True
+        for adjacent in graph[current]:
+            if not visited[adjacent]:
+                queue.append(adjacent)
+            if distance[current] + 1 < distance[adjacent]:
+                distance[adjacent] = distance[current] + 1
+                previous[adjacent] = current
+
+    node.routing_table.clear()
+    for target, prev in previous.items():
+        if prev is None:
+            continue
+        current = target
+        while current != node.node_id and previous[current] != node.node_id:
+            current = previous[current]
+        node.routing_table[target] = current
+
+
+''' build a connected random graph as a ring with additional random chords '''
+
+
+def synthetic_graph(size: int, degree: int, rng: 'random.Random') -> 'dict[int, set]':
+    graph = {node: {(node - 1) % size, (node + 1) % size} for node in range(size)}
+    for _ in range(size * max(degree - 2, 0) // 2):
+        a, b = rng.randrange(size), rng.randrange(size)
+        if a != b:
+            graph[a].add(b)
+            graph[b].add(a)
+    return graph
+
+
+''' create node 0 with the graph loaded into its neighbor data and topology control table '''
+
+
+def synthetic_node(graph: 'dict[int, set]') -> 'OLSRNode':
+    node = OLSRNode(0, transport=MemoryNodeTransport(MemoryNetwork(), 0))
+    for neighbor_id in graph[0]:
+        neighbor = Neighbor(neighbor_id)
+        neighbor.status = NodeStatus.SYM
+        node.neighbors[neighbor_id] = neighbor
+    for node_id, adjacent in graph.items():
+        if node_id != 0:
+            node.tc_table[node_id] = TCAdvertisement(sequence=0, mpr_selectors=set(adjacent))
+    return node
+
+
+def best_time(function, node: 'OLSRNode', repeat: int) -> float:
+    best = inf
+    for _ in range(repeat):
+        start = perf_counter()
+        function(node)
+        best = min(best, perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='benchmark the routing table computation')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 2000, 5000, 10000])
+    parser.add_argument('--degree', type=int, default=4, help='average node degree')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=6390)
+    args = parser.parse_args()
+
+    print('%8s %12s %12s %8s' % ('nodes', 'legacy (ms)', 'bfs (ms)', 'speedup'))
+    for size in args.sizes:
+        node = synthetic_node(synthetic_graph(size, args.degree, random.Random(args.seed)))
+        legacy = best_time(legacy_compute_routing_table, node, args.repeat)
+        bfs = best_time(OLSRNode.compute_routing_table, node, args.repeat)
+        print('%8d %12.2f %12.2f %7.1fx' % (size, legacy * 1000, bfs * 1000, legacy / bfs))
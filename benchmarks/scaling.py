@@ -0,0 +1,278 @@
+import json
+import math
+import multiprocessing
+import platform
+import random
+import resource
+import subprocess
+import sys
+from argparse import ArgumentParser
+from time import perf_counter, process_time
+from typing import List
+
+from metrics import frame_kind
+from mobility import unit_disk_links
+from mpr import MPRSelection
+from node import OLSRNode
+from simulation import Simulation
+
+'''
+Measure how the simulation scales on synthetic topologies, writing the results as JSON to track regressions.
+
+Every case runs the nodes and the controller in process on a static topology, in a fresh worker process
+so that the peak memory of one case does not carry over into the next, and reports
+
+    converged_at        first second at which the routing table of every node matches the shortest paths
+                        of the controller topology (null when the run ended before that)
+    cpu                 process time per node per second spent repairing routing tables, selecting MPRs,
+                        and reading and parsing messages
+    bytes               HELLO and TC bytes sent per node per second, where TC counts the deltas and full TC requests
+                        of nodes advertising differentially
+    degree              mean and largest number of links leaving a node, and largest number arriving at one
+    peak_rss_kb         peak resident memory of the worker process
+
+The default sizes stop at 1000 nodes, where a geometric case already peaks at about 1.6 GB and takes about 90 s.
+Networks of up to 10,000 nodes are measured by passing --sizes on a machine with enough memory.
+
+usage:
+    python3 -m benchmarks.scaling [--topologies line ring grid geometric scale-free] [--sizes 10 100 1000]
+                                  [--duration 120] [--wire text] [--differential-tc] [--output scaling.json]
+'''
+
+
+''' i - i+1 '''
+
+
+def line_links(size: int, rng: 'random.Random') -> List[tuple]:
+    return [(node, node + 1) for node in range(size - 1)]
+
+
+''' a line closed into a ring '''
+
+
+def ring_links(size: int, rng: 'random.Random') -> List[tuple]:
+    return line_links(size, rng) + ([(size - 1, 0)] if size > 2 else [])
+
+
+''' a square grid filled row by row '''
+
+
+def grid_links(size: int, rng: 'random.Random') -> List[tuple]:
+    side = math.ceil(math.sqrt(size))
+    links = []
+    for node in range(size):
+        if node % side + 1 < side and node + 1 < size:
+            links.append((node, node + 1))
+        if node + side < size:
+            links.append((node, node + side))
+    return links
+
+
+''' unit-disk radios placed at random in a unit square, with a range giving an average degree of about 8 '''
+
+
+def geometric_links(size: int, rng: 'random.Random') -> List[tuple]:
+    positions = [[rng.random(), rng.random()] for _ in range(size)]
+    return sorted(unit_disk_links(positions, math.sqrt(8 / (math.pi * size))))
+
+
+''' Barabasi-Albert preferential attachment, where every new node links to 2 nodes chosen by degree '''
+
+
+def scale_free_links(size: int, rng: 'random.Random') -> List[tuple]:
+    links = [(a, b) for a in range(min(size, 3)) for b in range(a + 1, min(size, 3))]
+    # every node appears once per link, so a uniform pick from this list is a pick by degree
+    ends = [node for link in links for node in link]
+    for node in range(3, size):
+        targets = set()
+        while len(targets) < 2:
+            targets.add(rng.choice(ends))
+        for target in sorted(targets):
+            links.append((target, node))
+            ends += [target, node]
+    return links
+
+
+TOPOLOGIES = {
+    'line': line_links,
+    'ring': ring_links,
+    'grid': grid_links,
+    'geometric': geometric_links,
+    'scale-free': scale_free_links,
+}
+
+
+''' topology script where every link is up in both directions from the start '''
+
+
+def topology_lines(links: List[tuple]) -> List[str]:
+    return [line for a, b in links for line in ('0 UP %d %d' % (a, b), '0 UP %d %d' % (b, a))]
+
+
+''' Process time spent in a method, accumulated over every call '''
+
+
+class Stopwatch:
+    def __init__(self, owner, name: str):
+        self.seconds: float = 0.0
+        method = getattr(owner, name)
+
+        def timed(*args, **kwargs):
+            start = process_time()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.seconds += process_time() - start
+
+        setattr(owner, name, timed)
+
+
+''' add the bytes of the HELLO and TC messages every node sends to a counter, as the controller collects them '''
+
+
+def count_bytes(simulation: 'Simulation', codec_name: str) -> 'dict[str, int]':
+    counts = {'hello': 0, 'tc': 0}
+    collect = simulation.controller.transport.collect
+
+    def counting_collect(node_id: int) -> list:
+        frames = collect(node_id)
+        for frame in frames:
+            kind = frame_kind(frame)
+            # text frames are terminated by a newline
+            size = len(frame) + 1 if codec_name == 'text' else len(frame)
+            if kind == 'HELLO':
+                counts['hello'] += size
+            elif kind == 'TC':
+                counts['tc'] += size
+        return frames
+
+    simulation.controller.transport.collect = counting_collect
+    return counts
+
+
+''' run one case and return its measurements, in a worker process which runs no other case '''
+
+
+def run_case(case: tuple) -> dict:
+    # peak_rss_kb is the high-water mark of the whole process, including the setup before the case and any case
+    # run earlier in it, so it only belongs to this case because the pool starts a new worker for every case
+    # (maxtasksperchild=1)
+    topology, size, duration, wire, seed, differential_tc = case
+    links = TOPOLOGIES[topology](size, random.Random(seed))
+    simulation = Simulation(
+        topology_lines(links), [(node, node, "", -1) for node in range(size)], wire=wire, differential_tc=differential_tc,
+    )
+    routing = Stopwatch(OLSRNode, 'update_routing_table')
+    mpr = Stopwatch(MPRSelection, 'select')
+    parse = Stopwatch(OLSRNode, 'read_latest_messages')
+    counts = count_bytes(simulation, wire)
+
+    # the topology is static, so the expected routes are known once the links are up
+    simulation.controller.update_topology(0)
+    oracle = simulation.controller.topology.hop_distances()
+    out_degrees = simulation.controller.topology.out_degrees()
+    in_degrees = simulation.controller.topology.in_degrees()
+    reachable = {node_id: oracle.reachable(node_id) for node_id in simulation.nodes}
+    # routes only ever get closer to the shortest paths on a static topology, so a converged node stays converged
+    pending = set(simulation.nodes)
+    converged_at = None
+    start = perf_counter()
+    cpu_start = process_time()
+    # time spent checking the routes, which is left out of the totals
+    checking = 0.0
+    ticks = 0
+    for clock in range(duration):
+        simulation.controller.tick(clock)
+        for node in simulation.nodes.values():
+            node.tick(clock + 1)
+        ticks += 1
+        check_start = process_time()
+        # a node is only checked in full once it has a route to every reachable node
+        for node_id in [n for n in pending if len(simulation.nodes[n].routing_table) == reachable[n]]:
+            if not oracle.check_routes(node_id, simulation.nodes[node_id].routing_table):
+                pending.discard(node_id)
+        checking += process_time() - check_start
+        if not pending:
+            converged_at = clock + 1
+            break
+    wall = perf_counter() - start
+    cpu = process_time() - cpu_start - checking
+
+    node_seconds = size * ticks
+    return {
+        'topology': topology,
+        'nodes': size,
+        'links': len(links),
+        'seed': seed,
+        'wire': wire,
+        'differential_tc': differential_tc,
+        'ticks': ticks,
+        'converged_at': converged_at,
+        'converged_nodes': size - len(pending),
+        'wall_seconds': round(wall, 4),
+        'cpu': {
+            'total': cpu / node_seconds,
+            'routing': routing.seconds / node_seconds,
+            'mpr': mpr.seconds / node_seconds,
+            'parse': parse.seconds / node_seconds,
+        },
+        'bytes': {
+            'hello': counts['hello'] / node_seconds,
+            'tc': counts['tc'] / node_seconds,
+        },
+        'degree': {
+            'mean': sum(out_degrees.values()) / size,
+            'max_out': max(out_degrees.values()),
+            'max_in': max(in_degrees.values()),
+        },
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+''' commit of the working tree the benchmark ran on, if it is a git checkout '''
+
+
+def revision() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='benchmark the simulation on synthetic topologies of growing size')
+    parser.add_argument('--topologies', nargs='+', default=list(TOPOLOGIES), choices=list(TOPOLOGIES))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--duration', type=int, default=120, help='virtual seconds to run when routes do not converge')
+    parser.add_argument('--wire', default='text', choices=['text', 'binary'], help='wire format of the messages')
+    parser.add_argument('--differential-tc', action='store_true', help='advertise MPR selector changes in TC deltas')
+    parser.add_argument('--seed', type=int, default=6390)
+    parser.add_argument('--output', default='-', help='JSON file to write, standard output by default')
+    args = parser.parse_args()
+
+    cases = [
+        (topology, size, args.duration, args.wire, args.seed, args.differential_tc)
+        for size in args.sizes for topology in args.topologies
+    ]
+    results = []
+    # a fresh process per case keeps the peak memory of every case separate, see run_case
+    with multiprocessing.get_context().Pool(1, maxtasksperchild=1) as pool:
+        for result in pool.imap(run_case, cases):
+            results.append(result)
+            print('%-10s %6d nodes  converged at %-5s %8.2fs' % (
+                result['topology'], result['nodes'], result['converged_at'], result['wall_seconds'],
+            ), file=sys.stderr)
+
+    report = {
+        'revision': revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cases': results,
+    }
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+    with output:
+        json.dump(report, output, indent=2)
+        output.write('\n')
@@ -0,0 +1,98 @@
+import multiprocessing
+import random
+from argparse import ArgumentParser
+from time import process_time
+from typing import List
+
+from benchmarks.scaling import TOPOLOGIES, topology_lines
+from simulation import Simulation
+from traffic import summarize
+
+'''
+Measure how many traffic packets per second the forwarding path sustains, and how link failures affect delivery.
+
+Every case runs a static topology in process, and once the routes have settled starts flows between random pairs
+of nodes at the given rate per flow. Optionally some random links go DOWN halfway through the flows,
+which the delivery timeline shows as a dip until the routes are repaired. For each rate it reports
+
+    offered / delivered     packets per second generated by all flows, and delivered at their destination
+    hops/s                  links crossed per second by the delivered packets
+    us/hop                  process time the traffic adds to the run (the same run without flows is the baseline),
+                            per link crossed by a delivered packet
+    hops/cpu-s              links crossed per second of that process time, which is what the forwarding path sustains
+
+Every case runs in a fresh worker process.
+
+usage:
+    python3 -m benchmarks.throughput [--topology grid] [--size 100] [--flows 20] [--rates 1 10 50] [--down 0]
+                                     [--wire text] [--warmup 60] [--duration 60]
+'''
+
+
+''' flow specification of random pairs of distinct nodes, all running between start and stop '''
+
+
+def random_flows(size: int, count: int, rate: float, start: int, stop: int, rng: 'random.Random') -> List[str]:
+    return ['%d %d %d %d %s 64' % (start, stop, *rng.sample(range(size), 2), rate) for _ in range(count)]
+
+
+''' DOWN lines for random links in both directions '''
+
+
+def down_lines(links: List[tuple], count: int, clock: int, rng: 'random.Random') -> List[str]:
+    return [line for a, b in rng.sample(links, count) for line in ('%d DOWN %d %d' % (clock, a, b),
+                                                                 '%d DOWN %d %d' % (clock, b, a))]
+
+
+''' run one case, returning its process time and traffic summary '''
+
+
+def run_case(case: tuple) -> (float, dict):
+    topology, size, flow_count, rate, down, wire, warmup, duration, seed = case
+    rng = random.Random(seed)
+    links = TOPOLOGIES[topology](size, rng)
+    lines = topology_lines(links) + down_lines(links, down, warmup + duration // 2, rng)
+    # flows stop generating a few seconds before the end, so that their last packets can arrive
+    flows = random_flows(size, flow_count, rate, warmup, warmup + duration - 1, rng) if rate else []
+    simulation = Simulation(lines, [(node, node, "", -1) for node in range(size)], wire=wire, flows=flows)
+    start = process_time()
+    simulation.run(warmup + duration + 10)
+    return process_time() - start, summarize(simulation.traffic_records(), window=5)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='benchmark the forwarding of generated traffic')
+    parser.add_argument('--topology', default='grid', choices=list(TOPOLOGIES))
+    parser.add_argument('--size', type=int, default=100)
+    parser.add_argument('--flows', type=int, default=20, help='number of flows between random pairs')
+    parser.add_argument('--rates', type=float, nargs='+', default=[1, 10, 50], help='packets per second of each flow')
+    parser.add_argument('--down', type=int, default=0, help='random links going DOWN halfway through the flows')
+    parser.add_argument('--wire', default='text', choices=['text', 'binary'], help='wire format of the messages')
+    parser.add_argument('--warmup', type=int, default=60, help='seconds before the flows start')
+    parser.add_argument('--duration', type=int, default=60, help='seconds the flows run')
+    parser.add_argument('--seed', type=int, default=6390)
+    parser.add_argument('--timeline', action='store_true', help='print the delivery timeline of every rate')
+    args = parser.parse_args()
+
+    cases = [
+        (args.topology, args.size, args.flows, rate, args.down, args.wire, args.warmup, args.duration, args.seed)
+        for rate in [0] + args.rates
+    ]
+    # a fresh process per case keeps the process time of every case separate
+    with multiprocessing.get_context().Pool(1, maxtasksperchild=1) as pool:
+        (baseline, _), *results = pool.map(run_case, cases)
+
+    print('%8s %10s %10s %7s %10s %8s %11s' % ('rate', 'offered', 'delivered', 'ratio', 'hops/s', 'us/hop', 'hops/cpu-s'))
+    for rate, (seconds, summary) in zip(args.rates, results):
+        flows = summary['flows'].values()
+        sent = sum(flow['sent'] for flow in flows)
+        delivered = sum(flow['delivered'] for flow in flows)
+        hops = sum(flow['mean_hops'] * flow['delivered'] for flow in flows if flow['delivered'])
+        extra = max(seconds - baseline, 1e-9)
+        print('%8g %10.1f %10.1f %7.3f %10.1f %8.2f %11.0f' % (
+            rate, sent / args.duration, delivered / args.duration, delivered / max(sent, 1),
+            hops / args.duration, extra * 1e6 / max(hops, 1), hops / extra,
+        ))
+        if args.timeline:
+            for window in summary['timeline']:
+                print('%18d %10d %10d' % (window['start'], window['sent'], window['delivered']))
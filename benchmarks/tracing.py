@@ -0,0 +1,111 @@
+import os
+import random
+import tempfile
+from argparse import ArgumentParser
+from time import process_time
+
+import tracing
+from benchmarks.scaling import TOPOLOGIES, topology_lines
+from simulation import Simulation
+from tracing import QUERIES, Trace, TraceRecorder
+from transport import AppendPool
+
+'''
+Measure the cost of recording a message trace, and how long the queries of tracing.py take on it.
+
+A static topology runs with the trace recorder in the relay path of the controller, while the relayed frames are also
+appended to text to<id> files as the file transport does. It reports
+
+    recording       process time spent in the recorder, against the process time of the whole run
+    size            bytes of the trace directory and of the text files
+    queries         seconds every query takes to map the trace and answer, with numpy when it is installed
+                    and with the pure Python scans, against finding the reach of every TC by splitting the text files
+
+usage:
+    python3 -m benchmarks.tracing [--topology grid] [--size 400] [--duration 120]
+'''
+
+
+''' the reach of every TC found by splitting every line of the text files, as the analysis without a trace does '''
+
+
+def text_reach(directory: str, node_ids) -> dict:
+    floods: dict[tuple, set] = dict()
+    for node_id in node_ids:
+        with open(os.path.join(directory, 'to%d' % node_id)) as received:
+            for line in received:
+                fields = line.split(' ', 5)
+                if fields[2] in ('TC', 'TCD') and int(fields[3]) != node_id:
+                    floods.setdefault((int(fields[3]), int(fields[4])), set()).add(node_id)
+    return floods
+
+
+''' process time of a call, with its result '''
+
+
+def timed(function, *args) -> (float, object):
+    start = process_time()
+    result = function(*args)
+    return process_time() - start, result
+
+
+''' bytes of every file in a directory '''
+
+
+def directory_size(directory: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(directory))
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='benchmark recording and querying the message trace')
+    parser.add_argument('--topology', default='grid', choices=list(TOPOLOGIES))
+    parser.add_argument('--size', type=int, default=400)
+    parser.add_argument('--duration', type=int, default=120)
+    parser.add_argument('--seed', type=int, default=6390)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='olsr-trace-')
+    trace_directory, text_directory = os.path.join(workdir, 'trace'), os.path.join(workdir, 'text')
+    os.makedirs(text_directory)
+
+    links = TOPOLOGIES[args.topology](args.size, random.Random(args.seed))
+    simulation = Simulation(topology_lines(links), [(node, node, "", -1) for node in range(args.size)])
+    recorder = simulation.controller.trace = TraceRecorder(trace_directory)
+    recording = {'seconds': 0.0}
+    for name in ('record', 'flush'):
+        def timed_method(*method_args, method=getattr(recorder, name)):
+            start = process_time()
+            method(*method_args)
+            recording['seconds'] += process_time() - start
+
+        setattr(recorder, name, timed_method)
+    # the frames relayed to every node also go to its text file, like ControllerFileTransport writes them
+    relay, text_files = simulation.controller.transport.relay, AppendPool(capacity=args.size)
+
+    def relay_and_write(pending):
+        relay(pending)
+        for node_id, frames in pending.items():
+            text_files.write(os.path.join(text_directory, 'to%d' % node_id), ('\n'.join(frames) + '\n').encode())
+
+    simulation.controller.transport.relay = relay_and_write
+    run_seconds, _ = timed(simulation.run, args.duration)
+    recorder.close()
+    text_files.close()
+
+    trace = Trace(trace_directory)
+    print('%s %d nodes, %d seconds: %d deliveries' % (args.topology, args.size, args.duration, trace.rows))
+    print('recording  %.2fs of a %.2fs run' % (recording['seconds'], run_seconds))
+    print('size       trace %.1f MB, text %.1f MB' % (directory_size(trace_directory) / 1e6,
+                                                    directory_size(text_directory) / 1e6))
+
+    numpy = tracing.numpy
+    print('%-10s %10s %10s %10s' % ('query', 'numpy', 'pure', 'text'))
+    for name, query in QUERIES.items():
+        vectorized = timed(lambda: query(Trace(trace_directory)))[0] if numpy is not None else None
+        # the same queries without numpy scan the memoryviews of the mapped files
+        tracing.numpy = None
+        pure = timed(lambda: query(Trace(trace_directory)))[0]
+        tracing.numpy = numpy
+        text = timed(text_reach, text_directory, range(args.size))[0] if name == 'reach' else None
+        print('%-10s %10s %10s %10s' % (name, *('-' if seconds is None else '%.2fs' % seconds
+                                               for seconds in (vectorized, pure, text))))
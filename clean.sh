@@ -1,2 +1,3 @@
 #!/bin/bash
-rm -f from* to* recieved*
\ No newline at end of file
+rm -f from[0-9]* to[0-9]* recieved[0-9]* metrics[0-9]* metrics-controller ready[0-9]* epoch stop traffic[0-9]* snapshot[0-9]* *.sock
+rm -rf trace
\ No newline at end of file
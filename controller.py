@@ -1,7 +1,17 @@
 #!/usr/bin/env python3
 import os
-from time import sleep
-from typing import Set
+from time import time
+from typing import List, Iterable
+
+from adjacency import new_link_matrix
+from convergence import ConvergenceMonitor, SnapshotFiles, print_periods
+from metrics import attach_controller
+from rendezvous import Rendezvous, gather_topology_nodes, sleep_until
+from ring import ControllerRingTransport
+from topology import TopologyStream, stream_file, sort_lines
+from tracing import TraceRecorder
+from transport import ControllerFileTransport
+from wire import get_codec
 
 '''
 The Controller emulates the topology of a network of wireless nodes with unidirectional links
@@ -9,81 +19,117 @@ The Controller emulates the topology of a network of wireless nodes with unidire
 
 
 class Controller:
-    def __init__(self):
-        # last read line index from each node output file (fromXXX)
-        self.indexes: dict[int, int] = dict()
-        # each node stores a set of neighbors
-        self.topology: dict[int, Set[int]] = dict()
-        # a changset keyed by a int timer, which enables the delayed changes in topology
-        self.topology_changes: dict[int, Set[(int, int, int)]] = dict()
-        # load topology
-        self.load_topology()
-        # perform a timeout to allow the nodes to complete setup
-        sleep(1)
-
-    ''' parse the topology file '''
-
-    def load_topology(self):
-        with open('topology.txt') as top:
-            # filter out empty lines to avoid parsing exceptions
-            for line in filter(lambda e: len(e) > 0, top.readlines()):
-                # read the first 4 fields from each line separated by spaces
-                delay, state, source, destination = line.split(' ')
-                # convernt numeric strings into integers
-                delay = int(delay)
-                source = int(source)
-                destination = int(destination)
-
-                # create a change set or use the currently stored value for every timestamp encountered
-                change_set = self.topology_changes.get(delay, set())
-                change_set.add((state, source, destination))
-
-                # update the map storing changes by timestamp
-                self.topology_changes[delay] = change_set
-
-    ''' process updates using the topology changeset '''
-
-    def update_topology(self, clock):
-        # place each update into the current topology map
-        for state, source, destination in self.topology_changes.get(clock, []):
-            # fetch the original set or create a new one
-            neighbor_set = self.topology.get(source, set())
-
-            # UP or DOWN operations to adjust links
-            if state == 'UP':
-                neighbor_set.add(destination)
-            elif state == 'DOWN':
-                neighbor_set.discard(destination)
-
-            # update the key with the new neighbor set
-            self.topology[source] = neighbor_set
-
-    ''' run the simulation for 120 seconds '''
-
-    def run(self):
+    def __init__(self, transport=None, topology: Iterable[str] = None, links: str = None):
+        # transport used to collect and relay node messages, which defaults to the file based transport
+        self.transport = transport if transport is not None else ControllerFileTransport()
+        # adjacency matrix of the links that are up, numpy based when available (see adjacency.py)
+        self.topology = new_link_matrix(links)
+        # stream of (state, source, destination) changes in time order, which enables the delayed changes in topology
+        self.topology_changes: 'TopologyStream' = None
+        # compares the snapshots of the nodes with the topology when set, see convergence.py
+        self.convergence: 'ConvergenceMonitor' = None
+        # logs every delivered message to a columnar trace when set, see tracing.py
+        self.trace: 'TraceRecorder' = None
+        # load topology, streaming topology.txt so that long traces are never read as a whole
+        if topology is None:
+            self.topology_changes = TopologyStream(stream_file('topology.txt'), 'topology.txt')
+        else:
+            self.load_topology(topology)
+
+    ''' read the changes of a topology script, where lines held in a list are put in time order first '''
+
+    def load_topology(self, lines: Iterable[str]):
+        if isinstance(lines, (list, tuple)):
+            lines = sort_lines(lines)
+        self.topology_changes = TopologyStream(lines)
+
+    ''' process updates using the topology changeset, returning the number of changes '''
+
+    def update_topology(self, clock) -> int:
+        # apply the UP or DOWN operations which came due to the adjacency matrix as one changeset
+        changes = self.topology_changes.advance(clock)
+        self.topology.apply(changes)
+        return len(changes)
+
+    ''' perform a single step of the simulation at the given clock value '''
+
+    def tick(self, clock: int):
+        # check if there is a topology update for the controller
+        changes = self.update_topology(clock)
+        # newest messages of every node which has been the source of a link
+        collected: dict[int, list] = dict()
+        for node in self.topology.sources:
+            lines = self.transport.collect(node)
+            if lines:
+                collected[node] = lines
+        # messages collected for each neighbor during this tick, using the rows of every sender at once
+        pending: dict[int, List[str]] = dict()
+        for node, neighbors in self.topology.fanout(list(collected)):
+            for neighbor in neighbors:
+                pending.setdefault(neighbor, []).extend(collected[node])
+            if self.trace is not None:
+                self.trace.record(clock, node, collected[node], neighbors)
+        # broadcast the queued messages with a single append per neighbor
+        self.transport.relay(pending)
+        if self.trace is not None:
+            self.trace.flush()
+        # check the latest routing tables and MPR sets of the nodes against the topology
+        if self.convergence is not None:
+            self.convergence.observe(clock, self.topology, changes)
+
+    ''' tell whether every scripted change has settled, which needs a convergence monitor '''
+
+    def settled(self, clock: int) -> bool:
+        return self.convergence is not None and self.convergence.settled(clock, self.topology_changes.finished)
+
+    ''' run the simulation for 120 seconds, with tick i at epoch + i on the wall clock, returning the last tick '''
+
+    def run(self, epoch: float = None, until_converged: bool = False) -> int:
+        epoch = time() if epoch is None else epoch
         i = 0
         while i < 120:
-            # check if there is a topology update for the controller
-            self.update_topology(i)
-            # processes any messages for which a message from a node should be passed to its neighbors
-            for node, neighbors in self.topology.items():
-                with open('from%d' % node) as mf:
-                    lines = mf.read().splitlines()
-                    # start a new index 0 or start from the last index for the current node
-                    last_index = 0 if node not in self.indexes else self.indexes[node]
-                    # update the most recent index of the node to the length of the inbox file
-                    self.indexes[node] = len(lines)
-                    # process the newest messages from the node and broadcast them to the neighboring nodes
-                    for line in lines[last_index:]:
-                        for neighbor in neighbors:
-                            with open('to%d' % neighbor, 'a') as dest_file:
-                                dest_file.write(line + '\n')
-            # sleep the clock
-            sleep(1)
+            # wait for the clock, which does not drift with the time the ticks take
+            sleep_until(epoch + i)
+            self.tick(i)
+            # end early once the network has settled after the last scripted change
+            if until_converged and self.settled(i):
+                break
             i += 1
+        return min(i, 119)
 
 
 if __name__ == "__main__":
-    Controller().run()
+    # the wire format and transport can be switched through the environment, e.g. OLSR_WIRE=binary ./scenario1.sh
+    codec = get_codec(os.environ.get('OLSR_WIRE', 'text'))
+    transport = os.environ.get('OLSR_TRANSPORT', 'file')
+    if transport in ('udp', 'unix'):
+        from datagram import main_controller
+        main_controller(transport)
+    else:
+        controller = Controller(ControllerRingTransport(codec) if transport == 'ring' else ControllerFileTransport(codec))
+        # the snapshot<id> files of the nodes are checked when OLSR_CONVERGENCE is set, and =stop ends the run early
+        convergence = os.environ.get('OLSR_CONVERGENCE')
+        if convergence:
+            controller.convergence = ConvergenceMonitor(SnapshotFiles())
+        # every delivered message is logged to the trace directory named by OLSR_TRACE, see tracing.py
+        if os.environ.get('OLSR_TRACE'):
+            controller.trace = TraceRecorder(os.environ['OLSR_TRACE'])
+        # per-tick metrics are written to metrics-controller when OLSR_METRICS is set, see metrics.py
+        recorder = attach_controller(controller) if os.environ.get('OLSR_METRICS') else None
+        # start once every node of topology.txt is ready, on the epoch shared with the nodes
+        rendezvous = Rendezvous()
+        last = controller.run(gather_topology_nodes(rendezvous=rendezvous), until_converged=convergence == 'stop')
+        # the nodes end after the same tick
+        if convergence == 'stop':
+            rendezvous.stop(last)
+        if recorder is not None:
+            recorder.close()
+        if controller.trace is not None:
+            controller.trace.close()
+        # the rings warn about the frames they had to drop
+        if transport == 'ring':
+            controller.transport.close()
+        if convergence:
+            print_periods(controller.convergence.periods)
 
     print('controller finished.')
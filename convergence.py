@@ -0,0 +1,329 @@
+from hashlib import blake2b
+from struct import Struct, pack, unpack_from
+from typing import Iterable, List, Set
+
+from mpr import MPRSelection
+from transport import FileTail
+
+'''
+Convergence of the routing tables and MPR sets of the nodes to the ones implied by the topology of the controller.
+
+A node with a publisher attached publishes a snapshot of its routing table and MPR set, along with their digest,
+at the end of every tick which left either of them, or whether the node has data left to send, different from the last
+snapshot.
+Nodes running as processes append their snapshots to snapshot<id>, while simulation.py keeps them in memory.
+
+    snapshot    ==> <node:u16> <clock:u32> <digest:u64> <#routes:u16> <#mpr:u16> <pending:u8>
+                    (<destination:u16> <nexthop:u16>) * #routes <mpr:u16> * #mpr
+
+    pending     ==> 1 while the data message of the node is still to be sent, a data message or traffic packet
+                    passed through the node during the tick, or its flows are still running or its queue is not empty
+
+The monitor of the controller keeps the latest snapshot of every node, where a node which has not published one yet
+has no routes and no MPRs, and checks it against the ground truth of the link matrix:
+    - every route is a shortest path over the symmetric links, where any next hop on a shortest path will do
+    - the MPR set is the one mpr.py selects from the neighbors the node hears and their symmetric neighbors
+
+Every tick with scripted link changes starts a period, which converges at the clock of the node tick after which
+every node matched its ground truth, so its latency is exact to the tick. A run can end once the last scripted change
+has converged and stayed so for a few ticks, and no node has data messages or traffic pending.
+'''
+
+
+SNAPSHOT = Struct('!HIQHHB')
+
+# ticks the network has to stay converged after the last scripted change before a run ends early,
+# so that a match which only lasted until a stale entry expired does not end it
+SETTLE_TIME = 5
+
+
+''' 64 bit digest of a routing table and an MPR set '''
+
+
+def table_digest(routing_table: 'dict[int, int]', mprs: Iterable[int]) -> int:
+    routes = sorted(routing_table.items())
+    mprs = sorted(mprs)
+    data = pack('!H%dH%dH' % (2 * len(routes), len(mprs)), len(routes), *(n for route in routes for n in route), *mprs)
+    return int.from_bytes(blake2b(data, digest_size=8).digest(), 'big')
+
+
+''' Routing table and MPR set of a node at the end of a tick '''
+
+
+class Snapshot:
+    def __init__(self, node_id: int, clock: int, digest: int, routing_table: 'dict[int, int]', mprs: Set[int],
+                 pending: bool = False):
+        self.node_id: int = node_id
+        # tick of the node after which it held this state
+        self.clock: int = clock
+        self.digest: int = digest
+        self.routing_table: dict[int, int] = routing_table
+        self.mprs: Set[int] = mprs
+        # whether the node still had data messages or traffic to send or pass on
+        self.pending: bool = pending
+
+    def encode(self) -> bytes:
+        routes = sorted(self.routing_table.items())
+        mprs = sorted(self.mprs)
+        return SNAPSHOT.pack(self.node_id, self.clock, self.digest, len(routes), len(mprs), self.pending) + \
+            pack('!%dH' % (2 * len(routes) + len(mprs)), *(n for route in routes for n in route), *mprs)
+
+
+def decode_snapshot(frame: bytes) -> 'Snapshot':
+    node_id, clock, digest, route_count, mpr_count, pending = SNAPSHOT.unpack_from(frame)
+    numbers = unpack_from('!%dH' % (2 * route_count + mpr_count), frame, SNAPSHOT.size)
+    routes = numbers[:2 * route_count]
+    return Snapshot(
+        node_id, clock, digest, dict(zip(routes[::2], routes[1::2])), set(numbers[2 * route_count:]), bool(pending),
+    )
+
+
+''' Splits a stream of snapshot records into complete records, like the codecs of wire.py do for frames '''
+
+
+class SnapshotCodec:
+    def split(self, data: bytes) -> (List[bytes], bytes):
+        frames, offset = [], 0
+        while offset + SNAPSHOT.size <= len(data):
+            route_count, mpr_count = SNAPSHOT.unpack_from(data, offset)[3:5]
+            end = offset + SNAPSHOT.size + 4 * route_count + 2 * mpr_count
+            # a record which is still being written is kept for the next read
+            if end > len(data):
+                break
+            frames.append(data[offset:end])
+            offset = end
+        return frames, data[offset:]
+
+
+''' Snapshots published by the nodes of a simulation, held in memory until the monitor collects them '''
+
+
+class MemorySnapshots:
+    def __init__(self):
+        self.frames: List[bytes] = []
+
+    def publish(self, frame: bytes):
+        self.frames.append(frame)
+
+    def collect(self, node_ids: Iterable[int]) -> List[bytes]:
+        frames, self.frames = self.frames, []
+        return frames
+
+
+''' Node side of the snapshot files, appending every snapshot of the node to snapshot<id> '''
+
+
+class SnapshotFile:
+    def __init__(self, path: str):
+        # snapshots of a previous run are discarded
+        self.file = open(path, 'wb')
+
+    def publish(self, frame: bytes):
+        self.file.write(frame)
+        # make the snapshot visible to the controller straight away
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+''' Controller side of the snapshot files, following the snapshot<id> file of every node '''
+
+
+class SnapshotFiles:
+    def __init__(self):
+        self.tails: dict[int, 'FileTail'] = dict()
+
+    def collect(self, node_ids: Iterable[int]) -> List[bytes]:
+        frames = []
+        for node_id in node_ids:
+            if node_id not in self.tails:
+                self.tails[node_id] = FileTail('snapshot%d' % node_id, SnapshotCodec())
+            frames.extend(self.tails[node_id].read_frames())
+        return frames
+
+
+''' Publishes the snapshots of a node whenever its routing table, MPR set or pending data changed during a tick '''
+
+
+class SnapshotPublisher:
+    def __init__(self, node, sink):
+        self.node = node
+        # destination of the encoded snapshots, with a publish(frame) method
+        self.sink = sink
+        # state of the last snapshot, where the monitor starts out assuming that a node has no routes and no MPRs.
+        # comparing copies is cheaper than a digest, which is only computed for the snapshots that are published
+        self.routing_table: dict[int, int] = dict()
+        self.mprs: Set[int] = set()
+        self.pending: bool = False
+        # whether the routing table or the MPR set was recomputed since the last comparison
+        self.stale: bool = False
+        # whether data messages or traffic packets reached the node during the current tick
+        self.received: bool = False
+
+    ''' tell whether the node has data to send, or passed some on during the tick which is still on its way '''
+
+    def has_pending(self) -> bool:
+        node = self.node
+        # the data message is sent at its delay, or rescheduled when there was no route
+        if self.received or node.data_message[2] >= node.clock:
+            return True
+        traffic = node.traffic
+        return traffic is not None and (
+            bool(traffic.queue) or any(flow.stop >= node.clock for flow in traffic.flows)
+        )
+
+    def publish(self):
+        node = self.node
+        pending, self.received = self.has_pending(), False
+        changed = False
+        if self.stale:
+            self.stale = False
+            mprs = set(node.get_mprs())
+            if node.routing_table != self.routing_table or mprs != self.mprs:
+                self.routing_table, self.mprs = dict(node.routing_table), mprs
+                changed = True
+        if not changed and pending == self.pending:
+            return
+        self.pending = pending
+        digest = table_digest(self.routing_table, self.mprs)
+        self.sink.publish(Snapshot(node.node_id, node.clock, digest, self.routing_table, self.mprs, pending).encode())
+
+
+''' publish the snapshots of a node to the given sink, wrapping the methods of that one instance like metrics.py '''
+
+
+def attach_publisher(node, sink) -> 'SnapshotPublisher':
+    publisher = SnapshotPublisher(node, sink)
+    update_routing_table, select, flush = node.update_routing_table, node.mpr_selection.select, node.flush
+    handle_data_messages = node.handle_data_messages
+
+    def updated():
+        publisher.stale = True
+        update_routing_table()
+
+    def selected() -> Set[int]:
+        publisher.stale = True
+        return select()
+
+    def handled(data_messages: list):
+        publisher.received = publisher.received or bool(data_messages)
+        handle_data_messages(data_messages)
+
+    # the state at the end of the tick is published along with its messages
+    def flushed():
+        publisher.publish()
+        flush()
+
+    node.update_routing_table = updated
+    node.mpr_selection.select = selected
+    node.handle_data_messages = handled
+    node.flush = flushed
+    return publisher
+
+
+''' the MPR set every node selects once it has heard every neighbor, from the links of a link matrix '''
+
+
+def expected_mprs(topology) -> 'dict[int, Set[int]]':
+    links = {node_id: set(topology.neighbors(node_id)) for node_id in topology.ids}
+    # a node hears the HELLOs of the sources of its incoming links, which list their symmetric neighbors
+    heard: dict[int, Set[int]] = {node_id: set() for node_id in links}
+    for node_id, destinations in links.items():
+        for destination in destinations:
+            heard[destination].add(node_id)
+    symmetric = {node_id: {n for n in destinations if node_id in links[n]} for node_id, destinations in links.items()}
+    mprs = dict()
+    for node_id, neighbors in heard.items():
+        selection = MPRSelection()
+        for neighbor in neighbors:
+            selection.add_neighbor(neighbor)
+            selection.update_neighbor(neighbor, symmetric[neighbor] - {node_id})
+        mprs[node_id] = selection.select()
+    return mprs
+
+
+''' Compares the snapshots of the nodes against the ground truth of the controller every tick '''
+
+
+class ConvergenceMonitor:
+    def __init__(self, source, settle: int = SETTLE_TIME):
+        # where the snapshots of the nodes are collected from, with a collect(node_ids) method
+        self.source = source
+        # ticks the last period has to stay converged before the run is settled
+        self.settle: int = settle
+        # latest snapshot of every node which published one
+        self.snapshots: dict[int, 'Snapshot'] = dict()
+        # hop distances and MPR sets implied by the current topology
+        self.oracle = None
+        self.mprs: dict[int, Set[int]] = dict()
+        # nodes whose latest snapshot differs from the ground truth
+        self.unconverged: Set[int] = set()
+        # nodes whose latest snapshot has data messages or traffic pending, which keep the run going
+        self.pending: Set[int] = set()
+        # one entry per tick with link changes, as {'start', 'changes', 'converged'}
+        self.periods: List[dict] = []
+        # highest clock of the snapshots received during the current period
+        self.last_update: int = -1
+
+    ''' tell whether the latest state of a node matches the ground truth '''
+
+    def matches(self, node_id: int) -> bool:
+        snapshot = self.snapshots.get(node_id)
+        if snapshot is None:
+            return not self.oracle.reachable(node_id) and not self.mprs.get(node_id)
+        return snapshot.mprs == self.mprs.get(node_id, set()) and \
+            not self.oracle.check_routes(node_id, snapshot.routing_table)
+
+    ''' take in the snapshots published since the last tick, and the link changes of this tick '''
+
+    def observe(self, clock: int, topology, changes: int):
+        updated = set()
+        for frame in self.source.collect(topology.ids):
+            snapshot = decode_snapshot(frame)
+            self.snapshots[snapshot.node_id] = snapshot
+            self.last_update = max(self.last_update, snapshot.clock)
+            updated.add(snapshot.node_id)
+            if snapshot.pending:
+                self.pending.add(snapshot.node_id)
+            else:
+                self.pending.discard(snapshot.node_id)
+        if changes:
+            # a new ground truth, against which every node is checked again
+            self.oracle = topology.hop_distances()
+            self.mprs = expected_mprs(topology)
+            self.periods.append({'start': clock, 'changes': changes, 'converged': None})
+            self.last_update = -1
+            updated = set(topology.ids) | set(self.snapshots)
+        elif not self.periods:
+            return
+        for node_id in updated:
+            if self.matches(node_id):
+                self.unconverged.discard(node_id)
+            else:
+                self.unconverged.add(node_id)
+        period = self.periods[-1]
+        if self.unconverged:
+            period['converged'] = None
+        elif period['converged'] is None:
+            period['converged'] = max(period['start'], self.last_update)
+
+    ''' tell whether the last scripted change has converged for long enough, with no data left for the nodes to send '''
+
+    def settled(self, clock: int, finished: bool) -> bool:
+        return finished and not self.pending and bool(self.periods) and self.periods[-1]['converged'] is not None and \
+            clock - self.periods[-1]['converged'] >= self.settle
+
+
+''' print the convergence latency of every period '''
+
+
+def print_periods(periods: List[dict]):
+    print('%8s %8s %10s %8s' % ('change', 'links', 'converged', 'latency'))
+    for period in periods:
+        converged = period['converged']
+        print('%8d %8d %10s %8s' % (
+            period['start'], period['changes'],
+            '-' if converged is None else converged,
+            '-' if converged is None else converged - period['start'],
+        ))
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+import asyncio
+import os
+import socket
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+from time import time
+from typing import Callable, Iterable, List
+
+from controller import Controller
+from messages import HelloMessage, DATA_TYPES, TC_TYPES
+from node import OLSRNode
+from rendezvous import NODE_OFFSET, Rendezvous, gather_topology_nodes
+from traffic import TrafficAgent, print_summary, read_flows, summarize
+from wire import TextCodec, get_codec
+
+'''
+Event-driven mode where the nodes and the controller exchange datagrams over local sockets.
+
+Instead of polling files once per tick, every node sends each message as a datagram to the controller,
+which immediately forwards it to the neighbors of the sender in its topology map.
+A node handles every message as soon as it arrives, while its periodic HELLO/TC messages,
+scheduled data and timer expiry run as callbacks on the event loop once per simulated second.
+
+Sockets are either UDP on localhost (a port per node after the controller port),
+or Unix datagram sockets named controller.sock and node<id>.sock in the working directory.
+'''
+
+
+# first UDP port, used by the controller, followed by one port per node id
+BASE_PORT = 16390
+
+
+''' UDP addresses on localhost '''
+
+
+class UdpAddressing:
+    family = socket.AF_INET
+
+    def __init__(self, host: str = '127.0.0.1', base_port: int = BASE_PORT):
+        self.host: str = host
+        self.base_port: int = base_port
+
+    def controller(self):
+        return self.host, self.base_port
+
+    def node(self, node_id: int):
+        return self.host, self.base_port + 1 + node_id
+
+    def node_id(self, address) -> int:
+        return address[1] - self.base_port - 1
+
+    def prepare(self, address):
+        pass
+
+
+''' Unix datagram socket paths in the working directory '''
+
+
+class UnixAddressing:
+    family = socket.AF_UNIX
+
+    def controller(self):
+        return 'controller.sock'
+
+    def node(self, node_id: int):
+        return 'node%d.sock' % node_id
+
+    def node_id(self, address) -> int:
+        return int(address[len('node'):-len('.sock')])
+
+    ''' remove a stale socket file left behind by a previous run before binding '''
+
+    def prepare(self, address):
+        if os.path.exists(address):
+            os.unlink(address)
+
+
+ADDRESSING = {'udp': UdpAddressing, 'unix': UnixAddressing}
+
+# options of the node and controller processes which the datagram modes ignore, with what is lost
+UNSUPPORTED = {
+    # messages are handled as they arrive, outside of the phases of a tick which metrics.py times
+    'OLSR_METRICS': 'no metrics are recorded',
+    # the nodes publish no snapshots, and the controller has no monitor to check them or to end the run
+    'OLSR_CONVERGENCE': 'convergence is not reported and the run does not end early',
+    # datagrams are forwarded as they arrive, outside of the relay path which records the trace
+    'OLSR_TRACE': 'no message trace is recorded',
+}
+
+
+''' warn about the options set in the environment which the datagram modes ignore '''
+
+
+def warn_unsupported(entity: str):
+    for name, loss in UNSUPPORTED.items():
+        if os.environ.get(name):
+            print('%s: %s is not supported over datagram sockets, %s' % (entity, name, loss), file=sys.stderr)
+
+
+''' Datagram protocol which hands every received datagram to a callback '''
+
+
+class DatagramEndpoint(asyncio.DatagramProtocol):
+    def __init__(self, on_datagram: Callable[[bytes, object], None]):
+        self.on_datagram = on_datagram
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, address):
+        self.on_datagram(data, address)
+
+    def error_received(self, exc: Exception):
+        # a peer which is not listening (yet) behaves like a lost frame on the medium
+        pass
+
+
+''' run a coroutine on a new event loop until it completes, like asyncio.run which needs python 3.7 '''
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+''' bind a datagram endpoint at the given address '''
+
+
+async def open_endpoint(addressing, address, on_datagram: Callable[[bytes, object], None]) -> 'DatagramEndpoint':
+    addressing.prepare(address)
+    _, endpoint = await asyncio.get_event_loop().create_datagram_endpoint(
+        lambda: DatagramEndpoint(on_datagram),
+        local_addr=address,
+        family=addressing.family,
+    )
+    return endpoint
+
+
+''' call tick(i) for i = start ... start + count - 1, with tick i running at epoch + i * second '''
+
+
+async def run_ticks(tick: Callable[[int], None], epoch: float, second: float, start: int, count: int):
+    loop = asyncio.get_event_loop()
+    finished = loop.create_future()
+
+    def step(i: int):
+        tick(i)
+        if i + 1 < start + count:
+            loop.call_at(epoch + (i + 1) * second, step, i + 1)
+        else:
+            finished.set_result(None)
+
+    loop.call_at(epoch + start * second, step, start)
+    await finished
+
+
+''' Node side of the datagram transport, where received messages are pushed to the node instead of being polled '''
+
+
+class DatagramNodeTransport:
+    def __init__(self, node_id: int, addressing, codec=None):
+        self.node_id: int = node_id
+        self.addressing = addressing
+        # wire format of the datagrams
+        self.codec = codec if codec is not None else TextCodec()
+        # endpoint bound to the address of the node, opened by start()
+        self.endpoint: 'DatagramEndpoint' = None
+        # node which handles the received messages
+        self.node: 'OLSRNode' = None
+
+        # data messages that reached this node are still recorded in a text file
+        Path('recieved%d' % node_id).touch()
+
+    ''' bind the socket of the node and start handling messages on arrival '''
+
+    async def start(self, node: 'OLSRNode'):
+        self.node = node
+        self.endpoint = await open_endpoint(self.addressing, self.addressing.node(self.node_id), self.datagram_received)
+
+    ''' handle the messages of a datagram straight away, repairing the routing table if they changed it '''
+
+    def datagram_received(self, data: bytes, address):
+        frames, _ = self.codec.split(data)
+        hello_msgs, tc_msgs, data_msgs = [], [], []
+        for frame in frames:
+            message = self.codec.decode(frame)
+            if type(message) is HelloMessage:
+                hello_msgs.append(message)
+            elif type(message) in TC_TYPES:
+                tc_msgs.append(message)
+            elif type(message) in DATA_TYPES and message.next_hop == self.node_id:
+                data_msgs.append(message)
+        self.node.changes_detected = False
+        self.node.handle_messages(hello_msgs, tc_msgs, data_msgs)
+        if self.node.changes_detected:
+            self.node.update_routing_table()
+        self.node.flush()
+
+    ''' messages are handled on arrival, so there is never anything to poll '''
+
+    def receive(self) -> list:
+        return []
+
+    ''' send a message frame to the controller as a single datagram '''
+
+    def send(self, frame):
+        self.endpoint.transport.sendto(self.codec.join([frame]), self.addressing.controller())
+
+    ''' record a data message that reached its destination '''
+
+    def deliver(self, message: str):
+        with open('recieved%d' % self.node_id, 'a') as recieved_messages:
+            recieved_messages.write(message + '\n')
+
+    ''' every frame goes out as its own datagram when it is sent, so there is nothing to write out '''
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.endpoint is not None:
+            self.endpoint.transport.close()
+
+
+''' run a node whose transport was started until its last tick, with the periodic work scheduled once per second '''
+
+
+async def run_node(node: 'OLSRNode', epoch: float, second: float = 1.0, duration: int = 120):
+    def tick(i: int):
+        node.clock = i
+        node.changes_detected = False
+        node.send_scheduled_messages(i)
+        node.expire_entries()
+        if node.changes_detected:
+            node.update_routing_table()
+        node.flush()
+        # messages arriving from now on are handled as part of the next tick
+        node.clock = i + 1
+
+    try:
+        await run_ticks(tick, epoch, second, 1, duration)
+    finally:
+        node.transport.close()
+
+
+''' Controller which forwards every datagram to the neighbors of its sender as soon as it arrives '''
+
+
+class DatagramController:
+    def __init__(self, addressing, topology: Iterable[str] = None):
+        self.addressing = addressing
+        # the controller keeps the topology map, while this object stands in as its transport
+        self.controller: 'Controller' = Controller(transport=self, topology=topology)
+        self.endpoint: 'DatagramEndpoint' = None
+
+    def datagram_received(self, data: bytes, address):
+        sender = self.addressing.node_id(address)
+        for neighbor in self.controller.topology.neighbors(sender):
+            self.endpoint.transport.sendto(data, self.addressing.node(neighbor))
+
+    ''' messages are forwarded on arrival, so the controller tick has nothing to collect or relay '''
+
+    def collect(self, node_id: int) -> list:
+        return []
+
+    def relay(self, pending: 'dict[int, list]'):
+        pass
+
+    ''' run the topology changes until the last tick '''
+
+    async def run(self, epoch: float, second: float = 1.0, duration: int = 120):
+        self.endpoint = await open_endpoint(self.addressing, self.addressing.controller(), self.datagram_received)
+        try:
+            await run_ticks(self.controller.update_topology, epoch, second, 0, duration)
+        finally:
+            self.endpoint.transport.close()
+
+
+''' create a node which uses the datagram transport '''
+
+
+def datagram_node(node_id: int, addressing, codec=None, differential_tc: bool = False) -> 'OLSRNode':
+    codec = codec if codec is not None else TextCodec()
+    return OLSRNode(
+        node_id,
+        transport=DatagramNodeTransport(node_id, addressing, codec),
+        codec=codec,
+        differential_tc=differential_tc,
+    )
+
+
+''' event loop time of a wall clock epoch announced through the rendezvous files '''
+
+
+def loop_time(epoch: float) -> float:
+    return asyncio.get_event_loop().time() + epoch - time()
+
+
+''' run a single node process, starting its clock on the epoch announced by the controller '''
+
+
+def main_node(node_id: int, message: (int, str, int), mode: str, codec=None, differential_tc: bool = False,
+              flows: List['Flow'] = None):
+    warn_unsupported('node %d' % node_id)
+
+    async def main():
+        node = datagram_node(node_id, ADDRESSING[mode](), codec, differential_tc)
+        node.data_message = message
+        # packets which arrive between two ticks are queued, and sent by the next one
+        if flows is not None:
+            node.traffic = TrafficAgent(node_id, flows, log_path='traffic%d' % node_id)
+        # register only once the socket is bound, like the file and ring transports register once their files exist
+        await node.transport.start(node)
+        epoch = Rendezvous().join(node_id)
+        await run_node(node, loop_time(epoch + NODE_OFFSET))
+
+    run(main())
+
+
+''' run the controller process, starting its clock once every node of topology.txt is ready '''
+
+
+def main_controller(mode: str):
+    warn_unsupported('controller')
+
+    async def main():
+        controller = DatagramController(ADDRESSING[mode]())
+        await controller.run(loop_time(gather_topology_nodes()))
+
+    run(main())
+
+
+''' run a whole scenario inside one event loop, with every entity on its own socket '''
+
+
+async def run_scenario(topology: Iterable[str], nodes: Iterable[tuple], mode: str = 'udp', wire: str = 'text',
+                       second: float = 1.0, duration: int = 120, differential_tc: bool = False,
+                       flows: Iterable[str] = None) -> 'dict[int, OLSRNode]':
+    addressing = ADDRESSING[mode]()
+    codec = get_codec(wire)
+    controller = DatagramController(addressing, topology)
+    olsr_nodes = dict()
+    for node_id, destination_id, message, delay in nodes:
+        olsr_nodes[node_id] = datagram_node(node_id, addressing, codec, differential_tc)
+        if node_id != destination_id:
+            olsr_nodes[node_id].data_message = (destination_id, message, delay)
+    # every node queues generated traffic when there is a flow specification, keeping its records in memory
+    if flows is not None:
+        flows = read_flows(flows)
+        for node_id, node in olsr_nodes.items():
+            node.traffic = TrafficAgent(node_id, flows)
+    for node in olsr_nodes.values():
+        await node.transport.start(node)
+    epoch = asyncio.get_event_loop().time() + second
+    await asyncio.gather(
+        controller.run(epoch, second, duration),
+        *(run_node(node, epoch, second, duration) for node in olsr_nodes.values()),
+    )
+    return olsr_nodes
+
+
+if __name__ == "__main__":
+    from simulation import load_scenario
+
+    parser = ArgumentParser(description='run a scenario script over local datagram sockets in one event loop')
+    parser.add_argument('scenario', help='scenario script such as scenario1.sh')
+    parser.add_argument('--mode', default='udp', choices=sorted(ADDRESSING), help='socket type')
+    parser.add_argument('--wire', default='text', choices=['text', 'binary'], help='wire format of the messages')
+    parser.add_argument('--second', type=float, default=1.0, help='wall clock length of a simulated second')
+    parser.add_argument('--duration', type=int, default=120, help='simulated seconds to run')
+    parser.add_argument('--differential-tc', action='store_true', help='advertise MPR selector changes in TC deltas')
+    parser.add_argument('--flows', help='flow specification of generated traffic, see traffic.py')
+    args = parser.parse_args()
+
+    flows = None
+    if args.flows:
+        with open(args.flows) as flow_file:
+            flows = flow_file.readlines()
+    result = run(run_scenario(
+        *load_scenario(args.scenario), args.mode, args.wire, args.second, args.duration, args.differential_tc, flows,
+    ))
+    for node_id, node in sorted(result.items()):
+        print('node %d routes %s' % (node_id, dict(sorted(node.routing_table.items()))))
+    if flows is not None:
+        print_summary(summarize([record for node in result.values() for record in node.traffic.records]))
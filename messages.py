@@ -0,0 +1,236 @@
+from typing import List
+
+'''
+Typed records for the HELLO, TC and DATA messages described in node.py,
+for the TC deltas and full TC requests sent by nodes which advertise differentially,
+and for the packets of generated traffic flows (see traffic.py).
+
+Every message is split once when it is parsed, and is only turned back into text when it gets sent or forwarded.
+'''
+
+
+''' HELLO message: * <node> HELLO UNIDIR <neighbor> ... BIDIR <neighbor> ... MPR <neighbor> ... '''
+
+
+class HelloMessage:
+    __slots__ = ('sender', 'unidir', 'bidir', 'mpr')
+
+    def __init__(self, sender: int, unidir: List[int], bidir: List[int], mpr: List[int]):
+        self.sender: int = sender
+        self.unidir: List[int] = unidir
+        self.bidir: List[int] = bidir
+        self.mpr: List[int] = mpr
+
+    def encode(self) -> str:
+        return '* %d HELLO UNIDIR %s BIDIR %s MPR %s' % (
+            self.sender,
+            ' '.join(map(str, self.unidir)),
+            ' '.join(map(str, self.bidir)),
+            ' '.join(map(str, self.mpr)),
+        )
+
+
+''' TC message: * <fromnbr> TC <srcnode> <seqno> MS <msnode> ... <msnode> '''
+
+
+class TCMessage:
+    __slots__ = ('sender', 'source', 'sequence', 'mpr_selectors')
+
+    def __init__(self, sender: int, source: int, sequence: int, mpr_selectors: List[int]):
+        self.sender: int = sender
+        self.source: int = source
+        self.sequence: int = sequence
+        self.mpr_selectors: List[int] = mpr_selectors
+
+    def encode(self) -> str:
+        return '* %d TC %d %d MS %s' % (
+            self.sender,
+            self.source,
+            self.sequence,
+            ' '.join(map(str, self.mpr_selectors)),
+        )
+
+
+''' TC delta: * <fromnbr> TCD <srcnode> <seqno> +<msnode> ... -<msnode> ..., applying to the TC of seqno - 1 '''
+
+
+class TCDeltaMessage:
+    __slots__ = ('sender', 'source', 'sequence', 'added', 'removed')
+
+    def __init__(self, sender: int, source: int, sequence: int, added: List[int], removed: List[int]):
+        self.sender: int = sender
+        self.source: int = source
+        self.sequence: int = sequence
+        self.added: List[int] = added
+        self.removed: List[int] = removed
+
+    def encode(self) -> str:
+        # an unchanged set is advertised by the header alone
+        return '* %d TCD %d %d%s%s' % (
+            self.sender,
+            self.source,
+            self.sequence,
+            ''.join(' +%d' % selector for selector in self.added),
+            ''.join(' -%d' % selector for selector in self.removed),
+        )
+
+
+''' full TC request: <nxthop> <fromnbr> TCREQ <srcnode> <seqno>, routed to the source of a missed delta '''
+
+
+class TCRequestMessage:
+    __slots__ = ('next_hop', 'sender', 'source', 'sequence')
+
+    def __init__(self, next_hop: int, sender: int, source: int, sequence: int):
+        self.next_hop: int = next_hop
+        self.sender: int = sender
+        self.source: int = source
+        self.sequence: int = sequence
+
+    def encode(self) -> str:
+        return '%d %d TCREQ %d %d' % (self.next_hop, self.sender, self.source, self.sequence)
+
+
+# flooded topology control messages, which nodes handle together
+TC_TYPES = (TCMessage, TCDeltaMessage, TCRequestMessage)
+
+
+''' DATA message: <nxthop> <fromnbr> DATA <srcnode> <dstnode> <string> '''
+
+
+class DataMessage:
+    __slots__ = ('next_hop', 'sender', 'source', 'destination', 'payload')
+
+    def __init__(self, next_hop: int, sender: int, source: int, destination: int, payload: str):
+        self.next_hop: int = next_hop
+        self.sender: int = sender
+        self.source: int = source
+        self.destination: int = destination
+        self.payload: str = payload
+
+    def encode(self) -> str:
+        return '%d %d DATA %d %d %s' % (
+            self.next_hop,
+            self.sender,
+            self.source,
+            self.destination,
+            self.payload,
+        )
+
+
+''' traffic packet: <nxthop> <fromnbr> PKT <srcnode> <dstnode> <flow> <seqno> <sent> <hops> <string> '''
+
+
+class PacketMessage:
+    __slots__ = ('next_hop', 'sender', 'source', 'destination', 'flow', 'sequence', 'sent', 'hops', 'payload')
+
+    def __init__(self, next_hop: int, sender: int, source: int, destination: int, flow: int, sequence: int, sent: int,
+                 hops: int, payload: str):
+        self.next_hop: int = next_hop
+        self.sender: int = sender
+        self.source: int = source
+        self.destination: int = destination
+        # flow the packet belongs to and its number within the flow
+        self.flow: int = flow
+        self.sequence: int = sequence
+        # clock value at which the source generated the packet
+        self.sent: int = sent
+        # number of links the packet has crossed
+        self.hops: int = hops
+        self.payload: str = payload
+
+    def encode(self) -> str:
+        return '%d %d PKT %d %d %d %d %d %d %s' % (
+            self.next_hop,
+            self.sender,
+            self.source,
+            self.destination,
+            self.flow,
+            self.sequence,
+            self.sent,
+            self.hops,
+            self.payload,
+        )
+
+
+# routed messages, which are only handled by their next hop
+DATA_TYPES = (DataMessage, PacketMessage)
+
+
+''' parse the fields of a HELLO message following the HELLO keyword '''
+
+
+def parse_hello(sender: int, content: str) -> 'HelloMessage':
+    # cut the content at the section headings, which never collide with numeric node ids
+    unidir, _, rest = content.partition('BIDIR')
+    bidir, _, mpr = rest.partition('MPR')
+    return HelloMessage(
+        sender,
+        list(map(int, unidir[len('UNIDIR'):].split())),
+        list(map(int, bidir.split())),
+        list(map(int, mpr.split())),
+    )
+
+
+''' parse the fields of a TC message following the TC keyword '''
+
+
+def parse_tc(sender: int, content: str) -> 'TCMessage':
+    source, sequence, _MS, *ms_list = content.split()
+    return TCMessage(sender, int(source), int(sequence), list(map(int, ms_list)))
+
+
+''' parse the fields of a TC delta following the TCD keyword '''
+
+
+def parse_tc_delta(sender: int, content: str) -> 'TCDeltaMessage':
+    source, sequence, *changes = content.split()
+    # the sign in front of every selector tells whether it was added or removed
+    added = [int(change[1:]) for change in changes if change[0] == '+']
+    removed = [int(change[1:]) for change in changes if change[0] == '-']
+    return TCDeltaMessage(sender, int(source), int(sequence), added, removed)
+
+
+''' parse the fields of a full TC request following the TCREQ keyword '''
+
+
+def parse_tc_request(next_hop: str, sender: int, content: str) -> 'TCRequestMessage':
+    source, sequence = content.split()
+    return TCRequestMessage(int(next_hop), sender, int(source), int(sequence))
+
+
+''' parse the fields of a DATA message following the DATA keyword '''
+
+
+def parse_data(next_hop: str, sender: int, content: str) -> 'DataMessage':
+    # the payload is the rest of the line, and may contain spaces itself
+    source, destination, payload = content.split(' ', 2)
+    return DataMessage(int(next_hop), sender, int(source), int(destination), payload)
+
+
+''' parse the fields of a traffic packet following the PKT keyword '''
+
+
+def parse_packet(next_hop: str, sender: int, content: str) -> 'PacketMessage':
+    *fields, payload = content.split(' ', 6)
+    return PacketMessage(int(next_hop), sender, *map(int, fields), payload)
+
+
+''' parse a single message into one of the message records, returning None for unknown types '''
+
+
+def parse_message(message: str):
+    next_hop, sender, kind, content = message.split(' ', 3)
+    if kind == 'HELLO':
+        return parse_hello(int(sender), content)
+    if kind == 'TC':
+        return parse_tc(int(sender), content)
+    if kind == 'TCD':
+        return parse_tc_delta(int(sender), content)
+    if kind == 'TCREQ':
+        return parse_tc_request(next_hop, int(sender), content)
+    if kind == 'DATA':
+        return parse_data(next_hop, int(sender), content)
+    if kind == 'PKT':
+        return parse_packet(next_hop, int(sender), content)
+    return None
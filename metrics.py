@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+import glob
+import json
+import os
+from argparse import ArgumentParser
+from struct import Struct
+from time import perf_counter
+from typing import List, Tuple
+
+'''
+Optional per-tick instrumentation of the nodes and the controller.
+
+Attaching metrics to a node or the controller wraps the methods on its hot path on that one instance,
+so an entity without metrics runs exactly the same code as before and pays nothing.
+Once attached, every tick appends one fixed-size record to a binary file named metrics<id> (metrics-controller
+for the controller) holding the seconds spent in each phase of the tick and the counters of that tick.
+
+    file    ==> <magic:4s> <kind:u8> <id:u16> <#timers:u8> <#counters:u8> <record> ...
+    record  ==> <tick:u32> <seconds:f32> * #timers <count:u32> * #counters
+
+Phases are exclusive: a timed call nested in another phase only counts for its own phase, so parsing does not include
+reading, handling HELLO messages does not include MPR selection, and handling TC and data messages does not include
+sending the messages they forward, while the tick phase holds the whole tick. A tick overruns when it takes longer than
+its period.
+Running this module merges the files of every entity into a summary.
+'''
+
+
+MAGIC = b'OLSM'
+HEADER = Struct('<4sBHBB')
+
+NODE_KIND = 0
+CONTROLLER_KIND = 1
+
+NODE_TIMERS = ('tick', 'read', 'parse', 'hello', 'tc', 'data', 'mpr', 'routing', 'send')
+NODE_COUNTERS = (
+    'hello_in', 'tc_in', 'data_in', 'bytes_in', 'hello_out', 'tc_out', 'data_out', 'bytes_out', 'recomputes', 'overruns',
+)
+CONTROLLER_TIMERS = ('tick', 'topology', 'collect', 'fanout', 'relay', 'convergence', 'trace')
+CONTROLLER_COUNTERS = ('frames_in', 'bytes_in', 'frames_out', 'bytes_out', 'overruns')
+
+FIELDS = {NODE_KIND: (NODE_TIMERS, NODE_COUNTERS), CONTROLLER_KIND: (CONTROLLER_TIMERS, CONTROLLER_COUNTERS)}
+
+
+''' Per-tick accumulators which are written out as one record at the end of every tick '''
+
+
+class Recorder:
+    def __init__(self, path: str, kind: int, entity_id: int, period: float = 1.0):
+        self.timers, self.counters = FIELDS[kind]
+        self.record_format: Struct = Struct('<I%df%dI' % (len(self.timers), len(self.counters)))
+        # seconds and counts of the current tick, indexed like the field names
+        self.seconds: List[float] = [0.0] * len(self.timers)
+        self.counts: List[int] = [0] * len(self.counters)
+        # a tick taking longer than this many seconds is an overrun
+        self.period: float = period
+        # timer of the phase running at the moment, whose time excludes the phases nested in it
+        self.active: int = None
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, kind, entity_id, len(self.timers), len(self.counters)))
+
+    ''' wrap a method of an instance so that its duration goes to a timer instead of the phase it runs in '''
+
+    def time(self, owner, name: str, timer: str, on_result=None):
+        method = getattr(owner, name)
+        slot = self.timers.index(timer)
+        seconds = self.seconds
+
+        def timed(*args):
+            # the tick holds every phase, so it does not enclose any of them
+            outer = self.active
+            if slot:
+                self.active = slot
+            start = perf_counter()
+            result = method(*args)
+            elapsed = perf_counter() - start
+            self.active = outer
+            seconds[slot] += elapsed
+            if slot and outer is not None:
+                seconds[outer] -= elapsed
+            if on_result is not None:
+                on_result(args, result)
+            return result
+
+        setattr(owner, name, timed)
+
+    def add(self, counter: str, value: int = 1):
+        self.counts[self.counters.index(counter)] += value
+
+    ''' write the record of a tick and start the next one '''
+
+    def record(self, tick: int):
+        if self.seconds[0] > self.period:
+            self.add('overruns')
+        self.file.write(self.record_format.pack(tick, *self.seconds, *self.counts))
+        self.seconds[:] = [0.0] * len(self.timers)
+        self.counts[:] = [0] * len(self.counts)
+
+    def close(self):
+        self.file.close()
+
+
+''' message type of a frame in either wire format, counting TC deltas and requests as TC and packets as DATA '''
+
+
+def frame_kind(frame) -> str:
+    if isinstance(frame, str):
+        kind = frame.split(' ', 3)[2]
+        return 'TC' if kind.startswith('TC') else 'DATA' if kind == 'PKT' else kind
+    return {1: 'HELLO', 2: 'TC', 3: 'DATA', 4: 'TC', 5: 'TC', 6: 'DATA'}.get(frame[4])
+
+
+''' instrument a node, writing its records to metrics<id> '''
+
+
+def attach_node(node, path: str = None, period: float = 1.0) -> 'Recorder':
+    recorder = Recorder(path or 'metrics%d' % node.node_id, NODE_KIND, node.node_id, period)
+
+    def received(args, frames):
+        recorder.add('bytes_in', sum(len(frame) for frame in frames))
+
+    def parsed(args, messages):
+        hello_msgs, tc_msgs, data_msgs = messages
+        recorder.add('hello_in', len(hello_msgs))
+        recorder.add('tc_in', len(tc_msgs))
+        recorder.add('data_in', len(data_msgs))
+
+    def sent(args, result):
+        frame = args[0]
+        recorder.add(frame_kind(frame).lower() + '_out')
+        recorder.add('bytes_out', len(frame))
+
+    def recomputed(args, result):
+        recorder.add('recomputes')
+
+    def ticked(args, result):
+        recorder.record(args[0])
+
+    recorder.time(node.transport, 'receive', 'read', received)
+    recorder.time(node.transport, 'send', 'send', sent)
+    recorder.time(node.transport, 'flush', 'send')
+    recorder.time(node, 'read_latest_messages', 'parse', parsed)
+    recorder.time(node, 'handle_hello_messages', 'hello')
+    recorder.time(node, 'handle_tc_messages', 'tc')
+    recorder.time(node, 'handle_data_messages', 'data')
+    recorder.time(node.mpr_selection, 'select', 'mpr')
+    recorder.time(node, 'update_routing_table', 'routing', recomputed)
+    recorder.time(node, 'tick', 'tick', ticked)
+    return recorder
+
+
+''' instrument the controller, writing its records to metrics-controller '''
+
+
+def attach_controller(controller, path: str = 'metrics-controller', period: float = 1.0) -> 'Recorder':
+    recorder = Recorder(path, CONTROLLER_KIND, 0, period)
+    timers = recorder.timers
+
+    def collected(args, frames):
+        recorder.add('frames_in', len(frames))
+        recorder.add('bytes_in', sum(len(frame) for frame in frames))
+
+    def relayed(args, result):
+        for frames in args[0].values():
+            recorder.add('frames_out', len(frames))
+            recorder.add('bytes_out', sum(len(frame) for frame in frames))
+
+    def ticked(args, result):
+        # the fan-out is whatever the tick spent outside of the other phases
+        seconds = recorder.seconds
+        seconds[timers.index('fanout')] = seconds[0] - sum(seconds[1:])
+        recorder.record(args[0])
+
+    recorder.time(controller.transport, 'collect', 'collect', collected)
+    recorder.time(controller.transport, 'relay', 'relay', relayed)
+    recorder.time(controller, 'update_topology', 'topology')
+    # the convergence monitor and the trace have to be set before the metrics are attached for them to be timed
+    if controller.convergence is not None:
+        recorder.time(controller.convergence, 'observe', 'convergence')
+    if controller.trace is not None:
+        recorder.time(controller.trace, 'record', 'trace')
+        recorder.time(controller.trace, 'flush', 'trace')
+    recorder.time(controller, 'tick', 'tick', ticked)
+    return recorder
+
+
+''' read a metrics file as (kind, id, timer names, counter names, records) '''
+
+
+def read_metrics(path: str) -> Tuple[int, int, tuple, tuple, List[tuple]]:
+    with open(path, 'rb') as metrics_file:
+        data = metrics_file.read()
+    magic, kind, entity_id, timer_count, counter_count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('%s is not a metrics file' % path)
+    timers, counters = FIELDS[kind]
+    record_format = Struct('<I%df%dI' % (timer_count, counter_count))
+    # a record which was cut short by an interrupted run is ignored
+    end = HEADER.size + (len(data) - HEADER.size) // record_format.size * record_format.size
+    return kind, entity_id, timers, counters, list(record_format.iter_unpack(data[HEADER.size:end]))
+
+
+''' merge the records of every file into totals per field, for the nodes and the controller separately '''
+
+
+def summarize(paths: List[str]) -> dict:
+    summary = dict()
+    for path in paths:
+        kind, entity_id, timers, counters, records = read_metrics(path)
+        group = summary.setdefault('controller' if kind == CONTROLLER_KIND else 'nodes', {
+            'entities': 0,
+            'ticks': 0,
+            'seconds': {timer: 0.0 for timer in timers},
+            'max_tick_seconds': 0.0,
+            'slowest': None,
+            'counts': {counter: 0 for counter in counters},
+        })
+        group['entities'] += 1
+        group['ticks'] += len(records)
+        for record in records:
+            for timer, value in zip(timers, record[1:]):
+                group['seconds'][timer] += value
+            for counter, value in zip(counters, record[1 + len(timers):]):
+                group['counts'][counter] += value
+            if record[1] > group['max_tick_seconds']:
+                group['max_tick_seconds'] = record[1]
+                group['slowest'] = {'entity': entity_id, 'tick': record[0]}
+    return summary
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='merge the metrics files of every node and the controller')
+    parser.add_argument('paths', nargs='*', help='metrics files, those of every node and the controller by default')
+    parser.add_argument('--json', action='store_true', help='print the summary as JSON')
+    args = parser.parse_args()
+
+    # the numbered files of the nodes and the controller file, leaving out this module
+    paths = args.paths or sorted(glob.glob('metrics[0-9]*') + glob.glob('metrics-controller'))
+    summary = summarize([path for path in paths if os.path.isfile(path)])
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        for name, group in summary.items():
+            ticks = max(group['ticks'], 1)
+            print('%s: %d entities, %d ticks, slowest tick %.3f ms (%s)' % (
+                name, group['entities'], group['ticks'], group['max_tick_seconds'] * 1000, group['slowest'],
+            ))
+            for timer, seconds in group['seconds'].items():
+                print('  %-12s %10.3f s total %10.3f ms/tick' % (timer, seconds, seconds * 1000 / ticks))
+            for counter, count in group['counts'].items():
+                print('  %-12s %10d total %10.2f /tick' % (counter, count, count / ticks))
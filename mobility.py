@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+import math
+import random
+import sys
+from argparse import ArgumentParser
+from typing import Iterator, List, Set
+
+'''
+Mobility models which generate topology scripts for the controller.
+
+Nodes move inside a rectangular area and are linked whenever they are within radio range of each other (unit disk),
+so every second the links which formed or broke since the previous second are written as UP/DOWN changes in both
+directions.
+The changes come out in time order one second at a time, so a trace of any length can be piped into a file
+and streamed by the controller.
+
+    random waypoint ==> each node walks to a random point at a random speed, pauses there, and picks the next point
+    random walk     ==> each node walks in a random direction at a random speed, reflecting off the borders,
+                        and picks a new direction and speed at a fixed interval
+'''
+
+
+''' Random waypoint model, where nodes travel between random points in the area and pause at each of them '''
+
+
+class RandomWaypoint:
+    def __init__(self, nodes: int, width: float, height: float, speed: (float, float) = (1.0, 5.0),
+                 pause: int = 0, rng: random.Random = None):
+        self.width: float = width
+        self.height: float = height
+        self.speed: (float, float) = speed
+        self.pause: int = pause
+        self.rng: random.Random = rng if rng is not None else random.Random()
+        # current position of every node
+        self.positions: List[List[float]] = [[self.rng.uniform(0, width), self.rng.uniform(0, height)] for _ in range(nodes)]
+        # waypoint each node is travelling to and its speed on the way there
+        self.targets: List[List[float]] = [self.waypoint() for _ in range(nodes)]
+        self.speeds: List[float] = [self.rng.uniform(*speed) for _ in range(nodes)]
+        # seconds each node still waits at its current waypoint
+        self.waiting: List[int] = [0] * nodes
+
+    def waypoint(self) -> List[float]:
+        return [self.rng.uniform(0, self.width), self.rng.uniform(0, self.height)]
+
+    ''' move every node for one second '''
+
+    def step(self):
+        for node, position in enumerate(self.positions):
+            if self.waiting[node] > 0:
+                self.waiting[node] -= 1
+                continue
+            target = self.targets[node]
+            dx, dy = target[0] - position[0], target[1] - position[1]
+            distance = math.hypot(dx, dy)
+            if distance <= self.speeds[node]:
+                # arrive at the waypoint, then pause before heading to the next one
+                position[0], position[1] = target
+                self.targets[node] = self.waypoint()
+                self.speeds[node] = self.rng.uniform(*self.speed)
+                self.waiting[node] = self.pause
+            else:
+                position[0] += dx / distance * self.speeds[node]
+                position[1] += dy / distance * self.speeds[node]
+
+
+''' Random walk model, where nodes change direction and speed at a fixed interval and reflect off the borders '''
+
+
+class RandomWalk:
+    def __init__(self, nodes: int, width: float, height: float, speed: (float, float) = (1.0, 5.0),
+                 interval: int = 10, rng: random.Random = None):
+        self.width: float = width
+        self.height: float = height
+        self.speed: (float, float) = speed
+        self.interval: int = interval
+        self.rng: random.Random = rng if rng is not None else random.Random()
+        # current position of every node
+        self.positions: List[List[float]] = [[self.rng.uniform(0, width), self.rng.uniform(0, height)] for _ in range(nodes)]
+        # distance travelled per second along each axis
+        self.velocities: List[List[float]] = [self.velocity() for _ in range(nodes)]
+        # seconds elapsed since the last change of direction
+        self.elapsed: int = 0
+
+    def velocity(self) -> List[float]:
+        angle = self.rng.uniform(0, 2 * math.pi)
+        speed = self.rng.uniform(*self.speed)
+        return [math.cos(angle) * speed, math.sin(angle) * speed]
+
+    ''' move every node for one second '''
+
+    def step(self):
+        self.elapsed += 1
+        if self.elapsed == self.interval:
+            self.elapsed = 0
+            self.velocities = [self.velocity() for _ in self.positions]
+        for position, velocity in zip(self.positions, self.velocities):
+            for axis, limit in enumerate((self.width, self.height)):
+                position[axis] += velocity[axis]
+                # bounce back into the area
+                if position[axis] < 0:
+                    position[axis], velocity[axis] = -position[axis], -velocity[axis]
+                elif position[axis] > limit:
+                    position[axis], velocity[axis] = 2 * limit - position[axis], -velocity[axis]
+
+
+MODELS = {'waypoint': RandomWaypoint, 'walk': RandomWalk}
+
+
+''' pairs (a, b) with a < b of nodes within radio range, found by bucketing the positions into cells of the range '''
+
+
+def unit_disk_links(positions: List[List[float]], radius: float) -> Set[tuple]:
+    cells: dict[tuple, list] = dict()
+    for node, (x, y) in enumerate(positions):
+        cells.setdefault((int(x // radius), int(y // radius)), []).append(node)
+    links = set()
+    limit = radius * radius
+    for (cx, cy), members in cells.items():
+        # only nodes in the same or an adjacent cell can be in range
+        for nx in (cx - 1, cx, cx + 1):
+            for ny in (cy - 1, cy, cy + 1):
+                for other in cells.get((nx, ny), ()):
+                    ox, oy = positions[other]
+                    for node in members:
+                        if node < other:
+                            x, y = positions[node]
+                            if (x - ox) * (x - ox) + (y - oy) * (y - oy) <= limit:
+                                links.add((node, other))
+    return links
+
+
+''' yield the lines of a topology script for the links formed and broken by a mobility model each second '''
+
+
+def link_changes(model, radius: float, duration: int) -> Iterator[str]:
+    links = set()
+    for clock in range(duration):
+        current = unit_disk_links(model.positions, radius)
+        for a, b in sorted(current - links):
+            yield '%d UP %d %d\n%d UP %d %d\n' % (clock, a, b, clock, b, a)
+        for a, b in sorted(links - current):
+            yield '%d DOWN %d %d\n%d DOWN %d %d\n' % (clock, a, b, clock, b, a)
+        links = current
+        model.step()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='write a topology script for nodes moving under a mobility model')
+    parser.add_argument('--model', default='waypoint', choices=sorted(MODELS), help='mobility model')
+    parser.add_argument('--nodes', type=int, default=50, help='number of nodes')
+    parser.add_argument('--size', type=float, nargs=2, default=(1000.0, 1000.0), metavar=('WIDTH', 'HEIGHT'),
+                        help='dimensions of the area')
+    parser.add_argument('--range', type=float, default=200.0, help='radio range of every node')
+    parser.add_argument('--speed', type=float, nargs=2, default=(1.0, 5.0), metavar=('MIN', 'MAX'),
+                        help='range of speeds in distance per second')
+    parser.add_argument('--pause', type=int, default=10, help='seconds spent at each waypoint (waypoint model)')
+    parser.add_argument('--interval', type=int, default=10, help='seconds between changes of direction (walk model)')
+    parser.add_argument('--duration', type=int, default=120, help='seconds of movement to generate')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the random number generator')
+    parser.add_argument('-o', '--output', default='-', help='topology file to write, standard output by default')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.model == 'waypoint':
+        model = RandomWaypoint(args.nodes, *args.size, speed=tuple(args.speed), pause=args.pause, rng=rng)
+    else:
+        model = RandomWalk(args.nodes, *args.size, speed=tuple(args.speed), interval=args.interval, rng=rng)
+
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+    with output:
+        output.writelines(link_changes(model, args.range, args.duration))
@@ -0,0 +1,84 @@
+from heapq import heapify, heappush, heappop
+from typing import Set
+
+'''
+Multipoint relay (MPR) selection backed by a coverage index of the 2-hop neighborhood.
+
+The index keeps, for every node advertised by a neighbor, the number of neighbors that reach it.
+It is updated in place as neighbors come and go or change their advertised neighbor sets,
+and the MPR set is only selected again after such a change.
+'''
+
+
+class MPRSelection:
+    def __init__(self):
+        # bidirectional neighbor set advertised by every one-hop neighbor
+        self.covers: dict[int, Set[int]] = dict()
+        # number of one-hop neighbors which reach each advertised node
+        self.coverage: dict[int, int] = dict()
+        # whether the neighborhood changed since the last selection
+        self.dirty: bool = False
+
+    ''' start tracking a new one-hop neighbor '''
+
+    def add_neighbor(self, neighbor_id: int):
+        if neighbor_id not in self.covers:
+            self.covers[neighbor_id] = set()
+            self.dirty = True
+
+    ''' stop tracking a one-hop neighbor and everything it covered '''
+
+    def remove_neighbor(self, neighbor_id: int):
+        for node in self.covers.pop(neighbor_id, ()):
+            self.uncount(node)
+        self.dirty = True
+
+    ''' replace the neighbor set advertised by a one-hop neighbor '''
+
+    def update_neighbor(self, neighbor_id: int, neighbor_set: Set[int]):
+        previous = self.covers.get(neighbor_id, set())
+        for node in previous - neighbor_set:
+            self.uncount(node)
+        for node in neighbor_set - previous:
+            self.coverage[node] = self.coverage.get(node, 0) + 1
+        self.covers[neighbor_id] = set(neighbor_set)
+        self.dirty = True
+
+    ''' drop one neighbor from the coverage count of a node '''
+
+    def uncount(self, node: int):
+        count = self.coverage[node] - 1
+        if count > 0:
+            self.coverage[node] = count
+        else:
+            del self.coverage[node]
+
+    ''' select a set of neighbors which covers the entire 2-hop neighborhood '''
+
+    def select(self) -> Set[int]:
+        self.dirty = False
+        covers = self.covers
+        # the 2-hop neighborhood excludes nodes which are one-hop neighbors themselves
+        uncovered = {node for node in self.coverage if node not in covers}
+        # neighbors which are the only way to reach some 2-hop node have to be selected
+        mprs = {
+            neighbor_id for neighbor_id, neighbor_set in covers.items()
+            if any(self.coverage[node] == 1 and node in uncovered for node in neighbor_set)
+        }
+        for neighbor_id in mprs:
+            uncovered.difference_update(covers[neighbor_id])
+        # greedily pick the neighbor covering the most remaining nodes, ties going to the lowest id.
+        # coverage only shrinks as nodes are covered, so stale heap entries are re-scored when popped
+        heap = [(-len(neighbor_set & uncovered), neighbor_id) for neighbor_id, neighbor_set in covers.items() if neighbor_id not in mprs]
+        heapify(heap)
+        while uncovered and heap:
+            score, neighbor_id = heappop(heap)
+            nodes_covered = len(covers[neighbor_id] & uncovered)
+            if nodes_covered == 0:
+                continue
+            if nodes_covered < -score:
+                heappush(heap, (-nodes_covered, neighbor_id))
+                continue
+            mprs.add(neighbor_id)
+            uncovered.difference_update(covers[neighbor_id])
+        return mprs
@@ -1,11 +1,24 @@
 #!/usr/bin/env python3
-from time import sleep
+import os
+from collections import deque
 from sys import argv
-from math import inf
-from pathlib import Path
-from typing import Set, List
+from time import time
+from typing import Callable, Set, List
 from enum import Enum
 
+from convergence import SnapshotFile, attach_publisher
+from messages import HelloMessage, TCMessage, TCDeltaMessage, TCRequestMessage, DataMessage, PacketMessage
+from messages import DATA_TYPES, TC_TYPES
+from metrics import attach_node
+from mpr import MPRSelection
+from rendezvous import NODE_OFFSET, Rendezvous, sleep_until
+from ring import NodeRingTransport
+from routing import TopologyGraph, breadth_first_routes
+from timers import TimerWheel
+from traffic import TrafficAgent, read_flows
+from transport import NodeFileTransport
+from wire import get_codec
+
 '''
 
 Messages in this simulation are space-delimited strings,
@@ -23,10 +36,23 @@ There are three types of messages which follow the structures below:
 !!Notes
     - the '*' indicates a flooded message, which means every recieving node counts as a next-hop.
     - DATA messages cannot be flooded.
-    -
+    - the same messages can be sent as length-prefixed binary frames instead (see wire.py).
+    - nodes advertising differentially send TC deltas (TCD), and full TCs are requested (TCREQ) along the routes
+      to their source, see messages.py.
+    - generated traffic flows send their packets as PKT messages, which are routed like DATA messages (see traffic.py).
 '''
 
 
+# number of ticks a neighbor entry is kept after its last HELLO
+NEIGHBOR_HOLD_TIME = 15
+# number of ticks a topology control entry is kept after its last accepted TC
+TOPOLOGY_HOLD_TIME = 30
+# number of ticks a flooded message is remembered after its first copy arrived
+DUPLICATE_HOLD_TIME = 30
+# every n-th TC of a node advertising differentially carries its whole MPR selector set
+FULL_TC_REFRESH = 6
+
+
 class NodeStatus(Enum):
     # aka. unidirectional link
     NOT_SYM = 0
@@ -42,8 +68,6 @@ class TCAdvertisement:
         # sequence number of message
         # used to ignore old messages and recognize new updates to the network
         self.sequence: int = sequence
-        # TTL counter for the node this advertisement belongs to
-        self.timer: int = 30
         # list of nodes who have chosen this node as an MPR
         # shows which nodes are reachable from this node as a last-hop
         self.mpr_selectors: Set[int] = mpr_selectors
@@ -58,8 +82,6 @@ class Neighbor:
         self.node_id: int = node_id
         # unidirectional or bidirectional status of the link
         self.status: 'NodeStatus' = NodeStatus.NOT_SYM
-        # TTL counter for this neighbor's entry
-        self.timer: int = 15
         # is this neighbor an MPR for owning node
         self.is_mpr: bool = False
         # is this neighbor choosing this owning node as an MPR
@@ -68,80 +90,63 @@ class Neighbor:
         self.neighbor_set: Set[int] = set()
 
 
-''' Parse topology control messages and return the data as a tuple in the form (sender, source, sequence, ms_list) '''
-
-
-def parse_tc(tc_message: str):
-    _, sender_id, _, source_id, seq_num, _, *ms_list = tc_message.split()
-
-    sender_id = int(sender_id)
-    source_id = int(source_id)
-    seq_num = int(seq_num)
-
-    ms_list = [int(node) for node in ms_list]
-
-    return sender_id, source_id, seq_num, ms_list
-
-
-''' Parse hello messages and return the data as a tuple in the form (sender, unidirs, bidirs, mprs) '''
-
-
-def parse_hello(hello_message: str) -> (int, List[int], List[int], List[int]):
-    _STAR, sender_id, _HELLO, *hello_content = hello_message.split()
-
-    sender_id = int(sender_id)
-
-    UNIDIR_INDEX = hello_content.index('UNIDIR')
-    BIDIR_INDEX = hello_content.index('BIDIR')
-    MPR_INDEX = hello_content.index('MPR')
-
-    unidir_list = [int(n) for n in hello_content[UNIDIR_INDEX + 1:BIDIR_INDEX]]
-    bidir_list = [int(n) for n in hello_content[BIDIR_INDEX + 1:MPR_INDEX]]
-    mpr_list = [int(n) for n in hello_content[MPR_INDEX + 1:]]
-
-    return sender_id, unidir_list, bidir_list, mpr_list
-
-
-''' Sort read messages based on type (HELLO, TC, DATA) '''
-
-
-def sort_messages(messages: List[str]):
-    tc_messages = [x for x in messages if x.split(' ')[2] == 'TC']
-    data_message = [x for x in messages if x.split(' ')[2] == 'DATA']
-    hello_messages = [x for x in messages if x.split(' ')[2] == 'HELLO']
-
-    return hello_messages, tc_messages, data_message
-
-
 ''' OLSR Node which sends periodic update messages (hello/tc) and can send instances of string data '''
 
 
 class OLSRNode:
-    def __init__(self, node_id: int):
+    def __init__(self, node_id: int, transport=None, verify_routes: bool = False, codec=None,
+                 differential_tc: bool = False):
         # numeric id of the node
         self.node_id: int = node_id
-        # last read line of the message accepting file
-        self.reading_index: int = 0
+        # wire format of the messages, which defaults to space-delimited text
+        self.codec = codec if codec is not None else get_codec()
+        # transport used to exchange messages with the controller, which defaults to the file based transport
+        self.transport = transport if transport is not None else NodeFileTransport(node_id, self.codec)
         # neighbor set
         self.neighbors: dict[int, 'Neighbor'] = dict()
+        # neighbors which have chosen this node as an MPR, kept in step with Neighbor.is_mpr_selector
+        self.mpr_selectors: Set[int] = set()
         # sequence number of topology control messages go out
         self.tc_seq: int = 0
+        # send the changes of the MPR selector set since the previous TC instead of the whole set
+        self.differential_tc: bool = differential_tc
+        # MPR selector set of the previous TC, or None when the next TC has to be a full one
+        self.advertised: Set[int] = None
+        # sequence number of the last full TC, and the number of deltas sent after it
+        self.full_tc_sequence: int = -1
+        self.deltas_since_full: int = 0
+        # another node could not apply a delta of this node and asked for a full TC
+        self.full_tc_requested: bool = False
+        # highest delta sequence number a full TC was requested for, by source
+        self.tc_requests: dict[int, int] = dict()
         # Topology Control Table created from recieved TC messages
         self.tc_table: dict[int, 'TCAdvertisement'] = dict()
+        # duplicate set of the TC messages seen, keyed by (originator, seqno), telling whether the message was forwarded
+        self.duplicates: dict[(int, int), bool] = dict()
+        # links known from the neighbor data and TC Table, which repairs its routes as links change
+        self.topology: 'TopologyGraph' = TopologyGraph(node_id)
         # Router Table computed from TC Table
-        self.routing_table: dict[int, int] = dict()
+        self.routing_table: dict[int, int] = self.topology.first_hop
+        # expiry deadlines of the tc_table and neighbor entries
+        self.tc_timers: 'TimerWheel' = TimerWheel()
+        self.neighbor_timers: 'TimerWheel' = TimerWheel()
+        # every duplicate entry is held for the same time, so they expire in the order they were added
+        self.duplicate_expiry: deque = deque()
+        # clock value of the tick whose expiry step runs next, used to compute the deadlines of refreshed entries
+        self.clock: int = 1
+        # coverage index of the 2-hop neighborhood used to select MPRs
+        self.mpr_selection: 'MPRSelection' = MPRSelection()
+        # compare every incremental routing update against a full recompute
+        self.verify_routes: bool = verify_routes
+
+        # data message to send as (destination, message, delay), where a negative delay sends nothing
+        self.data_message: (int, str, int) = (-1, "", -1)
+        # queue of the generated traffic packets this node sends and forwards, None when there is no traffic
+        self.traffic: 'TrafficAgent' = None
 
         # track changes that occurr which affect routing
         self.changes_detected = False
 
-        # trigger the creation of files
-        Path('to%d' % self.node_id).touch()
-        Path('from%d' % self.node_id).touch()
-        Path('recieved%d' % self.node_id).touch()
-
-        # give time for other nodes to properly setup
-        sleep(1)
-
     ''' LAZY HELPERS FOR NEIGHBOR DATA '''
 
     def get_unidirectional_neighbors(self) -> List[int]:
@@ -154,7 +159,7 @@ class OLSRNode:
         return [x.node_id for x in self.neighbors.values() if x.is_mpr]
 
     def get_mpr_selectors(self) -> List[int]:
-        return [x.node_id for x in self.neighbors.values() if x.is_mpr_selector]
+        return sorted(self.mpr_selectors)
 
     ''' gets the set of 2-hop neighbors '''
 
@@ -172,51 +177,65 @@ class OLSRNode:
 
     ''' forward messages by updating their sender node '''
 
-    def forward_message(self, message: str):
-        # break up the message
-        split_message = message.split(' ')
-        # check if the destination has a routing entry
-        destination_id = int(split_message[4])
-        # exit the function early if there is no routing table entry
-        if destination_id not in self.routing_table:
-            return
-        # see if the message is a flooded message or needs a new next hop
-        if split_message[0] != '*':  # this field is next-hop
+    def forward_message(self, message):
+        # data messages are routed, while flooded messages go to every neighbor
+        if type(message) is DataMessage:
+            # exit the function early if there is no routing table entry
+            if message.destination not in self.routing_table:
+                return
             # update the next hop on the forwarded message
-            split_message[0] = str(self.routing_table[destination_id])
+            message.next_hop = self.routing_table[message.destination]
+        # requests for a full TC are routed to the source of the TC
+        elif type(message) is TCRequestMessage:
+            if message.source not in self.routing_table:
+                return
+            message.next_hop = self.routing_table[message.source]
         # update the <fromnbr> (forwarded from) header on the forwarded message
-        split_message[1] = str(self.node_id)
-        # write the new message to the file
-        with open('from%d' % self.node_id, 'a') as sent_messages:
-            updated_message = ' '.join(split_message) + '\n'
-            sent_messages.write(updated_message)
+        message.sender = self.node_id
+        # hand the new message to the transport
+        self.transport.send(self.codec.encode(message))
 
     ''' send a tc message into the network '''
 
     def send_tc(self):
-        with open('from%d' % self.node_id, 'a') as sent_messages:
-            sent_messages.write(
-                '* %d TC %d %d MS %s\n' % (
-                    self.node_id,
-                    self.node_id,
-                    self.tc_seq,
-                    ' '.join(map(str, self.get_mpr_selectors())),
-                )
+        # a delta follows a previous TC, unless a full TC was requested or is due as the periodic refresh
+        if self.differential_tc and self.advertised is not None and not self.full_tc_requested \
+                and self.deltas_since_full + 1 < FULL_TC_REFRESH:
+            message = TCDeltaMessage(
+                sender=self.node_id,
+                source=self.node_id,
+                sequence=self.tc_seq,
+                added=sorted(self.mpr_selectors - self.advertised),
+                removed=sorted(self.advertised - self.mpr_selectors),
             )
+            self.deltas_since_full += 1
+        else:
+            message = TCMessage(
+                sender=self.node_id,
+                source=self.node_id,
+                sequence=self.tc_seq,
+                mpr_selectors=self.get_mpr_selectors(),
+            )
+            self.full_tc_sequence = self.tc_seq
+            self.deltas_since_full = 0
+            self.full_tc_requested = False
+        # remember the advertised set as the baseline of the next delta
+        if self.differential_tc:
+            self.advertised = set(self.mpr_selectors)
+        self.transport.send(self.codec.encode(message))
         self.tc_seq += 1
 
     ''' send a hello message into the network '''
 
     def send_hello(self):
-        with open('from%d' % self.node_id, 'a') as sent_messages:
-            sent_messages.write(
-                '* %d HELLO UNIDIR %s BIDIR %s MPR %s\n' % (
-                    self.node_id,
-                    ' '.join(map(str, self.get_unidirectional_neighbors())),
-                    ' '.join(map(str, self.get_bidirectional_neighbors())),
-                    ' '.join(map(str, self.get_mprs())),
-                )
+        self.transport.send(self.codec.encode(
+            HelloMessage(
+                sender=self.node_id,
+                unidir=self.get_unidirectional_neighbors(),
+                bidir=self.get_bidirectional_neighbors(),
+                mpr=self.get_mprs(),
             )
+        ))
 
     ''' send a data message into the network '''
 
@@ -228,22 +247,21 @@ class OLSRNode:
         # fetch next hop router from the routing table
         next_hop = self.routing_table[dest_id]
         # place the data message in the outgoing container
-        with open('from%d' % self.node_id, 'a') as sent_messages:
-            sent_messages.write(
-                '%d %d DATA %d %d %s\n' % (
-                    next_hop,
-                    self.node_id,
-                    self.node_id,
-                    dest_id,
-                    message,
-                )
+        self.transport.send(self.codec.encode(
+            DataMessage(
+                next_hop=next_hop,
+                sender=self.node_id,
+                source=self.node_id,
+                destination=dest_id,
+                payload=message,
             )
+        ))
         # successfully sent message
         return True
 
-    ''' compute the routing table using the topology control table entries and neighbor data '''
+    ''' build the known topology graph from the topology control table entries and neighbor data '''
 
-    def compute_routing_table(self):
+    def build_topology_graph(self) -> 'dict[int, Set[int]]':
         # create temporary graph
         graph: dict[int, Set[int]] = dict()
 
@@ -252,110 +270,194 @@ class OLSRNode:
 
         # add nodes to the topology based on their MPR Selectors
         for node_id, node_data in self.tc_table.items():
-            graph[node_id] = node_data.mpr_selectors.copy()
+            graph.setdefault(node_id, set()).update(node_data.mpr_selectors)
 
         # add any of the missing bidirectional links
-        for node in list(graph.keys()):
-            for neighbor in graph[node]:
-                # avoid aliasing the neighbor data by creating a copy (shallow is suitable since the data type is int)
-                mirror = graph.get(neighbor, set()).copy()
-                mirror.add(node)
-                graph[neighbor] = mirror
-
-        distance = {
-            node: 0 if node == self.node_id else inf
-            for node in graph.keys()
-        }
-        previous = {
-            node: None
-            for node in graph.keys()
-        }
-        visited = {
-            node: False
-            for node in graph.keys()
-        }
-
-        # perform link state routing with yourself as the source
-        queue = [self.node_id]
-        while queue:
-            # relax any neighbor of a visited node
-            # this works as an alternative to taking the minimum cost link, because this is based on number of hops
-            current = queue.pop()
-            # mark the node as visited
-            visited[current] = True
-            # relax neighbors and add to the queue if unexplored
-            for adjacent in graph[current]:
-                if not visited[adjacent]:
-                    queue.append(adjacent)
-                # use hops as link costs (constant 1)
-                if distance[current] + 1 < distance[adjacent]:
-                    distance[adjacent] = distance[current] + 1
-                    previous[adjacent] = current
-
-        # clear previous routing table entries
-        self.routing_table.clear()
-        # find the first hop nodes to each node in the network to add to our routing table
-        for node, prev in previous.items():
-            # skip the entry if there was no path found
-            if prev == None:
-                continue
-            # save our current state
-            current = node
-            # walk the path backwards until we hit the source
-            while current != self.node_id and previous[current] != self.node_id:
-                current = previous[current]
-                if current == None:  # logging
-                    print(self.node_id, previous, graph, self.neighbors)
-            # update the routing table,
-            # and use the link_id if the previous is the current node
-            self.routing_table[node] = current
+        for node, adjacent in list(graph.items()):
+            for neighbor in adjacent:
+                graph.setdefault(neighbor, set()).add(node)
+
+        return graph
+
+    ''' compute the routing table using the topology control table entries and neighbor data '''
+
+    def compute_routing_table(self):
+        self.routing_table = breadth_first_routes(self.build_topology_graph(), self.node_id)
+
+    ''' repair the routing table for the links that changed since the last update '''
+
+    def update_routing_table(self):
+        self.topology.repair()
+        self.routing_table = self.topology.first_hop
+        # check the repaired routes against a full recompute in verification mode
+        if self.verify_routes:
+            expected = breadth_first_routes(self.build_topology_graph(), self.node_id)
+            if expected != self.routing_table:
+                raise AssertionError(
+                    'node %d repaired routes %s differ from full recompute %s' % (
+                        self.node_id, self.routing_table, expected,
+                    )
+                )
+
+    ''' remove a topology control table entry and the links it advertised '''
+
+    def remove_tc_entry(self, node_id: int):
+        self.tc_timers.cancel(node_id)
+        for selector in self.tc_table.pop(node_id).mpr_selectors:
+            self.topology.remove_link(node_id, selector)
+        self.changes_detected = True
+
+    ''' remove a neighbor and its link to this node '''
+
+    def remove_neighbor(self, neighbor_id: int):
+        self.neighbor_timers.cancel(neighbor_id)
+        if self.neighbors.pop(neighbor_id).status == NodeStatus.SYM:
+            self.topology.remove_link(self.node_id, neighbor_id)
+        self.mpr_selectors.discard(neighbor_id)
+        self.mpr_selection.remove_neighbor(neighbor_id)
+        self.changes_detected = True
+
+    ''' select the MPRs again if the neighborhood changed since the last selection '''
+
+    def update_mprs(self):
+        if not self.mpr_selection.dirty:
+            return
+        mprs = self.mpr_selection.select()
+        # replace the previous selection entirely so that stale MPRs are cleared
+        for neighbor_id, neighbor in self.neighbors.items():
+            neighbor.is_mpr = neighbor_id in mprs
+
+    ''' replace the topology control table entry of the source of a full TC '''
+
+    def replace_tc_entry(self, tc: 'TCMessage'):
+        source_id = tc.source
+        # trigger topology change
+        self.changes_detected = True
+        mpr_selectors = set(tc.mpr_selectors)
+        # apply the difference with the previous advertisement to the topology graph
+        previous = self.tc_table[source_id].mpr_selectors if source_id in self.tc_table else set()
+        for selector in previous - mpr_selectors:
+            self.topology.remove_link(source_id, selector)
+        for selector in mpr_selectors - previous:
+            self.topology.add_link(source_id, selector)
+        self.tc_table[source_id] = TCAdvertisement(
+            sequence=tc.sequence,
+            mpr_selectors=mpr_selectors,
+        )
+        # keep the entry for another 30 seconds
+        self.tc_timers.schedule(source_id, self.clock + TOPOLOGY_HOLD_TIME)
+
+    ''' apply a TC delta to the topology control table entry of the advertisement right before it '''
+
+    def patch_tc_entry(self, delta: 'TCDeltaMessage'):
+        entry = self.tc_table[delta.source]
+        # only the links which actually change touch the topology graph
+        for selector in delta.removed:
+            if selector in entry.mpr_selectors:
+                entry.mpr_selectors.remove(selector)
+                self.topology.remove_link(delta.source, selector)
+                self.changes_detected = True
+        for selector in delta.added:
+            if selector not in entry.mpr_selectors:
+                entry.mpr_selectors.add(selector)
+                self.topology.add_link(delta.source, selector)
+                self.changes_detected = True
+        entry.sequence = delta.sequence
+        # keep the entry for another 30 seconds
+        self.tc_timers.schedule(delta.source, self.clock + TOPOLOGY_HOLD_TIME)
+
+    ''' ask the source of a delta which could not be applied for a full TC, unless a request is already on its way '''
+
+    def request_full_tc(self, source_id: int, seq_num: int):
+        if self.tc_requests.get(source_id, -1) >= seq_num:
+            return
+        self.tc_requests[source_id] = seq_num
+        # the next hop is filled in from the routing table, and a source without a route waits for its periodic full TC
+        self.forward_message(TCRequestMessage(next_hop=-1, sender=self.node_id, source=source_id, sequence=seq_num))
+
+    ''' handle a request for a full TC, answering it at the source and passing it on along the route elsewhere '''
+
+    def handle_tc_request(self, request: 'TCRequestMessage'):
+        # ensure that this node is supposed to be on the route
+        if request.next_hop != self.node_id:
+            return
+        if request.source == self.node_id:
+            # a full TC sent after the delta already answers the request
+            if request.sequence > self.full_tc_sequence:
+                self.full_tc_requested = True
+            return
+        # pass on one request per delta, since the flooded full TC answers every node which missed it
+        if self.tc_requests.get(request.source, -1) >= request.sequence:
+            return
+        self.tc_requests[request.source] = request.sequence
+        self.forward_message(request)
 
     ''' handle tc message '''
 
     def handle_tc_messages(self, tc_messages: list):
-        # break apart the tc message string
         for tc in tc_messages:
-            sender_id, source_id, seq_num, ms_list = parse_tc(tc)
+            # requests for a full TC are not advertisements
+            if type(tc) is TCRequestMessage:
+                self.handle_tc_request(tc)
+                continue
+            sender_id, source_id, seq_num = tc.sender, tc.source, tc.sequence
             # do not handle message if it is from self
             if source_id == self.node_id:
                 continue
+            # copies of a message that was already seen do not touch the tables again, but a copy from an MPR selector
+            # is still forwarded when the first copy came from a neighbor which had not selected this node
+            key = (source_id, seq_num)
+            if key in self.duplicates:
+                if not self.duplicates[key] and sender_id in self.mpr_selectors:
+                    self.duplicates[key] = True
+                    self.forward_message(tc)
+                continue
+            # remember the message for 30 seconds, even once the tc_table entry of its source has expired
+            self.duplicates[key] = False
+            self.duplicate_expiry.append((self.clock + DUPLICATE_HOLD_TIME, key))
             # add an entry into the topology control table if the source has never been seen before,
             # or if the sequence number on the tc message is higher than the last seen
             if source_id not in self.tc_table or self.tc_table[source_id].sequence < seq_num:
-                # trigger topology change
-                self.changes_detected = True
-                self.tc_table[source_id] = TCAdvertisement(
-                    sequence=seq_num,
-                    mpr_selectors=set(ms_list),
-                )
+                if type(tc) is TCMessage:
+                    self.replace_tc_entry(tc)
+                # a delta applies on top of the advertisement right before it
+                elif source_id in self.tc_table and self.tc_table[source_id].sequence == seq_num - 1:
+                    self.patch_tc_entry(tc)
+                # otherwise an advertisement was missed, and the entry waits for a full TC
+                else:
+                    self.request_full_tc(source_id, seq_num)
                 # if the sender of this message has chosen this node as an MPR,
                 # then forward the message
-                if sender_id in self.get_mpr_selectors():
+                if sender_id in self.mpr_selectors:
+                    self.duplicates[key] = True
                     self.forward_message(tc)
 
     ''' handle hello message '''
 
-    def handle_hello_messages(self, hello_messages: list):
-        # break apart the hello message string
-        for sender_id, unidir, bidir, mpr in map(parse_hello, hello_messages):
+    def handle_hello_messages(self, hello_messages: List['HelloMessage']):
+        for hello in hello_messages:
+            sender_id, unidir, bidir, mpr = hello.sender, hello.unidir, hello.bidir, hello.mpr
             # insert never before seen entries
             if sender_id not in self.neighbors:
                 self.neighbors[sender_id] = Neighbor(sender_id)
+                self.mpr_selection.add_neighbor(sender_id)
                 self.changes_detected = True
 
-            # reset the lifespan timer for this neighbor
-            self.neighbors[sender_id].timer = 15
+            # keep the neighbor for another 15 seconds
+            self.neighbor_timers.schedule(sender_id, self.clock + NEIGHBOR_HOLD_TIME)
 
             # detecting a two-way connection
             if self.node_id in unidir or self.node_id in bidir:
                 if self.neighbors[sender_id].status != NodeStatus.SYM:
                     self.changes_detected = True
+                    self.topology.add_link(self.node_id, sender_id)
                 self.neighbors[sender_id].status = NodeStatus.SYM
 
             # detect if node has chosen me as an MPR, so add it to the MS set
             if self.node_id in mpr:
                 if self.neighbors[sender_id].is_mpr_selector != True:
                     self.changes_detected = True
+                    self.mpr_selectors.add(sender_id)
                 self.neighbors[sender_id].is_mpr_selector = True
 
             # update 2-hop neighbors
@@ -365,130 +467,191 @@ class OLSRNode:
             # check whether updating this set will change the topology
             if connected_neighbors != self.neighbors[sender_id].neighbor_set:
                 self.changes_detected = True
+                # update the coverage index with the new neighbor set
+                self.mpr_selection.update_neighbor(sender_id, connected_neighbors)
             # update the neighbor set
             self.neighbors[sender_id].neighbor_set = connected_neighbors
 
         # update MPRs for this node
-        two_hop_neighbor_set = self.get_two_hop_neighbor_set()
-        # run while there are still two-hop neighbors to cover
-        # it is certain this will converge, because the 2-hop neighbor set is derived from the 1-hop neighbors
-        while len(two_hop_neighbor_set) > 0:
-            best_pick = {'id': 0, 'score': 0}
-            for neighbor_id, neighbor in self.neighbors.items():
-                # compute the number of 2 hops which this neighbor will cover as an MPR
-                nodes_covered = len(two_hop_neighbor_set.intersection(
-                    neighbor.neighbor_set
-                ))
-                # update the current best if the score is higher than the previous best
-                if best_pick['score'] < nodes_covered:
-                    best_pick['id'] = neighbor_id
-                    best_pick['score'] = nodes_covered
-
-            # remove the covered elements from the newest selected MPR set
-            two_hop_neighbor_set.difference_update(
-                self.neighbors[best_pick['id']].neighbor_set
-            )
-            # mark the neighbor as an MPR
-            self.neighbors[best_pick['id']].is_mpr = True
+        self.update_mprs()
 
     ''' handle data messages '''
 
-    def handle_data_messages(self, data_messages: List[str]):
+    def handle_data_messages(self, data_messages: list):
         for data in data_messages:
-            # parse the data for next hop info
-            message_components = data.split(' ')
-            message_next_hop = int(message_components[0])
+            # traffic packets are delivered or queued for forwarding by the traffic agent
+            if type(data) is PacketMessage:
+                if self.traffic is None:
+                    continue
+                if data.destination == self.node_id:
+                    self.traffic.deliver(data, self.clock)
+                else:
+                    self.traffic.enqueue(data, self.clock)
             # ensure that this node is supposed to be on the route
-            if message_next_hop == self.node_id:
-                # read the final destination of the packet
-                message_destination_id = int(message_components[4])
+            elif data.next_hop == self.node_id:
                 # save it if this node is the designated recipient
-                if message_destination_id == self.node_id:
-                    with open('recieved%d' % self.node_id, 'a') as recieved_messages:
-                        recieved_messages.write(data + '\n')
+                if data.destination == self.node_id:
+                    self.transport.deliver(data.encode())
                 # or forward the message to the next hop node on the path to the destination
                 else:
                     self.forward_message(data)
 
-    ''' read a list of the most recent messages '''
-
-    def read_latest_messages(self) -> List[str]:
-        with open('to%d' % self.node_id) as incoming_messages:
-            lines = incoming_messages.read().splitlines()
-            # fetch the last part of the messages file
-            latest_messages = lines[self.reading_index:]
-            # update the current reading index
-            self.reading_index = len(lines)
-
-            def filter_next_hop(message: str):
-                next_hop = message.split()[0]
-                return next_hop == '*' or int(next_hop) == self.node_id
-
-            # return messages which are meant for this node
-            return list(filter(filter_next_hop, latest_messages))
-
-    ''' run the simluation for 120 seconds '''
-
-    def run(self, message: (int, str, int) = (-1, "", -1)):
+    ''' read the most recent messages as (hello, tc, data) lists '''
+
+    def read_latest_messages(self) -> (List['HelloMessage'], List['TCMessage'], List['DataMessage']):
+        hello_msgs, tc_msgs, data_msgs = [], [], []
+        # parse every new message once and sort it according to type
+        for frame in self.transport.receive():
+            message = self.codec.decode(frame)
+            if type(message) is HelloMessage:
+                hello_msgs.append(message)
+            elif type(message) in TC_TYPES:
+                tc_msgs.append(message)
+            # keep only the data messages which are meant for this node
+            elif type(message) in DATA_TYPES and message.next_hop == self.node_id:
+                data_msgs.append(message)
+        return hello_msgs, tc_msgs, data_msgs
+
+    ''' perform a single step of the simulation at the given clock value '''
+
+    def tick(self, i: int):
+        # advance the clock used for expiry deadlines
+        self.clock = i
+        # track state changes from handlers
+        self.changes_detected = False
+        # process incoming messages, sorted according to type
+        self.handle_messages(*self.read_latest_messages())
+        # send the messages which are due at this clock value
+        self.send_scheduled_messages(i)
+        # age the neighbor and topology control entries
+        self.expire_entries()
+        # repair the routing table if neccessary
+        if self.changes_detected:
+            self.update_routing_table()
+        # write out the messages of this tick
+        self.flush()
+
+    ''' hand the messages and traffic records buffered during a tick to the transport and the traffic log '''
+
+    def flush(self):
+        self.transport.flush()
+        if self.traffic is not None:
+            self.traffic.flush()
+
+    ''' handle received messages of every type '''
+
+    def handle_messages(self, hello_msgs: List['HelloMessage'], tc_msgs: List['TCMessage'], data_msgs: List['DataMessage']):
+        # handle reception of data message
+        self.handle_data_messages(data_msgs)
+        # handle reception of tc message
+        self.handle_tc_messages(tc_msgs)
+        # handle reception of hello message
+        self.handle_hello_messages(hello_msgs)
+
+    ''' send the data, hello and tc messages which are due at the given clock value '''
+
+    def send_scheduled_messages(self, i: int):
         # deconstruct data that the node will send
-        destination_id, message_str, delay = message
+        destination_id, message_str, delay = self.data_message
+        # check that it is time to send message or delay the signal
+        if i == delay:
+            if not self.send_data(destination_id, message_str):
+                self.data_message = (destination_id, message_str, delay + 30)
+        # send hello message
+        if i % 5 == 0:
+            self.send_hello()
+        # generate the traffic packets which are due, and send the queued packets which have a route
+        if self.traffic is not None:
+            self.traffic.generate(i)
+            self.traffic.drain(self, i)
+        # send the topology control message
+        if i % 10 == 0 and self.mpr_selectors:
+            self.send_tc()
+        # a skipped TC breaks the chain of deltas, so the next one is a full TC
+        elif i % 10 == 0:
+            self.advertised = None
+        # answer a request for a full TC straight away
+        elif self.full_tc_requested and self.mpr_selectors:
+            self.send_tc()
+
+    ''' remove the neighbor and topology control entries whose deadline is the current tick '''
+
+    def expire_entries(self):
+        # remove the tc_table entries which have not been refreshed for 30 seconds
+        for node_id in self.tc_timers.expire(self.clock):
+            self.remove_tc_entry(node_id)
+
+        # remove neighbors that have not responsed within the 15 seconds time window
+        for neighbor_id in self.neighbor_timers.expire(self.clock):
+            self.remove_neighbor(neighbor_id)
+
+        # forget the flooded messages which were first seen 30 seconds ago
+        while self.duplicate_expiry and self.duplicate_expiry[0][0] <= self.clock:
+            del self.duplicates[self.duplicate_expiry.popleft()[1]]
+
+    ''' run the simluation for 120 seconds, with tick i half a second before tick i of the controller at epoch + i '''
+
+    def run(self, message: (int, str, int) = (-1, "", -1), epoch: float = None, stopped: Callable[[], bool] = None):
+        # store the data that the node will send
+        self.data_message = message
+        # without a common epoch tick 1 runs straight away
+        epoch = time() - 1 - NODE_OFFSET if epoch is None else epoch
         # run for 120 seconds
         i = 1
         while i <= 120:
-            # track state changes from handlers
-            self.changes_detected = False
-            # process incoming messages
-            latest_messages = self.read_latest_messages()
-            # sort the messages according to type
-            hello_msgs, tc_msgs, data_msgs = sort_messages(latest_messages)
-            # handle reception of data message
-            self.handle_data_messages(data_msgs)
-            # handle reception of tc message
-            self.handle_tc_messages(tc_msgs)
-            # handle reception of hello message
-            self.handle_hello_messages(hello_msgs)
-
-            # check that it is time to send message or delay the signal
-            if i == delay:
-                if not self.send_data(destination_id, message_str):
-                    delay += 30
-            # send hello message
-            if i % 5 == 0:
-                self.send_hello()
-            # send the topology control message
-            if i % 10 == 0 and len(self.get_mpr_selectors()) > 0:
-                self.send_tc()
-
-            # step the timer for the tc_table entries and then remove them if it has been longer than 30 seconds
-            for node_id in list(self.tc_table.keys()):
-                self.tc_table[node_id].timer -= 1
-                if self.tc_table[node_id].timer < 0:
-                    del self.tc_table[node_id]
-                    self.changes_detected = True
-
-            # remove neighbors that have not responsed within the 10 seconds time window
-            for neighbor_id in list(self.neighbors.keys()):
-                self.neighbors[neighbor_id].timer -= 1
-                if self.neighbors[neighbor_id].timer < 0:
-                    del self.neighbors[neighbor_id]
-                    self.changes_detected = True
-
-            # recalculate routing table if neccessary
-            if self.changes_detected:
-                self.compute_routing_table()
-
+            # wait for the clock, which does not drift with the time the ticks take
+            sleep_until(epoch + i + NODE_OFFSET)
+            # the controller may end the run early once the network has settled
+            if stopped is not None and stopped():
+                break
+            self.tick(i)
             # step the clock
             i += 1
-            sleep(1)
 
 
 if __name__ == "__main__":
     source_id, destination_id = map(int, argv[1:3])
-    olsr_node = OLSRNode(source_id)
-    if source_id == destination_id:
-        olsr_node.run()
+    # the wire format and transport can be switched through the environment, e.g. OLSR_WIRE=binary ./scenario1.sh
+    codec = get_codec(os.environ.get('OLSR_WIRE', 'text'))
+    transport = os.environ.get('OLSR_TRANSPORT', 'file')
+    # OLSR_TC=delta advertises changes of the MPR selector set instead of the whole set
+    differential_tc = os.environ.get('OLSR_TC', 'full') == 'delta'
+    # the node only sends a data message if its destination differs from itself
+    message = (-1, "", -1) if source_id == destination_id else (destination_id, argv[3], int(argv[4]))
+    # generated traffic is read from the flow specification named by OLSR_FLOWS, and logged to traffic<id>
+    flows = None
+    if os.environ.get('OLSR_FLOWS'):
+        with open(os.environ['OLSR_FLOWS']) as flow_file:
+            flows = read_flows(flow_file)
+    if transport in ('udp', 'unix'):
+        from datagram import main_node
+        main_node(source_id, message, transport, codec, differential_tc, flows)
     else:
-        message, delay = argv[3], int(argv[4])
-        olsr_node.run((destination_id, message, delay))
+        if transport == 'ring':
+            node = OLSRNode(
+                source_id, transport=NodeRingTransport(source_id, codec), codec=codec, differential_tc=differential_tc,
+            )
+        else:
+            node = OLSRNode(source_id, codec=codec, differential_tc=differential_tc)
+        if flows is not None:
+            node.traffic = TrafficAgent(source_id, flows, log_path='traffic%d' % source_id)
+        # per-tick metrics are written to metrics<id> when OLSR_METRICS is set, see metrics.py
+        recorder = attach_node(node) if os.environ.get('OLSR_METRICS') else None
+        # snapshots of the routing table and MPR set are written to snapshot<id> when OLSR_CONVERGENCE is set,
+        # and =stop follows the controller ending the run early, see convergence.py
+        convergence = os.environ.get('OLSR_CONVERGENCE')
+        snapshots = SnapshotFile('snapshot%d' % source_id) if convergence else None
+        if snapshots is not None:
+            attach_publisher(node, snapshots)
+        # register once the transport files exist, and start on the epoch announced by the controller
+        rendezvous = Rendezvous()
+        node.run(message, rendezvous.join(source_id), rendezvous.stopped if convergence == 'stop' else None)
+        if recorder is not None:
+            recorder.close()
+        if snapshots is not None:
+            snapshots.close()
+        # the rings warn about the frames they had to drop
+        if transport == 'ring':
+            node.transport.close()
 
     print('node %d finished.' % source_id)
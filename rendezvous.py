@@ -0,0 +1,162 @@
+import os
+import sys
+from time import sleep, time
+from typing import Iterable, Set
+
+from topology import stream_file
+
+'''
+Startup handshake of the node and controller processes, held in the working directory next to the message files.
+
+    ready<id>   ==> <pid> <registration time>       written by a node once its transport files exist
+    epoch       ==> <epoch> <pid>                   written by the controller once every node of topology.txt is ready
+    stop        ==> <epoch> <tick>                  written by the controller when it ends the run early after a tick
+
+Clocks are wall clock seconds, so every process ticks in lockstep from the same epoch:
+the controller runs tick i at epoch + i, and the nodes run tick i at epoch + i - 0.5,
+half a second after the controller relayed the messages they read (as in simulation.py).
+
+Both files are replaced atomically. Files left behind by a previous run are told apart by the process which wrote them
+having exited, so a run never races with the leftovers of the one before it, while a node started after the epoch was
+announced still joins the running clock. A stop file only ends the run whose epoch it names.
+'''
+
+
+# seconds between the announcement of the epoch and tick 0 of the controller, for every node to see it
+EPOCH_LEAD = 0.25
+# seconds between two looks at the rendezvous files
+POLL_INTERVAL = 0.01
+# seconds to wait for the other side before starting without it
+STARTUP_TIMEOUT = 30.0
+# seconds from tick i of the controller to tick i of the nodes
+NODE_OFFSET = -0.5
+
+
+''' sleep until the given wall clock time, returning straight away when it has passed '''
+
+
+def sleep_until(deadline: float):
+    remaining = deadline - time()
+    if remaining > 0:
+        sleep(remaining)
+
+
+''' tell whether the process which wrote a rendezvous file is still running '''
+
+
+def is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+''' every node id of a topology script, read as a stream '''
+
+
+def topology_nodes(lines: Iterable[str]) -> Set[int]:
+    nodes = set()
+    for line in lines:
+        # filter out empty lines to avoid parsing exceptions
+        if not line.strip():
+            continue
+        _delay, _state, source, destination = line.split()
+        nodes.add(int(source))
+        nodes.add(int(destination))
+    return nodes
+
+
+''' Rendezvous files through which the nodes register and the controller announces the common epoch '''
+
+
+class Rendezvous:
+    def __init__(self, directory: str = '.', timeout: float = STARTUP_TIMEOUT):
+        # directory holding the ready and epoch files, the working directory like the message files
+        self.directory: str = directory
+        # seconds to wait for the other side before starting without it
+        self.timeout: float = timeout
+        # epoch of the run which was joined or announced
+        self.epoch: float = None
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    ''' write a small file in one step, so that a reader never sees it half written '''
+
+    def replace(self, name: str, content: str):
+        temporary = self.path('.%s.%d' % (name, os.getpid()))
+        with open(temporary, 'w') as rendezvous_file:
+            rendezvous_file.write(content)
+        os.replace(temporary, self.path(name))
+
+    def read(self, name: str) -> str:
+        try:
+            with open(self.path(name)) as rendezvous_file:
+                return rendezvous_file.read()
+        except FileNotFoundError:
+            return None
+
+    ''' register a node whose transport is set up, and wait for the epoch announced by the controller '''
+
+    def join(self, node_id: int) -> float:
+        registered = time()
+        self.replace('ready%d' % node_id, '%d %f' % (os.getpid(), registered))
+        deadline = registered + self.timeout
+        while time() < deadline:
+            content = self.read('epoch')
+            if content:
+                epoch, pid = content.split()
+                # an epoch announced before the registration is only valid while its controller is running
+                if float(epoch) > registered or is_running(int(pid)):
+                    self.epoch = float(epoch)
+                    return self.epoch
+            sleep(POLL_INTERVAL)
+        print('node %d: no epoch announced within %.0fs, starting on its own clock' % (node_id, self.timeout),
+              file=sys.stderr)
+        # tick 1 runs straight away
+        self.epoch = time() - 1 - NODE_OFFSET
+        return self.epoch
+
+    ''' tell whether a node has registered from a process which is still running '''
+
+    def is_ready(self, node_id: int) -> bool:
+        content = self.read('ready%d' % node_id)
+        return bool(content) and is_running(int(content.split()[0]))
+
+    ''' wait until every node is ready, then announce the epoch which is returned '''
+
+    def gather(self, node_ids: Iterable[int]) -> float:
+        pending = set(node_ids)
+        deadline = time() + self.timeout
+        while pending and time() < deadline:
+            pending = {node_id for node_id in pending if not self.is_ready(node_id)}
+            if pending:
+                sleep(POLL_INTERVAL)
+        if pending:
+            print('controller: nodes %s not ready within %.0fs, starting without them' % (
+                ' '.join(map(str, sorted(pending))), self.timeout,
+            ), file=sys.stderr)
+        self.epoch = time() + EPOCH_LEAD
+        self.replace('epoch', '%r %d' % (self.epoch, os.getpid()))
+        return self.epoch
+
+    ''' announce that the run of this epoch ends after the given tick of the controller '''
+
+    def stop(self, clock: int):
+        self.replace('stop', '%r %d' % (self.epoch, clock))
+
+    ''' tell whether the controller ended the run of this epoch '''
+
+    def stopped(self) -> bool:
+        content = self.read('stop')
+        return bool(content) and float(content.split()[0]) == self.epoch
+
+
+''' wait for every node listed in topology.txt and announce the epoch, as the controller '''
+
+
+def gather_topology_nodes(path: str = 'topology.txt', rendezvous: 'Rendezvous' = None) -> float:
+    return (rendezvous if rendezvous is not None else Rendezvous()).gather(topology_nodes(stream_file(path)))
@@ -0,0 +1,201 @@
+import mmap
+import sys
+from pathlib import Path
+from struct import Struct
+
+from wire import TextCodec
+
+'''
+Shared memory transport built on memory-mapped ring buffers.
+
+Every node owns two rings, `from<id>.ring` for the messages it sends and `to<id>.ring` for the messages relayed to it.
+Each ring has exactly one producer and one consumer, which only ever move their own cursor forward,
+so the nodes and the controller exchange messages in place without appending to files that grow for the whole run.
+A block of frames that does not fit in the free space of a ring is dropped, like a frame lost on a congested medium.
+
+The rings only replace the medium, not the schedule: the consumer still looks at its ring once per tick, without
+being woken up when a block arrives, so a message takes as many ticks to cross the network as with the file transport.
+What the rings save is the cost of every read and write, not delivery latency.
+
+    ring    ==> <head:u64> <tail:u64> <data:capacity bytes>
+
+    head    ==> total number of bytes ever written by the producer
+    tail    ==> total number of bytes ever consumed by the consumer
+'''
+
+
+# cursors at the start of every ring file
+CURSORS = Struct('<QQ')
+CURSOR = Struct('<Q')
+HEAD_OFFSET = 0
+TAIL_OFFSET = CURSOR.size
+
+# default number of data bytes in each ring
+RING_CAPACITY = 1 << 20
+
+
+''' Single producer, single consumer byte ring stored in a memory-mapped file '''
+
+
+class RingBuffer:
+    def __init__(self, path: str, capacity: int = None):
+        # create (or reset) the ring file when a capacity is given, otherwise attach to an existing ring
+        if capacity is not None:
+            with open(path, 'wb') as ring_file:
+                ring_file.truncate(CURSORS.size + capacity)
+        self.path: str = path
+        self.file = open(path, 'r+b')
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        # number of data bytes following the cursors
+        self.capacity: int = len(self.map) - CURSORS.size
+        # number of frames that were lost because the ring was full
+        self.dropped: int = 0
+
+    ''' write a block of bytes as a whole, returning False when the free space is too small '''
+
+    def put(self, data: bytes) -> bool:
+        head, tail = CURSORS.unpack_from(self.map, 0)
+        if head + len(data) - tail > self.capacity:
+            return False
+        # copy the block, wrapping around the end of the data region
+        start = head % self.capacity
+        first = min(len(data), self.capacity - start)
+        self.map[CURSORS.size + start:CURSORS.size + start + first] = data[:first]
+        self.map[CURSORS.size:CURSORS.size + len(data) - first] = data[first:]
+        # publish the block only after it has been copied
+        CURSOR.pack_into(self.map, HEAD_OFFSET, head + len(data))
+        return True
+
+    ''' consume every byte written since the last call '''
+
+    def get(self) -> bytes:
+        head, tail = CURSORS.unpack_from(self.map, 0)
+        if head == tail:
+            return b''
+        start = tail % self.capacity
+        end = start + head - tail
+        if end <= self.capacity:
+            data = self.map[CURSORS.size + start:CURSORS.size + end]
+        else:
+            data = self.map[CURSORS.size + start:] + self.map[CURSORS.size:CURSORS.size + end - self.capacity]
+        # release the space back to the producer
+        CURSOR.pack_into(self.map, TAIL_OFFSET, head)
+        return data
+
+    ''' unmap the ring and close its file, warning when frames were lost '''
+
+    def close(self):
+        if self.dropped:
+            print('%s: dropped %d frames because the ring was full' % (self.path, self.dropped), file=sys.stderr)
+        self.map.close()
+        self.file.close()
+
+
+''' put frames into a ring as one block, or frame by frame when the block does not fit, counting the lost frames '''
+
+
+def put_frames(ring: 'RingBuffer', codec, frames: list):
+    if ring.put(codec.join(frames)):
+        return
+    for frame in frames:
+        if not ring.put(codec.join([frame])):
+            ring.dropped += 1
+
+
+''' Node side of the ring transport '''
+
+
+class NodeRingTransport:
+    def __init__(self, node_id: int, codec=None, capacity: int = RING_CAPACITY):
+        # numeric id of the owning node
+        self.node_id: int = node_id
+        # wire format of the frames stored in the rings
+        self.codec = codec if codec is not None else TextCodec()
+        # create both rings of the node
+        self.inbox: 'RingBuffer' = RingBuffer('to%d.ring' % node_id, capacity)
+        self.outbox: 'RingBuffer' = RingBuffer('from%d.ring' % node_id, capacity)
+        # bytes of a frame that has not been completely read yet
+        self.partial: bytes = b''
+        # frames sent during the current tick, put into the ring together by flush()
+        self.outgoing: list = []
+
+        # data messages that reached this node are still recorded in a text file
+        Path('recieved%d' % node_id).touch()
+
+    ''' read the frames which arrived since the last call '''
+
+    def receive(self) -> list:
+        frames, self.partial = self.codec.split(self.partial + self.inbox.get())
+        return frames
+
+    ''' hand a message frame to the controller for broadcasting '''
+
+    def send(self, frame):
+        self.outgoing.append(frame)
+
+    ''' record a data message that reached its destination '''
+
+    def deliver(self, message: str):
+        with open('recieved%d' % self.node_id, 'a') as recieved_messages:
+            recieved_messages.write(message + '\n')
+
+    ''' put the frames of the tick into the ring as one block, or frame by frame when the block does not fit '''
+
+    def flush(self):
+        if self.outgoing:
+            put_frames(self.outbox, self.codec, self.outgoing)
+        self.outgoing.clear()
+
+    ''' close both rings of the node '''
+
+    def close(self):
+        self.inbox.close()
+        self.outbox.close()
+
+
+''' Controller side of the ring transport '''
+
+
+class ControllerRingTransport:
+    def __init__(self, codec=None):
+        # wire format of the frames stored in the rings
+        self.codec = codec if codec is not None else TextCodec()
+        # rings of every node, attached once the node has created them
+        self.outboxes: dict[int, 'RingBuffer'] = dict()
+        self.inboxes: dict[int, 'RingBuffer'] = dict()
+        # bytes of a frame from each node that has not been completely read yet
+        self.partial: dict[int, bytes] = dict()
+
+    ''' attach to a ring of a node, returning None when the node has not created it yet '''
+
+    def attach(self, rings: 'dict[int, RingBuffer]', path: str, node_id: int):
+        if node_id not in rings:
+            try:
+                rings[node_id] = RingBuffer(path % node_id)
+            except FileNotFoundError:
+                return None
+        return rings[node_id]
+
+    ''' read the frames a node sent since the last call '''
+
+    def collect(self, node_id: int) -> list:
+        ring = self.attach(self.outboxes, 'from%d.ring', node_id)
+        if ring is None:
+            return []
+        frames, self.partial[node_id] = self.codec.split(self.partial.get(node_id, b'') + ring.get())
+        return frames
+
+    ''' write the queued frames into the ring of each node '''
+
+    def relay(self, pending: 'dict[int, list]'):
+        for node_id, frames in pending.items():
+            ring = self.attach(self.inboxes, 'to%d.ring', node_id)
+            if ring is None:
+                continue
+            put_frames(ring, self.codec, frames)
+
+    ''' close the rings of every node '''
+
+    def close(self):
+        for ring in (*self.outboxes.values(), *self.inboxes.values()):
+            ring.close()
@@ -0,0 +1,167 @@
+from collections import deque
+from heapq import heappush, heappop
+from math import inf
+from typing import Set
+
+'''
+Hop count routing over the topology known to a node.
+
+Ties between equally short paths are broken by choosing the lowest first hop,
+which makes a routing table that was repaired incrementally comparable entry by entry with a full recompute.
+'''
+
+
+''' Find the first hop towards every reachable node with a breadth first search, using hops as link costs '''
+
+
+def breadth_first_routes(graph: 'dict[int, Set[int]]', source: int) -> 'dict[int, int]':
+    # hop distance from the source to each discovered node
+    distance: dict[int, int] = {source: 0}
+    # first hop on a shortest path from the source to each discovered node
+    first_hop: dict[int, int] = dict()
+    # the direct neighbors of the source are their own first hop
+    for adjacent in graph.get(source, ()):
+        if adjacent != source:
+            distance[adjacent] = 1
+            first_hop[adjacent] = adjacent
+    # expand the search one hop at a time, carrying the first hop forward from the node that discovered each entry.
+    # every node of a layer is expanded before the next layer, so the first hops of a layer are final once it is reached
+    queue = deque(first_hop)
+    while queue:
+        current = queue.popleft()
+        hop = first_hop[current]
+        depth = distance[current] + 1
+        for adjacent in graph.get(current, ()):
+            if adjacent not in distance:
+                distance[adjacent] = depth
+                first_hop[adjacent] = hop
+                queue.append(adjacent)
+            # another shortest path with a lower first hop
+            elif distance[adjacent] == depth and hop < first_hop[adjacent]:
+                first_hop[adjacent] = hop
+    return first_hop
+
+
+''' Undirected topology graph which keeps shortest path routes from a source up to date as links change '''
+
+
+class TopologyGraph:
+    def __init__(self, source: int):
+        # node which the routes start from
+        self.source: int = source
+        # set of linked nodes for every node
+        self.adjacency: dict[int, Set[int]] = dict()
+        # number of advertisements contributing each link, keyed by the (lower, higher) node pair
+        self.links: dict[(int, int), int] = dict()
+        # hop distance from the source to every reachable node
+        self.distance: dict[int, int] = {source: 0}
+        # first hop on the shortest path to every reachable node (the routing table)
+        self.first_hop: dict[int, int] = dict()
+        # links which were added or removed since the last repair
+        self.changed_links: Set[(int, int)] = set()
+
+    ''' count an advertisement of the link between a and b '''
+
+    def add_link(self, a: int, b: int):
+        if a == b:
+            return
+        key = (a, b) if a < b else (b, a)
+        count = self.links.get(key, 0)
+        self.links[key] = count + 1
+        # the link becomes part of the graph with its first advertisement
+        if count == 0:
+            self.adjacency.setdefault(a, set()).add(b)
+            self.adjacency.setdefault(b, set()).add(a)
+            self.changed_links.add(key)
+
+    ''' withdraw an advertisement of the link between a and b '''
+
+    def remove_link(self, a: int, b: int):
+        if a == b:
+            return
+        key = (a, b) if a < b else (b, a)
+        count = self.links.get(key, 0) - 1
+        if count > 0:
+            self.links[key] = count
+            return
+        # the link leaves the graph once nothing advertises it anymore
+        self.links.pop(key, None)
+        self.adjacency.get(a, set()).discard(b)
+        self.adjacency.get(b, set()).discard(a)
+        self.changed_links.add(key)
+
+    ''' repair the distances and first hops of the nodes affected by the changed links '''
+
+    def repair(self) -> bool:
+        if not self.changed_links:
+            return False
+        adjacency = self.adjacency
+        distance = self.distance
+        first_hop = self.first_hop
+        # endpoints of every changed link
+        seeds = {node for link in self.changed_links for node in link}
+        self.changed_links.clear()
+
+        # find the nodes which lost every shortest path parent, following the shortest path tree downwards
+        orphans = set()
+        stack = [node for node in seeds if node in distance and node != self.source]
+        while stack:
+            node = stack.pop()
+            if node in orphans:
+                continue
+            depth = distance[node]
+            if any(distance.get(adjacent) == depth - 1 and adjacent not in orphans for adjacent in adjacency.get(node, ())):
+                continue
+            orphans.add(node)
+            # the children of an orphan may have lost their only parent as well
+            stack.extend(adjacent for adjacent in adjacency.get(node, ()) if distance.get(adjacent) == depth + 1)
+        for node in orphans:
+            del distance[node]
+
+        # recompute distances from the unaffected part of the graph, relaxing outwards in order of distance
+        heap = []
+        for node in seeds | orphans:
+            if node in distance:
+                for adjacent in adjacency.get(node, ()):
+                    if distance[node] + 1 < distance.get(adjacent, inf):
+                        heappush(heap, (distance[node] + 1, adjacent))
+            else:
+                depth = min((distance[adjacent] + 1 for adjacent in adjacency.get(node, ()) if adjacent in distance), default=inf)
+                if depth < inf:
+                    heappush(heap, (depth, node))
+        changed = set(orphans)
+        while heap:
+            depth, node = heappop(heap)
+            if depth >= distance.get(node, inf):
+                continue
+            distance[node] = depth
+            changed.add(node)
+            for adjacent in adjacency.get(node, ()):
+                if depth + 1 < distance.get(adjacent, inf):
+                    heappush(heap, (depth + 1, adjacent))
+
+        # recompute the first hops of every node whose parents may have changed, parents before children
+        heap = []
+        for node in changed:
+            if node not in distance:
+                first_hop.pop(node, None)
+        for node in changed | seeds | {adjacent for node in changed for adjacent in adjacency.get(node, ())}:
+            if node in distance and node != self.source:
+                heappush(heap, (distance[node], node))
+        processed = set()
+        while heap:
+            depth, node = heappop(heap)
+            if node in processed:
+                continue
+            processed.add(node)
+            if depth == 1:
+                hop = node
+            else:
+                hop = min(first_hop[adjacent] for adjacent in adjacency[node] if distance.get(adjacent) == depth - 1)
+            # children inherit the first hop, so they need to be revisited when it changes
+            if first_hop.get(node) != hop:
+                first_hop[node] = hop
+                for adjacent in adjacency[node]:
+                    if distance.get(adjacent) == depth + 1:
+                        heappush(heap, (depth + 1, adjacent))
+        return True
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+import multiprocessing
+import os
+from argparse import ArgumentParser
+from collections import deque
+from queue import Empty
+from time import perf_counter
+from typing import List, Iterable
+
+from controller import Controller
+from node import OLSRNode
+from simulation import MemoryNetwork, MemoryNodeTransport, load_scenario
+from topology import TopologyStream, stream_file, sort_lines
+from traffic import TrafficAgent, print_summary, read_flows, summarize
+from wire import get_codec
+
+'''
+Multi-process simulation which spreads the nodes of a large network over a fixed pool of worker processes.
+
+The nodes are split into shards of neighboring nodes, and every worker hosts the OLSRNode instances of one shard
+together with the part of the controller relay for the links leaving those nodes.
+Messages between nodes of the same shard stay inside the worker,
+while the messages for nodes of other shards are batched and exchanged once per tick,
+after which every worker steps its own nodes.
+Nodes can advertise differential TCs and generate traffic flows as in simulation.py, while convergence monitoring
+and the message trace need the whole topology in one controller, so they are only available in simulation.py.
+'''
+
+
+# seconds between the checks for a dead worker, or a dead parent, while waiting on a queue
+POLL_INTERVAL = 1.0
+
+
+''' lines of a topology given either as time ordered lines or as the path of a topology file to stream '''
+
+
+def topology_lines(topology) -> Iterable[str]:
+    return stream_file(topology) if isinstance(topology, str) else topology
+
+
+''' split the nodes into shards of roughly equal size, keeping nodes which are linked at the start together '''
+
+
+def partition(node_ids: Iterable[int], topology, shards: int) -> 'dict[int, int]':
+    node_ids = sorted(set(node_ids))
+    # links which are up at the start of the simulation
+    adjacency: dict[int, set] = {node_id: set() for node_id in node_ids}
+    for state, source, destination in TopologyStream(topology_lines(topology)).advance(0):
+        if state == 'UP' and source in adjacency and destination in adjacency:
+            adjacency[source].add(destination)
+            adjacency[destination].add(source)
+    # order the nodes breadth first, one connected component after another, so that neighbors end up close together
+    order = []
+    seen = set()
+    for root in node_ids:
+        if root in seen:
+            continue
+        seen.add(root)
+        queue = deque([root])
+        while queue:
+            current = queue.popleft()
+            order.append(current)
+            for adjacent in sorted(adjacency[current]):
+                if adjacent not in seen:
+                    seen.add(adjacent)
+                    queue.append(adjacent)
+    # cut the ordering into contiguous shards
+    size = max(1, -(-len(order) // shards))
+    return {node_id: index // size for index, node_id in enumerate(order)}
+
+
+''' Controller transport of a shard, which delivers local messages in place and batches the others per shard '''
+
+
+class ShardControllerTransport:
+    def __init__(self, network: 'MemoryNetwork', owners: 'dict[int, int]', shard: int):
+        self.network: 'MemoryNetwork' = network
+        # shard hosting each node
+        self.owners: dict[int, int] = owners
+        # index of this shard
+        self.shard: int = shard
+        # frames for nodes of other shards, keyed by shard and then by node
+        self.outbound: dict[int, dict[int, list]] = dict()
+
+    def collect(self, node_id: int) -> list:
+        messages = self.network.outgoing.get(node_id)
+        if not messages:
+            return []
+        self.network.outgoing[node_id] = []
+        return messages
+
+    def relay(self, pending: 'dict[int, list]'):
+        for node_id, frames in pending.items():
+            owner = self.owners.get(node_id)
+            if owner == self.shard:
+                self.network.incoming[node_id].extend(frames)
+            elif owner is not None:
+                self.outbound.setdefault(owner, dict()).setdefault(node_id, []).extend(frames)
+
+
+''' Worker process hosting the nodes and relay of one shard '''
+
+
+class ShardWorker:
+    def __init__(self, shard: int, owners: 'dict[int, int]', topology, nodes: List[tuple], queues: list, wire: str,
+                 parent: int = None, differential_tc: bool = False, flows: List['Flow'] = None):
+        self.shard: int = shard
+        self.queues: list = queues
+        self.network: 'MemoryNetwork' = MemoryNetwork()
+        self.transport: 'ShardControllerTransport' = ShardControllerTransport(self.network, owners, shard)
+        # the relay of this shard only handles the links leaving its own nodes, streaming them when read from a file
+        self.controller: 'Controller' = Controller(
+            transport=self.transport,
+            topology=(
+                line for line in topology_lines(topology)
+                if line.split() and owners.get(int(line.split()[2])) == shard
+            ),
+        )
+        self.nodes: dict[int, 'OLSRNode'] = dict()
+        for node_id, destination_id, message, delay in nodes:
+            node = OLSRNode(
+                node_id, transport=MemoryNodeTransport(self.network, node_id), codec=get_codec(wire),
+                differential_tc=differential_tc,
+            )
+            if node_id != destination_id:
+                node.data_message = (destination_id, message, delay)
+            # generated traffic keeps its records in memory, like in simulation.py
+            if flows is not None:
+                node.traffic = TrafficAgent(node_id, flows)
+            self.nodes[node_id] = node
+        # batches from other shards which arrived ahead of the tick being exchanged
+        self.early: dict[int, list] = dict()
+        # pid of the process which started the worker and ends the run when another worker dies
+        self.parent: int = parent
+
+    ''' send one batch to every other shard and wait for one batch from each of them '''
+
+    def exchange(self, clock: int):
+        for shard, queue in enumerate(self.queues):
+            if shard != self.shard:
+                queue.put((clock, self.transport.outbound.pop(shard, dict())))
+        batches = self.early.pop(clock, [])
+        while len(batches) < len(self.queues) - 1:
+            try:
+                batch_clock, batch = self.queues[self.shard].get(timeout=POLL_INTERVAL)
+            except Empty:
+                # nobody is left to end the run when the parent is gone
+                if self.parent is not None and os.getppid() != self.parent:
+                    raise RuntimeError('shard %d lost its parent process' % self.shard)
+                continue
+            if batch_clock == clock:
+                batches.append(batch)
+            else:
+                self.early.setdefault(batch_clock, []).append(batch)
+        for batch in batches:
+            for node_id, frames in batch.items():
+                self.network.incoming[node_id].extend(frames)
+
+    ''' run every tick of the simulation, returning the routes, recieved messages and traffic records of the nodes '''
+
+    def run(self, duration: int, full_routes: bool) -> 'dict[int, tuple]':
+        for clock in range(duration):
+            # relay the messages sent during the previous second, then step the nodes
+            self.controller.tick(clock)
+            self.exchange(clock)
+            for node in self.nodes.values():
+                node.tick(clock + 1)
+        return {
+            node_id: (
+                dict(node.routing_table) if full_routes else len(node.routing_table),
+                self.network.recieved[node_id],
+                node.traffic.records if node.traffic is not None else [],
+            )
+            for node_id, node in self.nodes.items()
+        }
+
+
+def run_worker(shard: int, owners, topology, nodes, queues, results, duration: int, wire: str, full_routes: bool,
+               parent: int, differential_tc: bool, flows):
+    worker = ShardWorker(shard, owners, topology, nodes, queues, wire, parent, differential_tc, flows)
+    results.put((shard, worker.run(duration, full_routes)))
+
+
+''' fail the run when a worker died, stopping the other workers which would wait for its batches forever '''
+
+
+def check_workers(processes: list):
+    failed = [(shard, process.exitcode) for shard, process in enumerate(processes) if process.exitcode not in (None, 0)]
+    if not failed:
+        return
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join()
+    raise RuntimeError('worker of shard %d exited with code %d' % failed[0])
+
+
+''' run a scenario over a pool of worker processes, returning (routes, recieved messages, traffic records) by node '''
+
+
+def run_sharded(topology, nodes: List[tuple], workers: int, duration: int = 120, wire: str = 'text',
+                full_routes: bool = False, differential_tc: bool = False,
+                flows: Iterable[str] = None) -> 'dict[int, tuple]':
+    # every worker streams its own part of a topology file, while lines in memory are put in time order once
+    if not isinstance(topology, str):
+        topology = sort_lines(topology)
+    owners = partition((spec[0] for spec in nodes), topology, workers)
+    flows = read_flows(flows) if flows is not None else None
+    context = multiprocessing.get_context()
+    queues = [context.Queue() for _ in range(workers)]
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=run_worker,
+            args=(
+                shard, owners, topology, [spec for spec in nodes if owners[spec[0]] == shard],
+                queues, results, duration, wire, full_routes, os.getpid(), differential_tc, flows,
+            ),
+        )
+        for shard in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    summary, finished = dict(), 0
+    while finished < len(processes):
+        try:
+            _, shard_summary = results.get(timeout=POLL_INTERVAL)
+        except Empty:
+            check_workers(processes)
+            continue
+        summary.update(shard_summary)
+        finished += 1
+    for process in processes:
+        process.join()
+    return summary
+
+
+''' scan a topology file for its nodes, which all run without a data message, leaving the file to be streamed '''
+
+
+def load_topology(path: str) -> (str, List[tuple]):
+    node_ids = sorted({int(node) for line in stream_file(path) for node in line.split()[2:4]})
+    return path, [(node_id, node_id, "", -1) for node_id in node_ids]
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='run a simulation over a pool of worker processes')
+    parser.add_argument('input', help='scenario script (*.sh) or topology file where every node runs idle')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--duration', type=int, default=120, help='virtual seconds to simulate')
+    parser.add_argument('--wire', default='text', choices=['text', 'binary'], help='wire format of the messages')
+    parser.add_argument('--routes', action='store_true', help='print the full routing table of every node')
+    parser.add_argument('--differential-tc', action='store_true', help='advertise MPR selector changes in TC deltas')
+    parser.add_argument('--flows', help='flow specification of generated traffic, see traffic.py')
+    args = parser.parse_args()
+
+    flows = None
+    if args.flows:
+        with open(args.flows) as flow_file:
+            flows = flow_file.readlines()
+
+    topology, nodes = load_scenario(args.input) if args.input.endswith('.sh') else load_topology(args.input)
+    start = perf_counter()
+    summary = run_sharded(
+        topology, nodes, args.workers, args.duration, args.wire, args.routes, args.differential_tc, flows,
+    )
+    elapsed = perf_counter() - start
+
+    for node_id, (routes, recieved, _) in sorted(summary.items()):
+        if args.routes:
+            print('node %d routes %s' % (node_id, dict(sorted(routes.items()))))
+        else:
+            print('node %d routes to %d nodes' % (node_id, routes))
+        for message in recieved:
+            print('node %d recieved: %s' % (node_id, message))
+    if flows is not None:
+        print_summary(summarize([record for _, _, records in summary.values() for record in records]))
+    print('%d nodes on %d workers in %.2fs' % (len(summary), args.workers, elapsed))
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+import re
+import shlex
+from argparse import ArgumentParser
+from heapq import heappush, heappop
+from typing import List, Iterable, Callable
+
+from controller import Controller
+from convergence import ConvergenceMonitor, MemorySnapshots, attach_publisher, print_periods
+from metrics import attach_node, attach_controller
+from node import OLSRNode
+from tracing import TraceRecorder
+from traffic import TrafficAgent, print_summary, read_flows, summarize
+from wire import get_codec
+
+'''
+In-process discrete-event simulation of a scenario.
+
+The nodes and the controller are created inside a single process and exchange messages through in-memory queues,
+while a virtual clock replaces the one second sleeps of the process based simulation.
+Scenario scripts (sample.sh, scenario1.sh, ...) are read directly, which means the topology written to topology.txt
+and the arguments of every ./node.py invocation are used unchanged.
+'''
+
+
+''' Message queues shared by every node and the controller of a simulation '''
+
+
+class MemoryNetwork:
+    def __init__(self):
+        # messages sent by each node which have not been collected by the controller yet
+        self.outgoing: dict[int, List[str]] = dict()
+        # messages relayed to each node which have not been read by the node yet
+        self.incoming: dict[int, List[str]] = dict()
+        # data messages which reached each node as their final destination
+        self.recieved: dict[int, List[str]] = dict()
+
+
+''' Node side of the in-memory transport '''
+
+
+class MemoryNodeTransport:
+    def __init__(self, network: 'MemoryNetwork', node_id: int):
+        self.network: 'MemoryNetwork' = network
+        self.node_id: int = node_id
+        # create the queues of the node
+        network.outgoing.setdefault(node_id, [])
+        network.incoming.setdefault(node_id, [])
+        network.recieved.setdefault(node_id, [])
+
+    def receive(self) -> List[str]:
+        # swap out the queue so the node takes ownership of every pending message
+        messages = self.network.incoming[self.node_id]
+        self.network.incoming[self.node_id] = []
+        return messages
+
+    def send(self, message: str):
+        self.network.outgoing[self.node_id].append(message)
+
+    def deliver(self, message: str):
+        self.network.recieved[self.node_id].append(message)
+
+    ''' messages are queued in memory as they are sent, so there is nothing to write out '''
+
+    def flush(self):
+        pass
+
+
+''' Controller side of the in-memory transport '''
+
+
+class MemoryControllerTransport:
+    def __init__(self, network: 'MemoryNetwork'):
+        self.network: 'MemoryNetwork' = network
+
+    def collect(self, node_id: int) -> List[str]:
+        messages = self.network.outgoing.get(node_id)
+        if not messages:
+            return []
+        self.network.outgoing[node_id] = []
+        return messages
+
+    def relay(self, pending: 'dict[int, List[str]]'):
+        for node_id, lines in pending.items():
+            self.network.incoming.setdefault(node_id, []).extend(lines)
+
+
+''' Virtual clock which runs scheduled events in (time, priority) order '''
+
+
+class VirtualClock:
+    def __init__(self):
+        # current virtual time in seconds
+        self.now: int = 0
+        # heap of pending events as (time, priority, insertion order, action)
+        self.events: list = []
+        # insertion counter used to keep the ordering of equal events stable
+        self.counter: int = 0
+
+    ''' schedule an action to run at the given virtual time '''
+
+    def schedule(self, at: int, action: Callable[[], None], priority: int = 0):
+        heappush(self.events, (at, priority, self.counter, action))
+        self.counter += 1
+
+    ''' run every event scheduled before the given virtual time '''
+
+    def run(self, until: int):
+        while self.events and self.events[0][0] < until:
+            self.now, _, _, action = heappop(self.events)
+            action()
+        self.now = until
+
+
+''' Parse a scenario script into its topology lines and the (id, destination, message, delay) of each node '''
+
+
+def load_scenario(path: str) -> (List[str], List[tuple]):
+    with open(path) as script:
+        content = script.read()
+
+    # the topology is the quoted block which is echoed into topology.txt
+    match = re.search(r'echo\s+"(.*?)"\s*>\s*topology\.txt', content, re.DOTALL)
+    if match is None:
+        raise ValueError('%s does not write a topology.txt' % path)
+    topology = match.group(1).splitlines()
+
+    nodes = []
+    for line in content.splitlines():
+        if not line.strip().startswith('./node.py'):
+            continue
+        # drop the trailing '&' which backgrounds the process
+        _, *args = [arg for arg in shlex.split(line) if arg != '&']
+        node_id, destination_id = int(args[0]), int(args[1])
+        if node_id == destination_id:
+            nodes.append((node_id, destination_id, "", -1))
+        else:
+            nodes.append((node_id, destination_id, args[2], int(args[3])))
+
+    return topology, nodes
+
+
+''' Single process simulation of a controller and a set of nodes '''
+
+
+class Simulation:
+    def __init__(self, topology: Iterable[str], nodes: Iterable[tuple], verify_routes: bool = False, wire: str = 'text',
+                 differential_tc: bool = False, flows: Iterable[str] = None, convergence: bool = False):
+        self.network: 'MemoryNetwork' = MemoryNetwork()
+        self.clock: 'VirtualClock' = VirtualClock()
+        self.controller: 'Controller' = Controller(
+            transport=MemoryControllerTransport(self.network),
+            topology=topology,
+        )
+        self.nodes: dict[int, 'OLSRNode'] = dict()
+        for node_id, destination_id, message, delay in nodes:
+            node = OLSRNode(
+                node_id,
+                transport=MemoryNodeTransport(self.network, node_id),
+                verify_routes=verify_routes,
+                codec=get_codec(wire),
+                differential_tc=differential_tc,
+            )
+            if node_id != destination_id:
+                node.data_message = (destination_id, message, delay)
+            self.nodes[node_id] = node
+        # every node queues generated traffic when there is a flow specification, keeping its records in memory
+        if flows is not None:
+            flows = read_flows(flows)
+            for node_id, node in self.nodes.items():
+                node.traffic = TrafficAgent(node_id, flows)
+        # the nodes publish snapshots of their routing table and MPR set, which the controller checks every tick
+        if convergence:
+            snapshots = MemorySnapshots()
+            self.controller.convergence = ConvergenceMonitor(snapshots)
+            for node in self.nodes.values():
+                attach_publisher(node, snapshots)
+
+    ''' schedule a periodic tick for an entity, which runs once per virtual second from the given start '''
+
+    def schedule_ticks(self, tick: Callable[[int], None], start: int, count: int, priority: int):
+        def step(i: int):
+            tick(i)
+            if i + 1 < start + count:
+                self.clock.schedule(self.clock.now + 1, lambda: step(i + 1), priority)
+
+        self.clock.schedule(0, lambda: step(start), priority)
+
+    ''' run the simulation for the given number of virtual seconds, returning the number of seconds simulated '''
+
+    def run(self, duration: int = 120, until_converged: bool = False) -> int:
+        # the controller relays the messages sent during the previous second before the nodes read their inbox,
+        # mirroring the controller clock starting at 0 and the node clocks starting at 1
+        self.schedule_ticks(self.controller.tick, 0, duration, priority=0)
+        for priority, node in enumerate(self.nodes.values(), start=1):
+            self.schedule_ticks(node.tick, 1, duration, priority=priority)
+        if not until_converged:
+            self.clock.run(duration)
+            return duration
+        # one second at a time, ending after the tick at which the network settled after the last scripted change
+        for second in range(1, duration + 1):
+            self.clock.run(second)
+            if self.controller.settled(second - 1):
+                return second
+        return duration
+
+    ''' records of the generated traffic of every node, see traffic.py '''
+
+    def traffic_records(self) -> List[tuple]:
+        return [record for node in self.nodes.values() if node.traffic is not None for record in node.traffic.records]
+
+    ''' compare the routing table of every node with the shortest paths over the links the controller has up '''
+
+    def check_routes(self) -> 'dict[int, List[str]]':
+        oracle = self.controller.topology.hop_distances()
+        return {node_id: oracle.check_routes(node_id, node.routing_table) for node_id, node in self.nodes.items()}
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='run a scenario script inside a single process')
+    parser.add_argument('scenario', help='scenario script such as scenario1.sh')
+    parser.add_argument('--duration', type=int, default=120, help='virtual seconds to simulate')
+    parser.add_argument('--verify-routes', action='store_true', help='check every routing update against a full recompute')
+    parser.add_argument('--wire', default='text', choices=['text', 'binary'], help='wire format of the messages')
+    parser.add_argument('--check-routes', action='store_true', help='compare the final routes with shortest paths')
+    parser.add_argument('--metrics', action='store_true', help='write per-tick metrics files, see metrics.py')
+    parser.add_argument('--differential-tc', action='store_true', help='advertise MPR selector changes in TC deltas')
+    parser.add_argument('--flows', help='flow specification of generated traffic, see traffic.py')
+    parser.add_argument('--convergence', action='store_true', help='report when the routes converged after each change')
+    parser.add_argument('--until-converged', action='store_true', help='end once the last change has converged')
+    parser.add_argument('--trace', help='directory of a columnar trace of every delivered message, see tracing.py')
+    args = parser.parse_args()
+
+    flows = None
+    if args.flows:
+        with open(args.flows) as flow_file:
+            flows = flow_file.readlines()
+
+    simulation = Simulation(
+        *load_scenario(args.scenario),
+        verify_routes=args.verify_routes,
+        wire=args.wire,
+        differential_tc=args.differential_tc,
+        flows=flows,
+        convergence=args.convergence or args.until_converged,
+    )
+    if args.trace:
+        simulation.controller.trace = TraceRecorder(args.trace)
+    recorders = []
+    if args.metrics:
+        recorders.append(attach_controller(simulation.controller))
+        recorders.extend(attach_node(node) for node in simulation.nodes.values())
+    seconds = simulation.run(args.duration, args.until_converged)
+    if args.trace:
+        simulation.controller.trace.close()
+    for recorder in recorders:
+        recorder.close()
+
+    for node_id, node in sorted(simulation.nodes.items()):
+        print('node %d routes %s' % (node_id, dict(sorted(node.routing_table.items()))))
+        for message in simulation.network.recieved[node_id]:
+            print('node %d recieved: %s' % (node_id, message))
+
+    if flows is not None:
+        print_summary(summarize(simulation.traffic_records()))
+
+    if simulation.controller.convergence is not None:
+        print('simulated %d seconds' % seconds)
+        print_periods(simulation.controller.convergence.periods)
+
+    if args.check_routes:
+        for node_id, errors in sorted(simulation.check_routes().items()):
+            for error in errors:
+                print('route error %s' % error)
@@ -0,0 +1,41 @@
+from typing import List, Hashable
+
+'''
+Hashed timer wheel for entries that expire at an absolute clock tick.
+
+Each entry lives in the slot of its deadline modulo the wheel size, so refreshing an entry moves it between two slots,
+and advancing the clock only looks at the one slot of the current tick instead of every entry.
+'''
+
+
+class TimerWheel:
+    def __init__(self, size: int = 64):
+        # entries keyed to their deadline, bucketed by deadline modulo the number of slots
+        self.slots: List[dict] = [dict() for _ in range(size)]
+        # deadline of every scheduled entry
+        self.deadlines: dict = dict()
+
+    ''' schedule (or reschedule) an entry to expire at the given tick '''
+
+    def schedule(self, key: Hashable, deadline: int):
+        self.cancel(key)
+        self.deadlines[key] = deadline
+        self.slots[deadline % len(self.slots)][key] = deadline
+
+    ''' stop tracking an entry '''
+
+    def cancel(self, key: Hashable):
+        deadline = self.deadlines.pop(key, None)
+        if deadline is not None:
+            del self.slots[deadline % len(self.slots)][key]
+
+    ''' remove and return the entries whose deadline is the given tick, which has to be advanced one tick at a time '''
+
+    def expire(self, now: int) -> list:
+        slot = self.slots[now % len(self.slots)]
+        # entries further than a full turn of the wheel away share the slot but stay scheduled
+        expired = [key for key, deadline in slot.items() if deadline <= now]
+        for key in expired:
+            del slot[key]
+            del self.deadlines[key]
+        return expired
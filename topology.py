@@ -0,0 +1,81 @@
+from typing import Iterable, Iterator, List, Optional
+
+'''
+Streaming reader for topology scripts.
+
+A topology script lists one link change per line, which take effect once the controller clock reaches their delay:
+
+    <delay> <UP|DOWN> <source> <destination>
+
+Lines are read lazily in file order, one tick ahead of the controller clock,
+so a trace with millions of link changes never has to be held in memory.
+This requires the delays to never decrease from one line to the next, which generated traces do by construction.
+'''
+
+
+''' Time-ordered stream of link changes read from the lines of a topology script '''
+
+
+class TopologyStream:
+    def __init__(self, lines: Iterable[str], name: str = 'topology'):
+        # remaining lines of the script
+        self.lines: Iterator[str] = iter(lines)
+        # name of the script used in error messages
+        self.name: str = name
+        # number of lines read so far
+        self.line_number: int = 0
+        # first change which is not due yet, as (delay, state, source, destination)
+        self.upcoming: Optional[tuple] = None
+        # delay of the last change that was read, which no later line may precede
+        self.last_delay: int = 0
+        # whether every line of the script has been read
+        self.finished: bool = False
+
+    ''' read the next change of the script, returning None at the end '''
+
+    def read(self) -> Optional[tuple]:
+        for line in self.lines:
+            self.line_number += 1
+            # filter out empty lines to avoid parsing exceptions
+            if not line.strip():
+                continue
+            delay, state, source, destination = line.split()
+            delay = int(delay)
+            if delay < self.last_delay:
+                raise ValueError('%s line %d: delay %d comes after delay %d, the changes have to be sorted by delay'
+                                 % (self.name, self.line_number, delay, self.last_delay))
+            self.last_delay = delay
+            return delay, state, int(source), int(destination)
+        self.finished = True
+        return None
+
+    ''' return every change due at or before the given clock, in the order of the script '''
+
+    def advance(self, clock: int) -> List[tuple]:
+        changes = []
+        if self.upcoming is None:
+            self.upcoming = self.read()
+        while self.upcoming is not None and self.upcoming[0] <= clock:
+            changes.append(self.upcoming[1:])
+            self.upcoming = self.read()
+        return changes
+
+
+''' lazily read the lines of a topology file, which is opened straight away and closed after the last line '''
+
+
+def stream_file(path: str) -> Iterator[str]:
+    top = open(path)
+
+    def lines():
+        with top:
+            yield from top
+
+    return lines()
+
+
+''' put lines which are already in memory into time order, keeping the order of changes with the same delay '''
+
+
+def sort_lines(lines: Iterable[str]) -> List[str]:
+    return sorted(filter(lambda e: len(e.strip()) > 0, lines), key=lambda line: int(line.split(None, 1)[0]))
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+import json
+import mmap
+import os
+import sys
+from argparse import ArgumentParser
+from array import array
+from itertools import chain, repeat
+from struct import unpack_from
+from typing import List
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+'''
+Columnar binary trace of every message the controller delivers, and the queries run on it after the fact.
+
+The recorder in the relay path of the controller appends one row per delivery, that is per message and receiver,
+to a trace directory holding one little endian file per column, so that each column can be memory-mapped as an array:
+
+    tick            u32     controller tick of the delivery
+    sender          u16     node which sent or forwarded the message (<fromnbr>)
+    receiver        u16     neighbor the message was delivered to
+    copy            u16     position of the receiver among the neighbors of the sender, where 0 marks a transmission
+    type            u8      message type, numbered like the binary wire format (see wire.py)
+    originator      u16     node which created the message (<srcnode>, or the sender of a HELLO)
+    seqno           u32     sequence number of TC messages, TC deltas, full TC requests and packets, 0 otherwise
+    destination     u16     final destination of routed messages, 65535 for flooded ones
+    next_hop        u16     next hop of routed messages, which is the one receiver handling them, 65535 for flooded ones
+    size            u32     bytes of the message in its wire format
+
+A column cut short by an interrupted run is truncated to the shortest one by the reader.
+Running this module memory-maps a trace and answers a query on it, with vectorized scans when numpy is installed:
+
+    summary     rows, ticks and messages by type
+    overhead    control messages and bytes transmitted and received by every node
+    reach       nodes reached, transmissions and ticks taken by the flooding of every TC
+    paths       hops of every DATA message from its source to its destination
+'''
+
+
+COLUMNS = (
+    ('tick', 'I'), ('sender', 'H'), ('receiver', 'H'), ('copy', 'H'), ('type', 'B'), ('originator', 'H'),
+    ('seqno', 'I'), ('destination', 'H'), ('next_hop', 'H'), ('size', 'I'),
+)
+# numpy dtype of every array typecode, stored little endian
+DTYPES = {'B': '<u1', 'H': '<u2', 'I': '<u4'}
+
+# node id in the destination and next hop columns of flooded messages
+NONE = 0xFFFF
+
+TYPES = {'HELLO': 1, 'TC': 2, 'DATA': 3, 'TCD': 4, 'TCREQ': 5, 'PKT': 6}
+TYPE_NAMES = {number: name for name, number in TYPES.items()}
+# message types counted as control overhead
+CONTROL_TYPES = (TYPES['HELLO'], TYPES['TC'], TYPES['TCD'], TYPES['TCREQ'])
+# advertisements which are flooded through the MPRs
+TC_TYPES = (TYPES['TC'], TYPES['TCD'])
+
+
+''' (type, originator, seqno, destination, next hop, size) of a text or binary frame, read from its header only '''
+
+
+def frame_header(frame) -> tuple:
+    if isinstance(frame, str):
+        fields = frame.split(' ', 7)
+        kind = TYPES[fields[2]]
+        size = len(frame.encode()) + 1
+        if kind == 1:
+            return kind, int(fields[1]), 0, NONE, NONE, size
+        if kind in TC_TYPES:
+            return kind, int(fields[3]), int(fields[4]), NONE, NONE, size
+        if kind == 5:
+            return kind, int(fields[3]), int(fields[4]), int(fields[3]), int(fields[0]), size
+        return kind, int(fields[3]), int(fields[6]) if kind == 6 else 0, int(fields[4]), int(fields[0]), size
+    kind = frame[4]
+    if kind == 1:
+        return kind, unpack_from('!H', frame, 5)[0], 0, NONE, NONE, len(frame)
+    if kind in TC_TYPES:
+        _, source, sequence = unpack_from('!HHI', frame, 5)
+        return kind, source, sequence, NONE, NONE, len(frame)
+    if kind == 5:
+        next_hop, _, source, sequence = unpack_from('!HHHI', frame, 5)
+        return kind, source, sequence, source, next_hop, len(frame)
+    next_hop, _, source, destination = unpack_from('!HHHH', frame, 5)
+    sequence = unpack_from('!I', frame, 15)[0] if kind == 6 else 0
+    return kind, source, sequence, destination, next_hop, len(frame)
+
+
+''' Appends the deliveries of every controller tick to the column files of a trace directory '''
+
+
+class TraceRecorder:
+    def __init__(self, directory: str = 'trace'):
+        self.directory: str = directory
+        os.makedirs(directory, exist_ok=True)
+        # rows of the current tick, by column
+        self.columns: dict[str, array] = {name: array(typecode) for name, typecode in COLUMNS}
+        # column files, where a previous trace in the directory is discarded
+        self.files = {name: open(os.path.join(directory, name), 'wb') for name, _ in COLUMNS}
+
+    ''' add a row for each of the frames a sender sent to each of its neighbors '''
+
+    def record(self, clock: int, sender: int, frames: list, neighbors: List[int]):
+        count = len(neighbors)
+        if not count or not frames:
+            return
+        rows = len(frames) * count
+        columns = self.columns
+        columns['tick'].extend(repeat(clock, rows))
+        columns['sender'].extend(repeat(sender, rows))
+        columns['receiver'].extend(neighbors * len(frames))
+        columns['copy'].extend(list(range(count)) * len(frames))
+        # the header of every frame is read once, and repeated for each of its receivers
+        headers = [frame_header(frame) for frame in frames]
+        for position, name in enumerate(('type', 'originator', 'seqno', 'destination', 'next_hop', 'size')):
+            columns[name].extend(chain.from_iterable(repeat(header[position], count) for header in headers))
+
+    ''' append the rows of the tick to the column files '''
+
+    def flush(self):
+        for name, values in self.columns.items():
+            if not values:
+                continue
+            if sys.byteorder == 'big':
+                values.byteswap()
+            self.files[name].write(values.tobytes())
+            self.files[name].flush()
+            del values[:]
+
+    def close(self):
+        self.flush()
+        for column_file in self.files.values():
+            column_file.close()
+
+
+''' Columns of a trace directory, memory-mapped as numpy arrays, or as memoryviews without numpy '''
+
+
+class Trace:
+    def __init__(self, directory: str = 'trace'):
+        self.directory: str = directory
+        sizes = {name: os.path.getsize(os.path.join(directory, name)) // array(typecode).itemsize
+                 for name, typecode in COLUMNS}
+        # rows which every column holds
+        self.rows: int = min(sizes.values())
+        self.columns: dict = {name: self.load(name, typecode) for name, typecode in COLUMNS}
+
+    def load(self, name: str, typecode: str):
+        if not self.rows:
+            return numpy.zeros(0, dtype=DTYPES[typecode]) if numpy is not None else array(typecode)
+        with open(os.path.join(self.directory, name), 'rb') as column_file:
+            # the map stays valid after the file is closed, for as long as the arrays viewing it are alive
+            mapped = mmap.mmap(column_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if numpy is not None:
+            return numpy.frombuffer(mapped, dtype=DTYPES[typecode], count=self.rows)
+        # the little endian files can only be viewed in place on little endian machines
+        if sys.byteorder == 'big':
+            values = array(typecode, mapped[:self.rows * array(typecode).itemsize])
+            values.byteswap()
+            return values
+        return memoryview(mapped).cast(typecode)[:self.rows]
+
+    def __getitem__(self, name: str):
+        return self.columns[name]
+
+
+''' number of rows, ticks and messages by type '''
+
+
+def summary(trace: 'Trace') -> dict:
+    if not trace.rows:
+        return {'rows': 0, 'ticks': 0, 'transmissions': {}, 'deliveries': {}}
+    kinds, first = trace['type'], trace['copy']
+    if numpy is not None:
+        deliveries = numpy.bincount(kinds, minlength=len(TYPES) + 1)
+        transmissions = numpy.bincount(kinds[first == 0], minlength=len(TYPES) + 1)
+        ticks = int(trace['tick'][-1]) + 1
+    else:
+        deliveries = [0] * (len(TYPES) + 1)
+        transmissions = [0] * (len(TYPES) + 1)
+        for kind, copy in zip(kinds, first):
+            deliveries[kind] += 1
+            transmissions[kind] += copy == 0
+        ticks = trace['tick'][-1] + 1
+    return {
+        'rows': trace.rows,
+        'ticks': ticks,
+        'transmissions': {TYPE_NAMES[k]: int(transmissions[k]) for k in sorted(TYPE_NAMES) if deliveries[k]},
+        'deliveries': {TYPE_NAMES[k]: int(deliveries[k]) for k in sorted(TYPE_NAMES) if deliveries[k]},
+    }
+
+
+''' control messages and bytes every node transmitted (once per broadcast) and received, and the TCs it forwarded '''
+
+
+def overhead(trace: 'Trace') -> 'dict[int, dict]':
+    fields = ('hello_tx', 'tc_tx', 'tc_forwarded', 'tx_bytes', 'rx', 'rx_bytes')
+    if not trace.rows:
+        return dict()
+    kinds, senders, receivers, sizes = trace['type'], trace['sender'], trace['receiver'], trace['size']
+    if numpy is not None:
+        control = numpy.isin(kinds, CONTROL_TYPES)
+        sent = control & (trace['copy'] == 0)
+        tc = sent & (kinds != TYPES['HELLO'])
+        count = int(max(senders.max(), receivers.max())) + 1
+        totals = {
+            'hello_tx': numpy.bincount(senders[sent & (kinds == TYPES['HELLO'])], minlength=count),
+            'tc_tx': numpy.bincount(senders[tc], minlength=count),
+            'tc_forwarded': numpy.bincount(
+                senders[tc & numpy.isin(kinds, TC_TYPES) & (senders != trace['originator'])], minlength=count,
+            ),
+            'tx_bytes': numpy.bincount(senders[sent], weights=sizes[sent], minlength=count),
+            'rx': numpy.bincount(receivers[control], minlength=count),
+            'rx_bytes': numpy.bincount(receivers[control], weights=sizes[control], minlength=count),
+        }
+        nodes = numpy.flatnonzero(numpy.bincount(senders, minlength=count) + numpy.bincount(receivers, minlength=count))
+        return {int(node): {field: int(totals[field][node]) for field in fields} for node in nodes}
+    nodes: dict[int, dict] = dict()
+    for kind, sender, receiver, copy, originator, size in zip(
+            kinds, senders, receivers, trace['copy'], trace['originator'], sizes):
+        if kind not in CONTROL_TYPES:
+            continue
+        if copy == 0:
+            totals = nodes.setdefault(sender, dict.fromkeys(fields, 0))
+            totals['hello_tx' if kind == TYPES['HELLO'] else 'tc_tx'] += 1
+            totals['tc_forwarded'] += kind in TC_TYPES and sender != originator
+            totals['tx_bytes'] += size
+        totals = nodes.setdefault(receiver, dict.fromkeys(fields, 0))
+        totals['rx'] += 1
+        totals['rx_bytes'] += size
+    return dict(sorted(nodes.items()))
+
+
+''' nodes reached other than the originator, transmissions and first and last tick of every flooded TC '''
+
+
+def flood_reach(trace: 'Trace') -> List[dict]:
+    if not trace.rows:
+        return []
+    kinds, originators, sequences = trace['type'], trace['originator'], trace['seqno']
+    if numpy is not None:
+        tc = numpy.isin(kinds, TC_TYPES)
+        receivers = trace['receiver'][tc]
+        keys = originators[tc].astype(numpy.uint64) << numpy.uint64(32) | sequences[tc]
+        # one sort by flood and receiver, which groups the floods and the receivers within them
+        order = numpy.argsort(keys << numpy.uint64(16) | receivers)
+        keys, receivers = keys[order], receivers[order]
+        ticks, copies = trace['tick'][tc][order], trace['copy'][tc][order]
+        flood_start = numpy.r_[True, keys[1:] != keys[:-1]]
+        starts = numpy.flatnonzero(flood_start)
+        floods = keys[starts]
+        # distinct receivers per flood, leaving out the copies that came back to the originator
+        distinct = flood_start | numpy.r_[True, receivers[1:] != receivers[:-1]]
+        reach = numpy.add.reduceat((distinct & (receivers != (keys >> numpy.uint64(32)))).astype(numpy.int64), starts)
+        transmissions = numpy.add.reduceat((copies == 0).astype(numpy.int64), starts)
+        first, last = numpy.minimum.reduceat(ticks, starts), numpy.maximum.reduceat(ticks, starts)
+        return [
+            {'originator': int(key >> 32), 'seqno': int(key & 0xFFFFFFFF), 'reach': int(r), 'transmissions': int(t),
+             'first': int(f), 'last': int(l)}
+            for key, r, t, f, l in zip(floods.tolist(), reach.tolist(), transmissions.tolist(), first.tolist(),
+                                       last.tolist())
+        ]
+    floods: dict[tuple, dict] = dict()
+    for kind, originator, sequence, receiver, copy, tick in zip(
+            kinds, originators, sequences, trace['receiver'], trace['copy'], trace['tick']):
+        if kind not in TC_TYPES:
+            continue
+        flood = floods.get((originator, sequence))
+        if flood is None:
+            flood = floods[(originator, sequence)] = {'reached': set(), 'transmissions': 0, 'first': tick}
+        if receiver != originator:
+            flood['reached'].add(receiver)
+        flood['transmissions'] += copy == 0
+        flood['last'] = tick
+    return [
+        {'originator': originator, 'seqno': sequence, 'reach': len(flood['reached']),
+         'transmissions': flood['transmissions'], 'first': flood['first'], 'last': flood['last']}
+        for (originator, sequence), flood in sorted(floods.items())
+    ]
+
+
+''' hops of every DATA message, following its deliveries to the next hop from the source onwards '''
+
+
+def data_paths(trace: 'Trace') -> List[dict]:
+    if not trace.rows:
+        return []
+    kinds, receivers, next_hops = trace['type'], trace['receiver'], trace['next_hop']
+    # only the receiver named as next hop handles a routed message, the others drop their copy
+    if numpy is not None:
+        rows = numpy.flatnonzero((kinds == TYPES['DATA']) & (receivers == next_hops)).tolist()
+    else:
+        rows = [row for row, (kind, receiver, next_hop) in enumerate(zip(kinds, receivers, next_hops))
+                if kind == TYPES['DATA'] and receiver == next_hop]
+    paths: List[dict] = []
+    # path of every message which is still on its way, by the node holding it
+    travelling: dict[tuple, dict] = dict()
+    for row in rows:
+        tick, sender, receiver = int(trace['tick'][row]), int(trace['sender'][row]), int(trace['receiver'][row])
+        originator, destination = int(trace['originator'][row]), int(trace['destination'][row])
+        path = travelling.pop((originator, destination, sender), None)
+        if path is None:
+            path = {'originator': originator, 'destination': destination, 'sent': tick, 'hops': [sender]}
+            paths.append(path)
+        path['hops'].append(receiver)
+        path['arrived'] = tick if receiver == destination else None
+        if receiver != destination:
+            travelling[(originator, destination, receiver)] = path
+    return paths
+
+
+QUERIES = {'summary': summary, 'overhead': overhead, 'reach': flood_reach, 'paths': data_paths}
+
+
+''' print the result of a query as a table '''
+
+
+def print_result(query: str, result):
+    if query == 'summary':
+        print('%d rows over %d ticks' % (result['rows'], result['ticks']))
+        print('%-6s %14s %12s' % ('type', 'transmissions', 'deliveries'))
+        for name, count in result['deliveries'].items():
+            print('%-6s %14d %12d' % (name, result['transmissions'][name], count))
+    elif query == 'overhead':
+        print('%6s %9s %9s %12s %12s %10s %12s' % ('node', 'hello tx', 'tc tx', 'tc forwarded', 'tx bytes', 'rx',
+                                                    'rx bytes'))
+        for node, totals in result.items():
+            print('%6d %9d %9d %12d %12d %10d %12d' % (node, *totals.values()))
+    elif query == 'reach':
+        print('%10s %8s %6s %13s %6s %6s' % ('originator', 'seqno', 'reach', 'transmissions', 'first', 'last'))
+        for flood in result:
+            print('%10d %8d %6d %13d %6d %6d' % tuple(flood.values()))
+    else:
+        for path in result:
+            print('%d -> %d sent at %d %s: %s' % (
+                path['originator'], path['destination'], path['sent'],
+                'arrived at %d' % path['arrived'] if path['arrived'] is not None else 'never arrived',
+                ' '.join(map(str, path['hops'])),
+            ))
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='query the message trace recorded by the controller')
+    parser.add_argument('query', choices=list(QUERIES))
+    parser.add_argument('directory', nargs='?', default='trace', help='trace directory, trace by default')
+    parser.add_argument('--json', action='store_true', help='print the result as JSON')
+    args = parser.parse_args()
+
+    trace = Trace(args.directory)
+    result = QUERIES[args.query](trace)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_result(args.query, result)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+import glob
+import json
+import os
+from argparse import ArgumentParser
+from collections import deque
+from typing import Iterable, List
+
+from messages import PacketMessage
+
+'''
+Generated data traffic, sent as PKT messages next to the single DATA message of a scenario.
+
+A flow specification lists one flow per line, where blank lines and lines starting with '#' are skipped:
+
+    <start> <stop> <source> <destination> <rate> <size>
+
+    start, stop     first and last clock value at which the source generates packets
+    rate            packets generated per second, which may be fractional
+    size            payload bytes of every packet
+
+Flows are numbered by their order in the specification. Every node queues the packets it generates or has to forward,
+and sends the queued packets which have a route at the end of its tick, while packets without a route wait for one.
+A packet is dropped when the queue is full (overflow), when it waited too long for a route (no-route),
+or when it crossed too many links while the routes were inconsistent (ttl). Packets sent over a link which went down,
+or still queued when the run ends, are lost without a record.
+Each node records what happened to the packets it handled:
+
+    S <flow> <seqno> <clock>                        generated at the source
+    D <flow> <seqno> <sent> <clock> <hops>          delivered at the destination
+    X <flow> <seqno> <clock> <reason>               dropped
+
+These records are appended to traffic<id> once per tick by the node processes, and kept in memory by simulation.py.
+Running this module summarizes the records of every node by flow.
+'''
+
+
+# number of packets a node can queue
+QUEUE_LIMIT = 1000
+# number of ticks a packet waits for a route before it is dropped
+PACKET_HOLD_TIME = 10
+# number of links a packet may cross, which ends routing loops
+MAX_HOPS = 64
+
+
+''' Packets from a source to a destination at a fixed rate between two clock values '''
+
+
+class Flow:
+    def __init__(self, flow_id: int, start: int, stop: int, source: int, destination: int, rate: float, size: int):
+        # number of the flow, which is its position in the specification
+        self.flow_id: int = flow_id
+        # clock values of the first and last second in which packets are generated
+        self.start: int = start
+        self.stop: int = stop
+        self.source: int = source
+        self.destination: int = destination
+        # packets per second
+        self.rate: float = rate
+        # payload bytes of every packet
+        self.size: int = size
+
+
+''' parse the lines of a flow specification '''
+
+
+def read_flows(lines: Iterable[str]) -> List['Flow']:
+    flows = []
+    for line_number, line in enumerate(lines, start=1):
+        # filter out empty lines and comments to avoid parsing exceptions
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        start, stop, source, destination, rate, size = line.split()
+        if source == destination:
+            raise ValueError('flow on line %d sends from node %s to itself' % (line_number, source))
+        flows.append(Flow(len(flows), int(start), int(stop), int(source), int(destination), float(rate), int(size)))
+    return flows
+
+
+''' Packet queue of a node, generating the packets of the flows it is the source of '''
+
+
+class TrafficAgent:
+    def __init__(self, node_id: int, flows: Iterable['Flow'], log_path: str = None, queue_limit: int = QUEUE_LIMIT,
+                 hold_time: int = PACKET_HOLD_TIME):
+        self.node_id: int = node_id
+        # flows generated by this node
+        self.flows: List['Flow'] = [flow for flow in flows if flow.source == node_id]
+        # fraction of a packet carried over to the next second, and the next sequence number, by flow
+        self.credit: dict[int, float] = {flow.flow_id: 0.0 for flow in self.flows}
+        self.sequences: dict[int, int] = {flow.flow_id: 0 for flow in self.flows}
+        # queued packets with the clock value after which they are dropped if they still have no route
+        self.queue: deque = deque()
+        self.queue_limit: int = queue_limit
+        self.hold_time: int = hold_time
+        # records of the packets handled by this node (see above)
+        self.records: List[tuple] = []
+        # file the records are appended to once per tick, or None to keep them in memory
+        self.log_path: str = log_path
+
+    ''' queue a packet, dropping it when the queue is full '''
+
+    def enqueue(self, packet: 'PacketMessage', clock: int):
+        if len(self.queue) >= self.queue_limit:
+            self.records.append(('X', packet.flow, packet.sequence, clock, 'overflow'))
+            return
+        self.queue.append((clock + self.hold_time, packet))
+
+    ''' create the packets of every active flow which are due at the given clock value '''
+
+    def generate(self, clock: int):
+        for flow in self.flows:
+            if not flow.start <= clock <= flow.stop:
+                continue
+            # fractional rates send a packet whenever a whole one has accumulated
+            self.credit[flow.flow_id] += flow.rate
+            while self.credit[flow.flow_id] >= 1:
+                self.credit[flow.flow_id] -= 1
+                sequence = self.sequences[flow.flow_id]
+                self.sequences[flow.flow_id] += 1
+                self.records.append(('S', flow.flow_id, sequence, clock))
+                self.enqueue(PacketMessage(
+                    next_hop=-1,
+                    sender=self.node_id,
+                    source=self.node_id,
+                    destination=flow.destination,
+                    flow=flow.flow_id,
+                    sequence=sequence,
+                    sent=clock,
+                    hops=0,
+                    payload='x' * flow.size,
+                ), clock)
+
+    ''' send every queued packet which has a route, keeping the others until they expire '''
+
+    def drain(self, node, clock: int):
+        waiting = deque()
+        for deadline, packet in self.queue:
+            next_hop = node.routing_table.get(packet.destination)
+            if packet.hops >= MAX_HOPS:
+                self.records.append(('X', packet.flow, packet.sequence, clock, 'ttl'))
+            elif next_hop is not None:
+                packet.next_hop = next_hop
+                packet.sender = node.node_id
+                packet.hops += 1
+                node.transport.send(node.codec.encode(packet))
+            elif deadline <= clock:
+                self.records.append(('X', packet.flow, packet.sequence, clock, 'no-route'))
+            else:
+                waiting.append((deadline, packet))
+        self.queue = waiting
+
+    ''' record a packet which reached this node as its destination '''
+
+    def deliver(self, packet: 'PacketMessage', clock: int):
+        self.records.append(('D', packet.flow, packet.sequence, packet.sent, clock, packet.hops))
+
+    ''' append the records of the tick to the log file, when there is one '''
+
+    def flush(self):
+        if self.log_path is None or not self.records:
+            return
+        with open(self.log_path, 'a') as traffic_log:
+            traffic_log.write(''.join(' '.join(map(str, record)) + '\n' for record in self.records))
+        self.records.clear()
+
+
+''' read the records of a traffic log '''
+
+
+def read_records(path: str) -> List[tuple]:
+    records = []
+    with open(path) as traffic_log:
+        for line in traffic_log:
+            kind, *fields = line.split()
+            # every field but the reason of a drop is a number
+            records.append((kind, *(int(field) if field.isdigit() else field for field in fields)))
+    return records
+
+
+''' the value below which the given fraction of the sorted values lie '''
+
+
+def percentile(values: List[int], fraction: float) -> int:
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else None
+
+
+''' totals of the records by flow, along with the delivery of the packets generated in each window of seconds '''
+
+
+def summarize(records: Iterable[tuple], window: int = 10) -> dict:
+    flows = dict()
+    timeline = dict()
+    for record in records:
+        kind, flow_id = record[0], record[1]
+        flow = flows.setdefault(flow_id, {'sent': 0, 'delivered': 0, 'dropped': dict(), 'hops': [], 'latency': []})
+        if kind == 'S':
+            flow['sent'] += 1
+            timeline.setdefault(record[3] // window * window, [0, 0])[0] += 1
+        elif kind == 'D':
+            _, _, _, sent, clock, hops = record
+            flow['delivered'] += 1
+            flow['hops'].append(hops)
+            flow['latency'].append(clock - sent)
+            timeline.setdefault(sent // window * window, [0, 0])[1] += 1
+        else:
+            reason = record[4]
+            flow['dropped'][reason] = flow['dropped'].get(reason, 0) + 1
+
+    summary = {'flows': dict(), 'timeline': []}
+    for flow_id, flow in sorted(flows.items()):
+        latency = sorted(flow['latency'])
+        summary['flows'][flow_id] = {
+            'sent': flow['sent'],
+            'delivered': flow['delivered'],
+            'delivery_ratio': flow['delivered'] / flow['sent'] if flow['sent'] else None,
+            'dropped': flow['dropped'],
+            'lost': flow['sent'] - flow['delivered'] - sum(flow['dropped'].values()),
+            'mean_hops': sum(flow['hops']) / len(flow['hops']) if flow['hops'] else None,
+            'mean_latency': sum(latency) / len(latency) if latency else None,
+            'p95_latency': percentile(latency, 0.95),
+        }
+    for start, (sent, delivered) in sorted(timeline.items()):
+        summary['timeline'].append({'start': start, 'sent': sent, 'delivered': delivered})
+    return summary
+
+
+''' print a summary as a table by flow and a timeline by window '''
+
+
+def print_summary(summary: dict):
+    print('%5s %8s %10s %7s %20s %6s %6s %8s %5s' % (
+        'flow', 'sent', 'delivered', 'ratio', 'dropped', 'lost', 'hops', 'latency', 'p95',
+    ))
+    for flow_id, flow in summary['flows'].items():
+        dropped = ' '.join('%s=%d' % item for item in sorted(flow['dropped'].items())) or '-'
+        print('%5s %8d %10d %7s %20s %6d %6s %8s %5s' % (
+            flow_id, flow['sent'], flow['delivered'],
+            '-' if flow['delivery_ratio'] is None else '%.3f' % flow['delivery_ratio'],
+            dropped,
+            flow['lost'],
+            '-' if flow['mean_hops'] is None else '%.2f' % flow['mean_hops'],
+            '-' if flow['mean_latency'] is None else '%.2f' % flow['mean_latency'],
+            '-' if flow['p95_latency'] is None else flow['p95_latency'],
+        ))
+    print('%8s %8s %10s' % ('second', 'sent', 'delivered'))
+    for window in summary['timeline']:
+        print('%8d %8d %10d' % (window['start'], window['sent'], window['delivered']))
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='summarize the traffic logs of every node by flow')
+    parser.add_argument('paths', nargs='*', help='traffic logs, every traffic<id> file in the working directory by default')
+    parser.add_argument('--window', type=int, default=10, help='seconds per window of the delivery timeline')
+    parser.add_argument('--json', action='store_true', help='print the summary as JSON')
+    args = parser.parse_args()
+
+    paths = args.paths or sorted(path for path in glob.glob('traffic[0-9]*') if os.path.isfile(path))
+    summary = summarize((record for path in paths for record in read_records(path)), args.window)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
@@ -0,0 +1,167 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import List
+
+from wire import TextCodec
+
+'''
+File based transport helpers shared by the nodes and the controller.
+
+Every node appends its outgoing messages to `from<id>` and reads incoming messages from `to<id>`,
+both of which are append-only files that grow for the entire simulation.
+The processes start ticking once every node has created its files, see rendezvous.py.
+Messages are written as frames of the selected wire format (see wire.py), which defaults to lines of text.
+'''
+
+
+''' Follow an append-only file and return only the frames that were completed since the last read '''
+
+
+class FileTail:
+    def __init__(self, path: str, codec=None):
+        # path of the file that is being followed
+        self.path: str = path
+        # wire format which splits the file contents into frames
+        self.codec = codec if codec is not None else TextCodec()
+        # persistent handle to the file, opened lazily once the file exists
+        self.handle = None
+        # byte offset of the first byte that has not been consumed yet
+        self.offset: int = 0
+        # bytes of a trailing frame which has not been completely written yet
+        self.partial: bytes = b''
+
+    ''' read the newly appended complete frames from the file '''
+
+    def read_frames(self) -> list:
+        # open the file the first time it becomes available
+        if self.handle is None:
+            try:
+                self.handle = open(self.path, 'rb')
+            except FileNotFoundError:
+                return []
+        # resume reading from the last consumed byte
+        self.handle.seek(self.offset)
+        chunk = self.handle.read()
+        # exit early when nothing was appended since the last read
+        if not chunk:
+            return []
+        self.offset += len(chunk)
+        # an unfinished trailing frame is kept for the next read
+        frames, self.partial = self.codec.split(self.partial + chunk)
+        return frames
+
+    ''' release the file handle '''
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+
+''' Bounded pool of append handles, which keeps the most recently used files open between writes '''
+
+
+class AppendPool:
+    def __init__(self, capacity: int = 64):
+        # maximum number of handles that are kept open at the same time
+        self.capacity: int = capacity
+        # open handles keyed by path, ordered from least to most recently used
+        self.handles: 'OrderedDict[str, object]' = OrderedDict()
+
+    ''' append a block of bytes to the file at the given path with a single write '''
+
+    def write(self, path: str, data: bytes):
+        handle = self.handles.get(path)
+        if handle is None:
+            # evict the least recently used handle to stay within the capacity
+            if len(self.handles) >= self.capacity:
+                _, evicted = self.handles.popitem(last=False)
+                evicted.close()
+            handle = self.handles[path] = open(path, 'ab')
+        else:
+            self.handles.move_to_end(path)
+        handle.write(data)
+        # make the data visible to readers of the file straight away
+        handle.flush()
+
+    ''' close every open handle '''
+
+    def close(self):
+        for handle in self.handles.values():
+            handle.close()
+        self.handles.clear()
+
+
+''' Node side of the file transport, which exchanges messages through the node's from/to/recieved files '''
+
+
+class NodeFileTransport:
+    def __init__(self, node_id: int, codec=None):
+        # numeric id of the owning node
+        self.node_id: int = node_id
+        # wire format of the message files
+        self.codec = codec if codec is not None else TextCodec()
+        # reader which follows the message accepting file from the last consumed byte
+        self.inbox: 'FileTail' = FileTail('to%d' % node_id, self.codec)
+        # frames sent and data messages delivered during the current tick, written out together by flush()
+        self.outgoing: list = []
+        self.delivered: List[str] = []
+
+        # trigger the creation of files
+        Path('to%d' % node_id).touch()
+        Path('from%d' % node_id).touch()
+        Path('recieved%d' % node_id).touch()
+
+    ''' read the messages which arrived since the last call '''
+
+    def receive(self) -> list:
+        return self.inbox.read_frames()
+
+    ''' hand a message frame to the controller for broadcasting '''
+
+    def send(self, frame):
+        self.outgoing.append(frame)
+
+    ''' record a data message that reached its destination '''
+
+    def deliver(self, message: str):
+        self.delivered.append(message)
+
+    ''' append the frames and data messages of the tick with a single write per file '''
+
+    def flush(self):
+        if self.outgoing:
+            with open('from%d' % self.node_id, 'ab') as sent_messages:
+                sent_messages.write(self.codec.join(self.outgoing))
+            self.outgoing.clear()
+        if self.delivered:
+            with open('recieved%d' % self.node_id, 'a') as recieved_messages:
+                recieved_messages.write(''.join(message + '\n' for message in self.delivered))
+            self.delivered.clear()
+
+
+''' Controller side of the file transport, which moves lines from every fromXXX file into the neighboring toXXX files '''
+
+
+class ControllerFileTransport:
+    def __init__(self, codec=None):
+        # wire format of the message files
+        self.codec = codec if codec is not None else TextCodec()
+        # persistent readers which follow each node output file (fromXXX) from the last consumed byte
+        self.outboxes: dict[int, 'FileTail'] = dict()
+        # open append handles to the node input files (toXXX), reused across ticks
+        self.inboxes: 'AppendPool' = AppendPool()
+
+    ''' read the messages a node sent since the last call '''
+
+    def collect(self, node_id: int) -> list:
+        # start following the output file the first time the node is seen
+        if node_id not in self.outboxes:
+            self.outboxes[node_id] = FileTail('from%d' % node_id, self.codec)
+        return self.outboxes[node_id].read_frames()
+
+    ''' write the queued messages for each node with a single append per node '''
+
+    def relay(self, pending: 'dict[int, list]'):
+        for node_id, frames in pending.items():
+            self.inboxes.write('to%d' % node_id, self.codec.join(frames))
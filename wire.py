@@ -0,0 +1,171 @@
+from struct import Struct, pack, unpack_from
+from typing import List
+
+from messages import HelloMessage, TCMessage, TCDeltaMessage, TCRequestMessage, DataMessage, PacketMessage
+from messages import parse_message
+
+'''
+Wire formats used to move messages between the nodes and the controller.
+
+    text    ==> the space-delimited messages described in node.py, one per line (default, easy to debug)
+
+    binary  ==> length-prefixed frames with fixed-width big endian integers (node ids up to 65535)
+
+        frame   ==> <length:u32> <type:u8> <body>           (length counts the type and body bytes)
+
+        HELLO   ==> 1 <node:u16> <#unidir:u16> <#bidir:u16> <#mpr:u16> <neighbor:u16> ...
+        TC      ==> 2 <fromnbr:u16> <srcnode:u16> <seqno:u32> <#ms:u16> <msnode:u16> ...
+        DATA    ==> 3 <nxthop:u16> <fromnbr:u16> <srcnode:u16> <dstnode:u16> <utf-8 string>
+        TCD     ==> 4 <fromnbr:u16> <srcnode:u16> <seqno:u32> <#add:u16> <#del:u16> <msnode:u16> ...
+        TCREQ   ==> 5 <nxthop:u16> <fromnbr:u16> <srcnode:u16> <seqno:u32>
+        PKT     ==> 6 <nxthop:u16> <fromnbr:u16> <srcnode:u16> <dstnode:u16> <flow:u16> <seqno:u32> <sent:u32>
+                      <hops:u16> <utf-8 string>
+
+A codec turns message records into frames, frames back into records,
+and splits a stream of bytes read from a transport file into complete frames.
+'''
+
+
+''' Space-delimited text messages terminated by newlines '''
+
+
+class TextCodec:
+    name = 'text'
+
+    def encode(self, message) -> str:
+        return message.encode()
+
+    def decode(self, frame: str):
+        # blank lines carry no message
+        if not frame:
+            return None
+        return parse_message(frame)
+
+    ''' split a byte stream into complete lines, returning them with the unfinished remainder '''
+
+    def split(self, data: bytes) -> (List[str], bytes):
+        *lines, remainder = data.split(b'\n')
+        return [line.decode() for line in lines], remainder
+
+    ''' join frames into a block of bytes that can be appended to a transport file '''
+
+    def join(self, frames: List[str]) -> bytes:
+        return ('\n'.join(frames) + '\n').encode()
+
+
+# frame header of length and type
+HEADER = Struct('!IB')
+# HELLO body without the neighbor lists
+HELLO = Struct('!HHHH')
+# TC body without the MPR selector list
+TC = Struct('!HHIH')
+# DATA body without the string
+DATA = Struct('!HHHH')
+# TC delta body without the added and removed lists
+TC_DELTA = Struct('!HHIHH')
+# full TC request body
+TC_REQUEST = Struct('!HHHI')
+# traffic packet body without the string
+PACKET = Struct('!HHHHHIIH')
+
+HELLO_TYPE = 1
+TC_TYPE = 2
+DATA_TYPE = 3
+TC_DELTA_TYPE = 4
+TC_REQUEST_TYPE = 5
+PACKET_TYPE = 6
+
+
+''' Length-prefixed binary frames with fixed-width integers '''
+
+
+class BinaryCodec:
+    name = 'binary'
+
+    def encode(self, message) -> bytes:
+        if type(message) is HelloMessage:
+            ids = message.unidir + message.bidir + message.mpr
+            body = HELLO.pack(message.sender, len(message.unidir), len(message.bidir), len(message.mpr))
+            body += pack('!%dH' % len(ids), *ids)
+            kind = HELLO_TYPE
+        elif type(message) is TCMessage:
+            body = TC.pack(message.sender, message.source, message.sequence, len(message.mpr_selectors))
+            body += pack('!%dH' % len(message.mpr_selectors), *message.mpr_selectors)
+            kind = TC_TYPE
+        elif type(message) is TCDeltaMessage:
+            ids = message.added + message.removed
+            body = TC_DELTA.pack(
+                message.sender, message.source, message.sequence, len(message.added), len(message.removed),
+            )
+            body += pack('!%dH' % len(ids), *ids)
+            kind = TC_DELTA_TYPE
+        elif type(message) is TCRequestMessage:
+            body = TC_REQUEST.pack(message.next_hop, message.sender, message.source, message.sequence)
+            kind = TC_REQUEST_TYPE
+        elif type(message) is PacketMessage:
+            body = PACKET.pack(
+                message.next_hop, message.sender, message.source, message.destination,
+                message.flow, message.sequence, message.sent, message.hops,
+            )
+            body += message.payload.encode()
+            kind = PACKET_TYPE
+        else:
+            body = DATA.pack(message.next_hop, message.sender, message.source, message.destination)
+            body += message.payload.encode()
+            kind = DATA_TYPE
+        return HEADER.pack(len(body) + 1, kind) + body
+
+    def decode(self, frame: bytes):
+        _, kind = HEADER.unpack_from(frame)
+        offset = HEADER.size
+        if kind == HELLO_TYPE:
+            sender, unidir, bidir, mpr = HELLO.unpack_from(frame, offset)
+            ids = list(unpack_from('!%dH' % (unidir + bidir + mpr), frame, offset + HELLO.size))
+            return HelloMessage(sender, ids[:unidir], ids[unidir:unidir + bidir], ids[unidir + bidir:])
+        if kind == TC_TYPE:
+            sender, source, sequence, count = TC.unpack_from(frame, offset)
+            ms_list = list(unpack_from('!%dH' % count, frame, offset + TC.size))
+            return TCMessage(sender, source, sequence, ms_list)
+        if kind == DATA_TYPE:
+            next_hop, sender, source, destination = DATA.unpack_from(frame, offset)
+            return DataMessage(next_hop, sender, source, destination, frame[offset + DATA.size:].decode())
+        if kind == TC_DELTA_TYPE:
+            sender, source, sequence, added, removed = TC_DELTA.unpack_from(frame, offset)
+            ids = list(unpack_from('!%dH' % (added + removed), frame, offset + TC_DELTA.size))
+            return TCDeltaMessage(sender, source, sequence, ids[:added], ids[added:])
+        if kind == TC_REQUEST_TYPE:
+            return TCRequestMessage(*TC_REQUEST.unpack_from(frame, offset))
+        if kind == PACKET_TYPE:
+            return PacketMessage(*PACKET.unpack_from(frame, offset), frame[offset + PACKET.size:].decode())
+        return None
+
+    ''' split a byte stream into complete frames, returning them with the unfinished remainder '''
+
+    def split(self, data: bytes) -> (List[bytes], bytes):
+        frames = []
+        offset = 0
+        # the length prefix tells where each frame ends
+        while len(data) - offset >= 4:
+            end = offset + 4 + int.from_bytes(data[offset:offset + 4], 'big')
+            if end > len(data):
+                break
+            frames.append(data[offset:end])
+            offset = end
+        return frames, data[offset:]
+
+    ''' join frames into a block of bytes that can be appended to a transport file '''
+
+    def join(self, frames: List[bytes]) -> bytes:
+        return b''.join(frames)
+
+
+CODECS = {codec.name: codec for codec in (TextCodec(), BinaryCodec())}
+
+
+''' look up a codec by the name of its wire format '''
+
+
+def get_codec(name: str = 'text'):
+    if name not in CODECS:
+        raise ValueError('unknown wire format %r, expected one of %s' % (name, ', '.join(CODECS)))
+    return CODECS[name]